@@ -0,0 +1,108 @@
+# Este script compara o formato pickle com o formato de artefato (artefatos.py) para os quatro
+# classificadores: tamanho em disco, tempo de carregamento a frio (em um processo novo, incluindo
+# a primeira previsão) e se as previsões do modelo carregado são idênticas.
+#
+# Uso: python benchmarks/benchmark_artefatos.py --amostras 20000 --dimensoes 50
+
+import os
+import io
+import sys
+import json
+import pickle
+import argparse
+import tempfile
+import subprocess
+import contextlib
+
+import numpy as np
+from sklearn.datasets import make_classification
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+from modulos.utils import artefatos  # noqa: E402
+from modulos.classificadores import knn, mlp, random_forest, svm  # noqa: E402
+
+# Executado em um processo novo: carrega o modelo, faz uma previsão (com a função testar_* do
+# classificador) e mede o tempo total
+CARREGAR = '''
+import sys, time, json, pickle, contextlib, io
+import numpy as np
+sys.path.insert(0, {raiz!r})
+from modulos.utils import artefatos
+from modulos.classificadores import {modulo}
+consulta = np.load({consulta!r})
+inicio = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    if {formato!r} == 'pickle':
+        with open({caminho!r}, 'rb') as arquivo:
+            modelo = pickle.load(arquivo)
+    else:
+        modelo = artefatos.carregar_artefato({caminho!r})[0]
+carregar = time.perf_counter() - inicio
+with contextlib.redirect_stdout(io.StringIO()):
+    previstos = {modulo}.{testar}(modelo, consulta)
+print(json.dumps({{'carregar_s': carregar, 'primeira_previsao_s': time.perf_counter() - inicio,
+                  'previstos': np.asarray(previstos).tolist()}}))
+'''
+
+TESTAR = {
+    'knn': ('knn', 'testar_knn'),
+    'rf': ('random_forest', 'testar_rf'),
+    'svm': ('svm', 'testar_svm'),
+    'mlp': ('mlp', 'testar_mlp'),
+}
+
+
+def carregar_em_processo_novo(nome, formato, caminho, consulta):
+    modulo, testar = TESTAR[nome]
+    codigo = CARREGAR.format(raiz=RAIZ, modulo=modulo, testar=testar, consulta=consulta, formato=formato, caminho=caminho)
+    saida = subprocess.run([sys.executable, '-c', codigo], capture_output=True, text=True, check=True).stdout
+    return json.loads(saida.strip().splitlines()[-1])
+
+
+def tamanho_mb(caminho):
+    if os.path.isdir(caminho):
+        return sum(os.path.getsize(os.path.join(caminho, nome)) for nome in os.listdir(caminho)) / 1024 ** 2
+    return os.path.getsize(caminho) / 1024 ** 2
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tamanho e tempo de carregamento: pickle x artefato')
+    parser.add_argument('--amostras', type=int, default=20000)
+    parser.add_argument('--dimensoes', type=int, default=50)
+    parser.add_argument('--classes', type=int, default=4)
+    parser.add_argument('--amostras_svm', type=int, default=5000, help='Amostras de treino do SVC (custo quadrático)')
+    args = parser.parse_args()
+
+    X, y = make_classification(n_samples=args.amostras, n_features=args.dimensoes, n_informative=args.dimensoes // 2,
+                               n_classes=args.classes, random_state=0)
+    with contextlib.redirect_stdout(io.StringIO()):
+        modelos = {
+            'knn': knn.treinar_knn(X, y),
+            'rf': random_forest.treinar_rf(X, y, n_jobs=-1),
+            'svm': svm.treinar_svm(X[:args.amostras_svm], y[:args.amostras_svm]),
+            'mlp': mlp.treinar_mlp(X, np.eye(args.classes, dtype=int)[y], preset='medio'),
+        }
+
+    print(f'{"modelo":<8}{"formato":<10}{"disco (MB)":>12}{"carregar (ms)":>15}{"1ª previsão (ms)":>18}{"idêntico":>10}')
+    with tempfile.TemporaryDirectory() as diretorio:
+        consulta = os.path.join(diretorio, 'consulta.npy')
+        np.save(consulta, X[:1000])
+        for nome, modelo in modelos.items():
+            caminho_pickle = os.path.join(diretorio, f'{nome}.pkl')
+            with open(caminho_pickle, 'wb') as arquivo:
+                pickle.dump(modelo, arquivo)
+            caminho_artefato = os.path.join(diretorio, nome)
+            with contextlib.redirect_stdout(io.StringIO()):
+                artefatos.salvar_artefato(modelo, caminho_artefato)
+            referencia = None
+            for formato, caminho in (('pickle', caminho_pickle), ('artefato', caminho_artefato)):
+                resultado = carregar_em_processo_novo(nome, formato, caminho, consulta)
+                referencia = referencia if referencia is not None else resultado['previstos']
+                print(f'{nome:<8}{formato:<10}{tamanho_mb(caminho):>12.2f}{resultado["carregar_s"] * 1000:>15.1f}'
+                      f'{resultado["primeira_previsao_s"] * 1000:>18.1f}{str(resultado["previstos"] == referencia):>10}',
+                      flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+# Este script mede a vazão (imagens/s) da decodificação até a imagem 256x256 em cinza usada
+# pela extração GLCM, comparando o caminho antigo (ler_imagem colorida + redimensionamento e
+# conversão para cinza), ler_imagem_cinza + redimensionamento e dados.LeitorImagens (direto em
+# cinza, redução no decodificador JPEG, buffer reaproveitado e threads).
+#
+# Uso: python benchmarks/benchmark_decodificacao.py --imagens 64 --resolucao 2048 --formatos jpg png
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modulos.utils import dados  # noqa: E402
+
+
+def gerar_imagens(diretorio, n_imagens, resolucao, formato, semente=0):
+    gerador = np.random.default_rng(semente)
+    caminhos = []
+    for i in range(n_imagens):
+        # Textura suave com ruído fino, mais próxima de uma radiografia que ruído puro
+        ruido = cv2.resize(gerador.normal(0, 1, (resolucao // 32, resolucao // 32, 3)).astype(np.float32), (resolucao, resolucao))
+        ruido += gerador.normal(0, 0.05, ruido.shape).astype(np.float32)
+        imagem = cv2.normalize(ruido, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
+        caminho = os.path.join(diretorio, f'{i:04d}.{formato}')
+        cv2.imwrite(caminho, imagem)
+        caminhos.append(caminho)
+    return caminhos
+
+
+def caminho_antigo(caminho):
+    imagem = dados.ler_imagem(caminho)
+    imagem = cv2.resize(imagem, (256, 256))
+    return cv2.cvtColor(imagem, cv2.COLOR_RGB2GRAY) if imagem.ndim > 2 else imagem
+
+
+def caminho_cinza(caminho):
+    return cv2.resize(dados.ler_imagem_cinza(caminho), (256, 256))
+
+
+def medir(funcao, repeticoes=3):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Vazão da decodificação até 256x256 em cinza')
+    parser.add_argument('--imagens', type=int, default=64)
+    parser.add_argument('--resolucao', type=int, default=2048)
+    parser.add_argument('--formatos', nargs='+', default=['jpg', 'png'])
+    parser.add_argument('--threads', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    print(f'{"formato":<8}{"caminho":<34}{"imagens/s":>12}')
+    for formato in args.formatos:
+        diretorio = tempfile.mkdtemp(prefix='benchmark_decodificacao_')
+        try:
+            caminhos = gerar_imagens(diretorio, args.imagens, args.resolucao, formato)
+            leitor_serial = dados.LeitorImagens(n_threads=1)
+            leitor_threads = dados.LeitorImagens(n_threads=args.threads)
+            configuracoes = [
+                ('ler_imagem + resize + cinza', lambda: [caminho_antigo(caminho) for caminho in caminhos]),
+                ('ler_imagem_cinza + resize', lambda: [caminho_cinza(caminho) for caminho in caminhos]),
+                ('LeitorImagens (1 thread)', lambda: leitor_serial.ler_lote(caminhos)),
+            ]
+            if args.threads > 1:
+                configuracoes.append((f'LeitorImagens ({args.threads} threads)', lambda: leitor_threads.ler_lote(caminhos)))
+            for nome, funcao in configuracoes:
+                print(f'{formato:<8}{nome:<34}{args.imagens / medir(funcao):>12.1f}', flush=True)
+            leitor_threads.fechar()
+        finally:
+            shutil.rmtree(diretorio, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
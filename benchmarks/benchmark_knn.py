@@ -0,0 +1,78 @@
+# Este script compara os modos de busca do KNN (knn.py): força bruta, árvores KD/Ball com
+# diferentes tamanhos de folha e o índice aproximado IVF, reportando consultas/s, ganho em
+# relação à busca exata e recall dos vizinhos em relação ao KNN exato.
+#
+# Uso: python benchmarks/benchmark_knn.py --amostras 100000 --consultas 2000 --dimensoes 50
+
+import os
+import sys
+import time
+import argparse
+import contextlib
+import io
+
+import numpy as np
+from sklearn.datasets import make_blobs
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modulos.classificadores import knn  # noqa: E402
+
+
+def recall(vizinhos, referencia):
+    """
+    Fração dos vizinhos exatos encontrados pela busca avaliada.
+    """
+    acertos = sum(len(np.intersect1d(a, b)) for a, b in zip(vizinhos, referencia))
+    return acertos / referencia.size
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark dos índices de vizinhos do KNN')
+    parser.add_argument('--amostras', type=int, default=100000)
+    parser.add_argument('--consultas', type=int, default=2000)
+    parser.add_argument('--dimensoes', type=int, default=50)
+    parser.add_argument('--vizinhos', type=int, default=5)
+    parser.add_argument('--n_jobs', type=int, default=-1)
+    args = parser.parse_args()
+
+    X, y = make_blobs(n_samples=args.amostras + args.consultas, n_features=args.dimensoes,
+                      centers=200, cluster_std=6.0, random_state=0)
+    X = X.astype(np.float32)
+    X_treino, y_treino = X[:args.amostras], y[:args.amostras]
+    X_consulta = X[args.amostras:]
+
+    configuracoes = [
+        ('brute', {'algoritmo': 'brute'}),
+        ('kd_tree leaf=30', {'algoritmo': 'kd_tree', 'leaf_size': 30}),
+        ('kd_tree leaf=100', {'algoritmo': 'kd_tree', 'leaf_size': 100}),
+        ('ball_tree leaf=40', {'algoritmo': 'ball_tree', 'leaf_size': 40}),
+        ('ivf sondas=4', {'algoritmo': 'ivf', 'n_sondas': 4}),
+        ('ivf sondas=16', {'algoritmo': 'ivf', 'n_sondas': 16}),
+        ('ivf sondas=32', {'algoritmo': 'ivf', 'n_sondas': 32}),
+    ]
+
+    resultados = []
+    referencia = None
+    for nome, parametros in configuracoes:
+        with contextlib.redirect_stdout(io.StringIO()):
+            inicio = time.perf_counter()
+            modelo = knn.treinar_knn(X_treino, y_treino, n_neighbors=args.vizinhos, n_jobs=args.n_jobs, **parametros)
+            tempo_treino = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        previstos = modelo.predict(X_consulta)
+        tempo_previsao = time.perf_counter() - inicio
+        _, vizinhos = modelo.kneighbors(X_consulta, args.vizinhos)
+        if referencia is None:
+            referencia, previstos_exatos = vizinhos, previstos
+        resultados.append((nome, tempo_treino, args.consultas / tempo_previsao, recall(vizinhos, referencia),
+                           np.mean(previstos == previstos_exatos)))
+
+    qps_exato = resultados[0][2]
+    print(f'{args.amostras} amostras de referência, {args.consultas} consultas, {args.dimensoes} dimensões, k={args.vizinhos}')
+    print(f'{"modo":<20}{"treino (s)":>12}{"consultas/s":>14}{"ganho":>9}{"recall":>9}{"concord.":>10}')
+    for nome, tempo_treino, qps, valor_recall, concordancia in resultados:
+        print(f'{nome:<20}{tempo_treino:>12.2f}{qps:>14.0f}{qps / qps_exato:>8.2f}x{valor_recall:>9.3f}{concordancia:>10.3f}')
+
+
+if __name__ == '__main__':
+    main()
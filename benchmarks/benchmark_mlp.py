@@ -0,0 +1,73 @@
+# Este script compara os presets do MLP (mlp.py) com a configuração original (5000 neurônios,
+# até 1000 épocas) em características sintéticas do tamanho da saída do PCA, reportando tempo de
+# treinamento, épocas, tamanho do modelo serializado e acurácia. Também mede o treinamento em
+# lotes (partial_fit) a partir de um np.memmap.
+#
+# Uso: python benchmarks/benchmark_mlp.py --amostras 5000 --presets original compacto medio
+
+import os
+import io
+import sys
+import time
+import pickle
+import argparse
+import tempfile
+import contextlib
+
+import numpy as np
+from sklearn.datasets import make_classification
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modulos.classificadores import mlp  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tempo, tamanho e acurácia dos presets do MLP')
+    parser.add_argument('--amostras', type=int, default=5000)
+    parser.add_argument('--dimensoes', type=int, default=50)
+    parser.add_argument('--classes', type=int, default=4)
+    parser.add_argument('--teste', type=int, default=2000, help='Amostras do conjunto de teste')
+    parser.add_argument('--presets', nargs='+', default=list(mlp.PRESETS_MLP), choices=list(mlp.PRESETS_MLP))
+    args = parser.parse_args()
+
+    X, y = make_classification(n_samples=args.amostras + args.teste, n_features=args.dimensoes,
+                               n_informative=args.dimensoes // 2, n_classes=args.classes, class_sep=1.0,
+                               flip_y=0.02, random_state=0)
+    # Mesmo formato do pipeline: rótulos one-hot
+    Y = np.eye(args.classes, dtype=int)[y]
+    X_teste, y_teste = X[args.amostras:], y[args.amostras:]
+
+    def avaliar(modelo):
+        previstos = mlp.ajustar_amostras_zero(modelo.predict(X_teste))
+        return np.mean(np.argmax(previstos, axis=1) == y_teste)
+
+    def treinar(funcao):
+        with contextlib.redirect_stdout(io.StringIO()):
+            inicio = time.perf_counter()
+            modelo = funcao()
+            return modelo, time.perf_counter() - inicio
+
+    print(f'{"configuração":<26}{"tempo (s)":>10}{"épocas":>8}{"modelo (MB)":>13}{"acurácia":>10}')
+
+    def imprimir(nome, modelo, tempo, epocas):
+        tamanho = len(pickle.dumps(modelo)) / 1024 ** 2
+        print(f'{nome:<26}{tempo:>10.2f}{epocas:>8}{tamanho:>13.2f}{avaliar(modelo):>10.3f}', flush=True)
+
+    for preset in args.presets:
+        for float32 in (False, True):
+            modelo, tempo = treinar(lambda: mlp.treinar_mlp(X[:args.amostras], Y[:args.amostras], preset=preset, float32=float32))
+            imprimir(preset + (' float32' if float32 else ''), modelo, tempo, modelo.n_iter_)
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        caminho = os.path.join(diretorio, 'caracteristicas.npy')
+        np.save(caminho, X[:args.amostras])
+        memmap = np.load(caminho, mmap_mode='r')
+        for preset in args.presets:
+            if preset == 'original':
+                continue
+            modelo, tempo = treinar(lambda: mlp.treinar_mlp_lotes(memmap, Y[:args.amostras], preset=preset, float32=True))
+            imprimir(f'{preset} lotes float32', modelo, tempo, '—')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+# Este script mede o desempenho do pipeline completo (carregamento, extração GLCM, PCA,
+# treinamento e previsão dos quatro classificadores) em um dataset sintético de texturas,
+# grava os resultados em JSON e os compara com uma linha de base para apontar regressões.
+#
+# Uso: python benchmarks/benchmark_pipeline.py --imagens 400 --resolucao 512 --saida resultados.json
+#      python benchmarks/benchmark_pipeline.py --linha_base resultados.json --tolerancia 0.2
+
+import os
+import io
+import sys
+import json
+import time
+import functools
+import shutil
+import argparse
+import platform
+import tempfile
+import resource
+import contextlib
+
+import cv2
+import numpy as np
+import sklearn
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modulos.utils import dados, rotulos  # noqa: E402
+from modulos.descritores import glcm, reducao  # noqa: E402
+from modulos.classificadores import knn, mlp, random_forest, svm  # noqa: E402
+
+# O Random Forest é treinado com todos os núcleos, como no notebook e no pipeline
+CLASSIFICADORES = {
+    'rf': (functools.partial(random_forest.treinar_rf, n_jobs=-1), random_forest.testar_rf),
+    'svm': (svm.treinar_svm, svm.testar_svm),
+    'knn': (knn.treinar_knn, knn.testar_knn),
+    'mlp': (mlp.treinar_mlp, mlp.testar_mlp),
+}
+
+
+def gerar_dataset(diretorio, n_imagens, resolucao, n_classes, semente=0):
+    """
+    Grava imagens PNG sintéticas em diretorio/{train,test}/classe_i. Cada classe tem uma
+    textura própria (escala do desfoque e orientação das listras) com ruído aleatório.
+    """
+    gerador = np.random.default_rng(semente)
+    linhas, colunas = np.mgrid[0:resolucao, 0:resolucao]
+    for i in range(n_imagens):
+        classe = i % n_classes
+        conjunto = 'test' if i % 5 == 0 else 'train'
+        ruido = gerador.normal(0, 1, (resolucao, resolucao)).astype(np.float32)
+        ruido = cv2.GaussianBlur(ruido, (0, 0), 1 + classe % 4)
+        angulo = np.pi * classe / n_classes
+        listras = np.sin((linhas * np.sin(angulo) + colunas * np.cos(angulo)) * (0.05 + 0.02 * classe))
+        imagem = cv2.normalize(ruido + 0.5 * listras, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
+        caminho = os.path.join(diretorio, conjunto, f'classe_{classe}')
+        os.makedirs(caminho, exist_ok=True)
+        cv2.imwrite(os.path.join(caminho, f'{i:06d}.png'), imagem)
+
+
+def pico_rss_mb():
+    """
+    Retorna o pico de memória residente (MB) do processo.
+    """
+    try:
+        with open('/proc/self/status') as arquivo:
+            for linha in arquivo:
+                if linha.startswith('VmHWM:'):
+                    return int(linha.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss é dado em bytes no macOS e em KB nos demais sistemas
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / 1024 ** 2 if sys.platform == 'darwin' else pico / 1024
+
+
+def reiniciar_pico_rss():
+    """
+    Zera o pico de memória residente (Linux), para medir cada etapa isoladamente.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as arquivo:
+            arquivo.write('5')
+    except OSError:
+        pass
+
+
+def medir(nome, funcao, n_itens, repeticoes, resultados):
+    """
+    Executa funcao() `repeticoes` vezes, registrando tempos, percentis, vazão e pico de memória.
+    """
+    tempos = []
+    pico = 0.0
+    retorno = None
+    for _ in range(repeticoes):
+        reiniciar_pico_rss()
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            inicio = time.perf_counter()
+            retorno = funcao()
+            tempos.append(time.perf_counter() - inicio)
+        pico = max(pico, pico_rss_mb())
+    tempos = np.array(tempos)
+    resultados[nome] = {
+        'mediana_s': float(np.median(tempos)),
+        'p90_s': float(np.percentile(tempos, 90)),
+        'min_s': float(tempos.min()),
+        'max_s': float(tempos.max()),
+        'itens': n_itens,
+        'itens_por_s': float(n_itens / np.median(tempos)),
+        'pico_rss_mb': pico,
+    }
+    print(f'{nome:<18}{resultados[nome]["mediana_s"]:>10.3f}s{resultados[nome]["itens_por_s"]:>14.1f}/s'
+          f'{pico:>10.0f} MB')
+    return retorno
+
+
+def comparar(resultados, linha_base, tolerancia):
+    """
+    Compara as medianas com a linha de base e retorna a lista de etapas com regressão.
+    """
+    regressoes = []
+    for nome, medida in resultados.items():
+        base = linha_base.get('etapas', {}).get(nome)
+        if base is None:
+            continue
+        variacao = medida['mediana_s'] / base['mediana_s'] - 1
+        situacao = 'REGRESSÃO' if variacao > tolerancia else 'ok'
+        print(f'{nome:<18}{base["mediana_s"]:>10.3f}s -> {medida["mediana_s"]:.3f}s ({variacao:+.1%}) {situacao}')
+        if variacao > tolerancia:
+            regressoes.append(nome)
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark reprodutível do pipeline GLCM + classificadores')
+    parser.add_argument('--imagens', type=int, default=400, help='Total de imagens sintéticas (20%% vão para teste)')
+    parser.add_argument('--resolucao', type=int, default=512)
+    parser.add_argument('--classes', type=int, default=4)
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--classificadores', nargs='+', default=list(CLASSIFICADORES), choices=list(CLASSIFICADORES))
+    parser.add_argument('--n_jobs', type=int, default=1, help='Processos da extração GLCM')
+    parser.add_argument('--semente', type=int, default=0)
+    parser.add_argument('--saida', default='resultados_benchmark.json')
+    parser.add_argument('--linha_base', default=None, help='JSON de uma execução anterior para comparação')
+    parser.add_argument('--tolerancia', type=float, default=0.2, help='Aumento relativo aceito na mediana')
+    args = parser.parse_args()
+
+    diretorio = tempfile.mkdtemp(prefix='benchmark_glcm_')
+    try:
+        gerar_dataset(diretorio, args.imagens, args.resolucao, args.classes, args.semente)
+        resultados = {}
+        print(f'{"etapa":<18}{"mediana":>11}{"vazão":>16}{"pico RSS":>13}')
+
+        imagens, nomes = medir('carregar_imagens', lambda: dados.carregar_imagens(os.path.join(diretorio, 'train')),
+                               len(dados.listar_imagens(os.path.join(diretorio, 'train'))[0]), args.repeticoes, resultados)
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            imagens_teste, nomes_teste = dados.carregar_imagens(os.path.join(diretorio, 'test'))
+
+        brutas = medir('extrair_glcm', lambda: glcm.extrair_glcm(imagens, n_jobs=args.n_jobs),
+                       len(imagens), args.repeticoes, resultados)
+        brutas_teste = glcm.extrair_glcm(imagens_teste, progresso=False)
+
+        redutor = medir('pca', lambda: reducao.ajustar_redutor(brutas), len(brutas), args.repeticoes, resultados)
+        treino = reducao.aplicar_redutor(redutor, brutas)
+        teste = reducao.aplicar_redutor(redutor, brutas_teste)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            rotulos_label, encoder = rotulos.codificar_rotulos_label(nomes)
+            rotulos_onehot, _ = rotulos.codificar_rotulos_onehot(nomes)
+        verdadeiros = encoder.transform(nomes_teste)
+
+        acuracias = {}
+        for nome in args.classificadores:
+            treinar, testar = CLASSIFICADORES[nome]
+            alvo = rotulos_onehot if nome == 'mlp' else rotulos_label
+            modelo = medir(f'treinar_{nome}', lambda: treinar(treino, alvo), len(treino), args.repeticoes, resultados)
+            previstos = medir(f'testar_{nome}', lambda: testar(modelo, teste), len(teste), args.repeticoes, resultados)
+            if nome == 'mlp':
+                previstos = np.argmax(mlp.ajustar_amostras_zero(previstos), axis=1)
+            acuracias[nome] = float(np.mean(previstos == verdadeiros))
+    finally:
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+    relatorio = {
+        'configuracao': vars(args),
+        'ambiente': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'scikit-learn': sklearn.__version__,
+            'opencv': cv2.__version__,
+            'plataforma': platform.platform(),
+            'processador': platform.processor(),
+            'nucleos': os.cpu_count(),
+        },
+        'etapas': resultados,
+        'acuracias': acuracias,
+    }
+    with open(args.saida, 'w', encoding='utf-8') as arquivo:
+        json.dump(relatorio, arquivo, indent=2)
+    print(f'Acurácias: {acuracias}')
+    print(f'Resultados salvos em: {args.saida}')
+
+    if args.linha_base:
+        with open(args.linha_base, encoding='utf-8') as arquivo:
+            linha_base = json.load(arquivo)
+        regressoes = comparar(resultados, linha_base, args.tolerancia)
+        if regressoes:
+            raise SystemExit(f'Regressões de desempenho em: {", ".join(regressoes)}')
+
+
+if __name__ == '__main__':
+    main()
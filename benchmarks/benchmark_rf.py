@@ -0,0 +1,67 @@
+# Este script compara a previsão do RandomForestClassifier (scikit-learn) com a da floresta
+# compilada em arrays planos (random_forest.FlorestaCompilada) para lotes de 1, 64 e 10000
+# amostras, reportando a vazão (amostras/s) e conferindo se as probabilidades são idênticas.
+#
+# Uso: python benchmarks/benchmark_rf.py --amostras 20000 --arvores 100 --lotes 1 64 10000
+
+import os
+import io
+import sys
+import time
+import argparse
+import contextlib
+
+import numpy as np
+from sklearn.datasets import make_classification
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modulos.classificadores import random_forest  # noqa: E402
+
+
+def vazao(funcao, consultas, tamanho_lote, tempo_minimo):
+    """
+    Chama funcao em lotes de tamanho_lote até somar tempo_minimo segundos e retorna amostras/s.
+    """
+    n_amostras, inicio, posicao = 0, time.perf_counter(), 0
+    while time.perf_counter() - inicio < tempo_minimo:
+        if posicao + tamanho_lote > len(consultas):
+            posicao = 0
+        funcao(consultas[posicao:posicao + tamanho_lote])
+        posicao += tamanho_lote
+        n_amostras += tamanho_lote
+    return n_amostras / (time.perf_counter() - inicio)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Vazão de previsão: scikit-learn x floresta compilada')
+    parser.add_argument('--amostras', type=int, default=20000, help='Amostras de treinamento')
+    parser.add_argument('--dimensoes', type=int, default=50)
+    parser.add_argument('--classes', type=int, default=4)
+    parser.add_argument('--arvores', type=int, default=100)
+    parser.add_argument('--lotes', type=int, nargs='+', default=[1, 64, 10000])
+    parser.add_argument('--n_jobs', type=int, default=None, help='Threads da floresta compilada')
+    parser.add_argument('--tempo', type=float, default=2.0, help='Segundos medidos por configuração')
+    args = parser.parse_args()
+
+    X, y = make_classification(n_samples=args.amostras + 10000, n_features=args.dimensoes,
+                               n_informative=args.dimensoes // 2, n_classes=args.classes, random_state=0)
+    consultas = X[args.amostras:]
+    with contextlib.redirect_stdout(io.StringIO()):
+        modelo = random_forest.treinar_rf(X[:args.amostras], y[:args.amostras], n_estimators=args.arvores, n_jobs=-1)
+    # A previsão de referência do scikit-learn é sequencial (a soma com threads não tem ordem fixa)
+    modelo.set_params(n_jobs=None)
+    inicio = time.perf_counter()
+    floresta = random_forest.compilar_rf(modelo, n_jobs=args.n_jobs)
+    print(f'Compilação: {time.perf_counter() - inicio:.2f}s, {len(floresta.nos_)} nós')
+    identicas = np.array_equal(modelo.predict_proba(consultas), floresta.predict_proba(consultas))
+    print(f'Probabilidades idênticas às do scikit-learn: {identicas}')
+
+    print(f'{"lote":>8}{"scikit-learn (/s)":>20}{"compilada (/s)":>17}{"ganho":>8}')
+    for tamanho_lote in args.lotes:
+        referencia = vazao(modelo.predict, consultas, tamanho_lote, args.tempo)
+        compilada = vazao(floresta.predict, consultas, tamanho_lote, args.tempo)
+        print(f'{tamanho_lote:>8}{referencia:>20.0f}{compilada:>17.0f}{compilada / referencia:>7.1f}x', flush=True)
+
+
+if __name__ == '__main__':
+    main()
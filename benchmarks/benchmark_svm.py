@@ -0,0 +1,53 @@
+# Este script mede a curva de tempo de treinamento do SVM (svm.py) em função do número de
+# amostras para os modos 'svc' (libsvm), 'linear' (LinearSVC) e 'sgd' (SGD com partial_fit),
+# reportando também a acurácia em um conjunto de teste fixo.
+#
+# Uso: python benchmarks/benchmark_svm.py --amostras 1000 5000 20000 100000 --limite_svc 20000
+
+import os
+import io
+import sys
+import time
+import argparse
+import contextlib
+
+import numpy as np
+from sklearn.datasets import make_classification
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modulos.classificadores import svm  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Curva de tempo de treinamento dos modos do SVM')
+    parser.add_argument('--amostras', type=int, nargs='+', default=[1000, 2000, 5000, 10000, 20000, 50000, 100000])
+    parser.add_argument('--dimensoes', type=int, default=50)
+    parser.add_argument('--classes', type=int, default=3)
+    parser.add_argument('--teste', type=int, default=5000, help='Amostras do conjunto de teste')
+    parser.add_argument('--modos', nargs='+', default=['svc', 'linear', 'sgd'])
+    parser.add_argument('--limite_svc', type=int, default=20000, help='Maior número de amostras treinado no modo svc')
+    args = parser.parse_args()
+
+    maior = max(args.amostras)
+    X, y = make_classification(n_samples=maior + args.teste, n_features=args.dimensoes, n_informative=args.dimensoes // 2,
+                               n_classes=args.classes, class_sep=0.8, flip_y=0.02, random_state=0)
+    X_teste, y_teste = X[maior:], y[maior:]
+
+    print(f'{"amostras":>10}' + ''.join(f'{modo + " (s)":>14}{"acurácia":>10}' for modo in args.modos))
+    for n_amostras in sorted(args.amostras):
+        linha = f'{n_amostras:>10}'
+        for modo in args.modos:
+            if modo == 'svc' and n_amostras > args.limite_svc:
+                linha += f'{"—":>14}{"—":>10}'
+                continue
+            with contextlib.redirect_stdout(io.StringIO()):
+                inicio = time.perf_counter()
+                modelo = svm.treinar_svm(X[:n_amostras], y[:n_amostras], modo=modo)
+                tempo = time.perf_counter() - inicio
+            acuracia = np.mean(modelo.predict(X_teste) == y_teste)
+            linha += f'{tempo:>14.2f}{acuracia:>10.3f}'
+        print(linha, flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+# Este script gera carga no servidor de inferência local (modulos/inferencia/servidor.py)
+# e mede vazão (QPS) e latências observadas pelos clientes.
+#
+# Uso: python benchmarks/carga_servidor.py --url http://127.0.0.1:8000 --clientes 32 --duracao 10
+#      python benchmarks/carga_servidor.py --imagem exemplo.png
+
+import time
+import json
+import asyncio
+import argparse
+from urllib.parse import urlparse
+
+import cv2
+import numpy as np
+
+
+async def requisitar(leitor, escritor, host, metodo, rota, corpo=b''):
+    """
+    Envia uma requisição HTTP/1.1 em uma conexão persistente e retorna (status, json).
+    """
+    escritor.write(
+        f'{metodo} {rota} HTTP/1.1\r\nHost: {host}\r\nContent-Length: {len(corpo)}\r\n'
+        f'Content-Type: application/octet-stream\r\n\r\n'.encode() + corpo
+    )
+    await escritor.drain()
+    status = int((await leitor.readline()).split()[1])
+    tamanho = 0
+    while True:
+        linha = await leitor.readline()
+        if linha in (b'\r\n', b''):
+            break
+        nome, _, valor = linha.decode('latin-1').partition(':')
+        if nome.strip().lower() == 'content-length':
+            tamanho = int(valor)
+    return status, json.loads(await leitor.readexactly(tamanho))
+
+
+async def cliente(host, porta, corpo, fim, latencias, erros):
+    leitor, escritor = await asyncio.open_connection(host, porta)
+    try:
+        while time.monotonic() < fim:
+            inicio = time.perf_counter()
+            status, _ = await requisitar(leitor, escritor, host, 'POST', '/prever', corpo)
+            if status == 200:
+                latencias.append(time.perf_counter() - inicio)
+            else:
+                erros.append(status)
+    finally:
+        escritor.close()
+
+
+async def executar(url, n_clientes, duracao, corpo):
+    endereco = urlparse(url)
+    host, porta = endereco.hostname, endereco.port or 80
+    latencias, erros = [], []
+    inicio = time.monotonic()
+    await asyncio.gather(*[cliente(host, porta, corpo, inicio + duracao, latencias, erros) for _ in range(n_clientes)])
+    tempo_total = time.monotonic() - inicio
+
+    leitor, escritor = await asyncio.open_connection(host, porta)
+    _, metricas_servidor = await requisitar(leitor, escritor, host, 'GET', '/metricas')
+    escritor.close()
+
+    latencias_ms = np.array(latencias) * 1000
+    return {
+        'clientes': n_clientes,
+        'requisicoes': len(latencias),
+        'erros': len(erros),
+        'qps': len(latencias) / tempo_total,
+        'latencia_p50_ms': float(np.percentile(latencias_ms, 50)) if len(latencias_ms) else None,
+        'latencia_p99_ms': float(np.percentile(latencias_ms, 99)) if len(latencias_ms) else None,
+        'servidor': metricas_servidor,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Gerador de carga para o servidor de inferência')
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--clientes', type=int, default=16, help='Conexões simultâneas')
+    parser.add_argument('--duracao', type=float, default=10, help='Duração do teste em segundos')
+    parser.add_argument('--imagem', default=None, help='Arquivo de imagem enviado (default: textura sintética 512x512)')
+    args = parser.parse_args()
+
+    if args.imagem:
+        with open(args.imagem, 'rb') as arquivo:
+            corpo = arquivo.read()
+    else:
+        ruido = np.random.default_rng(0).integers(0, 256, (512, 512), dtype=np.uint8)
+        corpo = cv2.imencode('.png', cv2.GaussianBlur(ruido, (0, 0), 2))[1].tobytes()
+
+    resultado = asyncio.run(executar(args.url, args.clientes, args.duracao, corpo))
+    print(json.dumps(resultado, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,262 @@
+# Este módulo executa a busca de hiperparâmetros dos classificadores com validação cruzada
+# As combinações (grade, sorteio aleatório ou successive halving) e os folds são avaliados
+# em paralelo por processos que leem as características de arquivos mapeados em memória,
+# e o resultado é uma tabela ordenada por acurácia com os tempos de treino e previsão
+
+import io
+import os
+import math
+import shutil
+import tempfile
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import ParameterGrid, ParameterSampler, StratifiedKFold
+
+from modulos.classificadores import knn, mlp, random_forest, svm
+from modulos.descritores import glcm, reducao
+from modulos.utils import instrumentacao
+
+TREINADORES = {
+    'knn': knn.treinar_knn,
+    'svm': svm.treinar_svm,
+    'rf': random_forest.treinar_rf,
+    'mlp': mlp.treinar_mlp,
+}
+
+# Grades usadas quando nenhuma é informada
+GRADES_PADRAO = {
+    'knn': {'n_neighbors': [1, 3, 5, 7, 11, 15]},
+    'svm': {'kernel': ['linear', 'rbf'], 'C': [0.1, 1, 10, 100]},
+    'rf': {'n_estimators': [100, 300], 'max_depth': [None, 20], 'max_features': ['sqrt', 'log2']},
+    'mlp': {'hidden_layer_sizes': [(100,), (500,), (5000,)], 'alpha': [0.0001, 0.001, 0.01]},
+}
+
+def buscar_hiperparametros(caracteristicas, rotulos, classificador, grade=None, estrategia='grade', n_candidatos=20, fator=3, n_folds=5, n_componentes=50, n_jobs=-1, random_state=42, caminho_resultado=None):
+    """
+    Avalia combinações de hiperparâmetros de um classificador com validação cruzada estratificada.
+
+    O redutor PCA é ajustado uma única vez por fold, no processo principal, e as matrizes
+    transformadas de cada fold são gravadas em arquivos .npy temporários. Os processos
+    auxiliares as abrem com mmap, de modo que todos compartilham as mesmas páginas em memória
+    e nenhuma matriz é serializada entre processos. Sem PCA (n_componentes=None), todos os
+    folds leem a mesma matriz de características mapeada.
+
+    Parâmetros:
+    - caracteristicas: Matriz (n_amostras, n_caracteristicas) com as características brutas
+                       (array numpy ou np.memmap, como o de dados.abrir_armazenamento).
+    - rotulos: Rótulos codificados de cada amostra.
+    - classificador (str): 'knn', 'svm', 'rf' ou 'mlp'.
+    - grade (dict): Valores de cada hiperparâmetro de treinar_<classificador>. Com estrategia
+                    'aleatoria' ou 'halving' aceita também distribuições do scipy.stats.
+                    Default é GRADES_PADRAO[classificador].
+    - estrategia (str): 'grade' (todas as combinações), 'aleatoria' (n_candidatos sorteados) ou
+                        'halving' (successive halving: todos os candidatos começam com uma fração
+                        das amostras de treino e apenas os 1/fator melhores seguem para a rodada
+                        seguinte, com fator vezes mais amostras). Default é 'grade'.
+    - n_candidatos (int): Combinações sorteadas nas estratégias 'aleatoria' e 'halving'
+                          (limitado ao tamanho da grade quando ela só tem listas). Default é 20.
+    - fator (int): Fator de redução do successive halving. Default é 3.
+    - n_folds (int): Número de folds da validação cruzada. Default é 5.
+    - n_componentes (int): Componentes do PCA ajustado em cada fold (None = sem PCA). Default é 50.
+    - n_jobs (int): Processos usados na avaliação (-1 usa todos os núcleos). Default é -1.
+    - random_state (int): Semente dos folds e dos sorteios. Default é 42.
+    - caminho_resultado (str): Caminho de um CSV para salvar a tabela. Default é None.
+
+    Retorno:
+    - pandas.DataFrame com uma linha por combinação avaliada na última rodada, ordenada por
+      acurácia média (e tempo de treino nos empates), com as colunas: parametros, acuracia_media,
+      acuracia_desvio, tempo_treino_s, tempo_previsao_s (médias por fold), amostras_treino e rodada.
+    """
+    if classificador not in TREINADORES:
+        raise ValueError(f'{classificador} não é um classificador válido. Opções: {list(TREINADORES)}')
+    grade = grade if grade is not None else GRADES_PADRAO[classificador]
+    candidatos = _gerar_candidatos(grade, estrategia, n_candidatos, random_state)
+    rotulos = np.asarray(rotulos)
+    n_processos = (os.cpu_count() or 1) if n_jobs is None or n_jobs < 0 else max(1, n_jobs)
+
+    print(f'Buscando hiperparâmetros do {classificador.upper()}: {len(candidatos)} combinações, '
+          f'{n_folds} folds, estratégia {estrategia}...')
+    diretorio = tempfile.mkdtemp(prefix='busca_')
+    try:
+        with instrumentacao.intervalo('busca.preparar_folds', folds=n_folds) as medicao:
+            folds = _preparar_folds(caracteristicas, rotulos, n_folds, n_componentes, random_state, diretorio)
+        print(f'Folds preparados em {round(medicao.duracao, 2)}s')
+
+        n_treino = min(fold['n_treino'] for fold in folds)
+        rodadas, amostras = 1, n_treino
+        if estrategia == 'halving':
+            # Rodadas até restarem no máximo `fator` candidatos, que usam todas as amostras de treino
+            n_restantes = len(candidatos)
+            while n_restantes > fator:
+                n_restantes = math.ceil(n_restantes / fator)
+                rodadas += 1
+            amostras = max(n_treino // fator ** (rodadas - 1), 2 * len(np.unique(rotulos)))
+
+        # Mesmo método de início dos processos da extração GLCM (forkserver, quando possível)
+        contexto = glcm._contexto_processos((__name__,))
+        with ProcessPoolExecutor(max_workers=n_processos, mp_context=contexto) as executor:
+            for rodada in range(1, rodadas + 1):
+                amostras = min(amostras, n_treino)
+                with instrumentacao.intervalo('busca.rodada', candidatos=len(candidatos), amostras=amostras) as medicao:
+                    tabela = _avaliar_candidatos(executor, classificador, candidatos, folds, amostras, rodada)
+                print(f'Rodada {rodada}/{rodadas}: {len(candidatos)} combinações com {amostras} amostras '
+                      f'de treino avaliadas em {round(medicao.duracao, 2)}s')
+                if rodada == rodadas or len(candidatos) == 1:
+                    break
+                # Mantém apenas os melhores candidatos para a próxima rodada
+                n_mantidos = max(1, math.ceil(len(candidatos) / fator))
+                candidatos = [candidatos[i] for i in tabela.index[:n_mantidos]]
+                amostras *= fator
+    finally:
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+    tabela = tabela.reset_index(drop=True)
+    tabela.index += 1
+    tabela.index.name = 'posicao'
+    print(tabela.to_string(float_format=lambda valor: f'{valor:.4f}'))
+    if caminho_resultado:
+        diretorio_resultado = os.path.dirname(caminho_resultado)
+        if diretorio_resultado:
+            os.makedirs(diretorio_resultado, exist_ok=True)
+        tabela.to_csv(caminho_resultado)
+        print(f'Resultados salvos em: {caminho_resultado}')
+    return tabela
+
+def _gerar_candidatos(grade, estrategia, n_candidatos, random_state):
+    """
+    Gera a lista de combinações de hiperparâmetros a avaliar.
+    """
+    if estrategia == 'grade':
+        return list(ParameterGrid(grade))
+    if estrategia in ('aleatoria', 'halving'):
+        if all(isinstance(valores, (list, tuple)) for valores in grade.values()):
+            n_candidatos = min(n_candidatos, len(ParameterGrid(grade)))
+        # Converte escalares NumPy sorteados das distribuições em tipos Python (tabela legível)
+        return [{nome: valor.item() if isinstance(valor, np.generic) else valor for nome, valor in parametros.items()}
+                for parametros in ParameterSampler(grade, n_candidatos, random_state=random_state)]
+    raise ValueError(f"{estrategia} não é uma estratégia válida. Opções: 'grade', 'aleatoria', 'halving'")
+
+def _preparar_folds(caracteristicas, rotulos, n_folds, n_componentes, random_state, diretorio):
+    """
+    Divide as amostras em folds estratificados, ajusta o PCA de cada fold e grava as matrizes
+    em arquivos .npy no diretório temporário.
+
+    Retorno:
+    - Lista de dicionários com os caminhos e o número de amostras de treino de cada fold.
+    """
+    gerador = np.random.default_rng(random_state)
+    divisor = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=random_state)
+
+    caminho_compartilhado = None
+    if n_componentes is None:
+        # Sem PCA, todos os folds leem a mesma matriz; um .npy aberto inteiro com memória mapeada
+        # é reaproveitado, e qualquer outro array (inclusive uma fatia do memmap) é gravado
+        caminho_compartilhado = _arquivo_npy_completo(caracteristicas)
+        if caminho_compartilhado is None:
+            caminho_compartilhado = os.path.join(diretorio, 'caracteristicas.npy')
+            np.save(caminho_compartilhado, np.asarray(caracteristicas))
+
+    folds = []
+    for k, (treino, teste) in enumerate(divisor.split(np.zeros(len(rotulos)), rotulos)):
+        # Embaralha o treino para que os prefixos usados no successive halving sejam amostras aleatórias
+        treino = gerador.permutation(treino)
+        fold = {'n_treino': len(treino)}
+        if caminho_compartilhado is not None:
+            fold['caracteristicas'] = str(caminho_compartilhado)
+            fold['indices_treino'] = os.path.join(diretorio, f'fold{k}_indices_treino.npy')
+            fold['indices_teste'] = os.path.join(diretorio, f'fold{k}_indices_teste.npy')
+            np.save(fold['indices_treino'], treino)
+            np.save(fold['indices_teste'], teste)
+        else:
+            caracteristicas_treino = np.asarray(caracteristicas[treino])
+            with contextlib.redirect_stdout(io.StringIO()):
+                redutor = reducao.ajustar_redutor(caracteristicas_treino, n_componentes)
+            fold['treino'] = os.path.join(diretorio, f'fold{k}_treino.npy')
+            fold['teste'] = os.path.join(diretorio, f'fold{k}_teste.npy')
+            np.save(fold['treino'], reducao.aplicar_redutor(redutor, caracteristicas_treino))
+            np.save(fold['teste'], reducao.aplicar_redutor(redutor, caracteristicas[teste]))
+        fold['rotulos_treino'] = os.path.join(diretorio, f'fold{k}_rotulos_treino.npy')
+        fold['rotulos_teste'] = os.path.join(diretorio, f'fold{k}_rotulos_teste.npy')
+        np.save(fold['rotulos_treino'], rotulos[treino])
+        np.save(fold['rotulos_teste'], rotulos[teste])
+        folds.append(fold)
+    return folds
+
+def _arquivo_npy_completo(caracteristicas):
+    """
+    Retorna o caminho do .npy se o array for o arquivo inteiro aberto com memória mapeada, ou None.
+
+    Fatias de um np.memmap mantêm o filename do arquivo original, por isso o deslocamento, a forma,
+    o dtype e a contiguidade são comparados com o cabeçalho do arquivo.
+    """
+    caminho = getattr(caracteristicas, 'filename', None)
+    if not isinstance(caracteristicas, np.memmap) or caminho is None or not str(caminho).endswith('.npy'):
+        return None
+    try:
+        with open(caminho, 'rb') as arquivo:
+            versao = np.lib.format.read_magic(arquivo)
+            ler_cabecalho = np.lib.format.read_array_header_1_0 if versao == (1, 0) else np.lib.format.read_array_header_2_0
+            forma, ordem_fortran, dtype = ler_cabecalho(arquivo)
+            inicio_dados = arquivo.tell()
+    except (OSError, ValueError):
+        return None
+    if (caracteristicas.offset != inicio_dados or tuple(caracteristicas.shape) != tuple(forma) or ordem_fortran
+            or caracteristicas.dtype != dtype or not caracteristicas.flags['C_CONTIGUOUS']):
+        return None
+    return caminho
+
+def _avaliar_candidatos(executor, classificador, candidatos, folds, amostras, rodada):
+    """
+    Avalia todas as combinações em todos os folds e agrega os resultados por combinação.
+    """
+    tarefas = {
+        (i, k): executor.submit(_avaliar, classificador, parametros, fold, amostras)
+        for i, parametros in enumerate(candidatos)
+        for k, fold in enumerate(folds)
+    }
+    linhas = []
+    for i, parametros in enumerate(candidatos):
+        resultados = np.array([tarefas[(i, k)].result() for k in range(len(folds))])
+        linhas.append({
+            'parametros': str(parametros),
+            'acuracia_media': resultados[:, 0].mean(),
+            'acuracia_desvio': resultados[:, 0].std(),
+            'tempo_treino_s': resultados[:, 1].mean(),
+            'tempo_previsao_s': resultados[:, 2].mean(),
+            'amostras_treino': amostras,
+            'rodada': rodada,
+        })
+    tabela = pd.DataFrame(linhas)
+    return tabela.sort_values(['acuracia_media', 'tempo_treino_s'], ascending=[False, True], kind='stable')
+
+def _avaliar(classificador, parametros, fold, amostras):
+    """
+    Executado em um processo auxiliar: treina o classificador nas primeiras `amostras` amostras
+    de treino do fold e mede a acurácia no teste.
+
+    Retorno:
+    - Tupla (acurácia, tempo de treino, tempo de previsão).
+    """
+    instrumentacao.configurar(ativo=False, saidas=[])
+    rotulos_treino = np.load(fold['rotulos_treino'], mmap_mode='r')[:amostras]
+    rotulos_teste = np.load(fold['rotulos_teste'], mmap_mode='r')
+    if 'caracteristicas' in fold:
+        caracteristicas = np.load(fold['caracteristicas'], mmap_mode='r')
+        treino = caracteristicas[np.load(fold['indices_treino'])[:amostras]]
+        teste = caracteristicas[np.load(fold['indices_teste'])]
+    else:
+        treino = np.load(fold['treino'], mmap_mode='r')[:amostras]
+        teste = np.load(fold['teste'], mmap_mode='r')
+
+    if classificador == 'rf':
+        # Cada processo já avalia um candidato; threads adicionais do Random Forest só competiriam pelos núcleos
+        parametros = {'n_jobs': 1, **parametros}
+    with contextlib.redirect_stdout(io.StringIO()):
+        with instrumentacao.intervalo('busca.treinar') as treinamento:
+            modelo = TREINADORES[classificador](treino, rotulos_treino, **parametros)
+        with instrumentacao.intervalo('busca.prever') as previsao:
+            previstos = modelo.predict(teste)
+    return np.mean(previstos == rotulos_teste), treinamento.duracao, previsao.duracao
@@ -1,19 +1,228 @@
-import time
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans
 from sklearn.neighbors import KNeighborsClassifier
+from modulos.utils import instrumentacao
 
-def treinar_knn(caracteristicas, rotulos, n_neighbors=5):
+def treinar_knn(caracteristicas, rotulos, n_neighbors=5, algoritmo='auto', leaf_size=30, n_jobs=None, n_listas=None, n_sondas=8):
+    """
+    Treina um classificador KNN, construindo o índice de vizinhos no treinamento.
+
+    Parâmetros:
+    - caracteristicas: Matriz (n_amostras, n_caracteristicas) de treinamento.
+    - rotulos: Rótulos codificados de cada amostra.
+    - n_neighbors (int): Número de vizinhos. Default é 5.
+    - algoritmo (str): 'auto', 'brute', 'kd_tree' ou 'ball_tree' (scikit-learn, busca exata) ou
+                       'ivf' (índice aproximado KNNIVF). Default é 'auto'.
+    - leaf_size (int): Tamanho das folhas das árvores KD/Ball. Default é 30.
+    - n_jobs (int): Processos/threads usados na previsão (-1 usa todos os núcleos). Default é None.
+    - n_listas (int): Número de listas invertidas do índice 'ivf'. Default é sqrt(n_amostras).
+    - n_sondas (int): Listas visitadas por consulta no índice 'ivf'. Default é 8.
+
+    Retorno:
+    - modelo_knn: Modelo treinado (KNeighborsClassifier ou KNNIVF), com o índice já construído.
+    """
     print('Treinando o modelo KNN...')
-    modelo_knn = KNeighborsClassifier(n_neighbors=n_neighbors)
-    startTime = time.time()
-    modelo_knn.fit(caracteristicas, rotulos)
-    elapsedTime = round(time.time() - startTime, 2)
+    if algoritmo == 'ivf':
+        modelo_knn = KNNIVF(n_neighbors=n_neighbors, n_listas=n_listas, n_sondas=n_sondas, n_jobs=n_jobs)
+    else:
+        modelo_knn = KNeighborsClassifier(n_neighbors=n_neighbors, algorithm=algoritmo, leaf_size=leaf_size, n_jobs=n_jobs)
+    with instrumentacao.intervalo('knn.treinar', amostras=len(caracteristicas)) as medicao:
+        modelo_knn.fit(caracteristicas, rotulos)
+    elapsedTime = round(medicao.duracao, 2)
     print(f'Treinamento realizado em {elapsedTime}s')
     return modelo_knn
 
 def testar_knn(modelo_knn, caracteristicas):
     print('Iniciando previsão...')
-    startTime = time.time()
-    rotulos_previstos = modelo_knn.predict(caracteristicas)
-    elapsedTime = round(time.time() - startTime, 2)
+    # Um KNN carregado de um artefato guarda a base em float32; consultas do mesmo tipo evitam
+    # o caminho lento do scikit-learn para tipos mistos
+    base = getattr(modelo_knn, '_fit_X', None)
+    if base is not None and base.dtype == np.float32:
+        caracteristicas = np.asarray(caracteristicas, dtype=np.float32)
+    with instrumentacao.intervalo('knn.prever', amostras=len(caracteristicas)) as medicao:
+        rotulos_previstos = modelo_knn.predict(caracteristicas)
+    elapsedTime = round(medicao.duracao, 2)
     print(f'Previsão encerrada em {elapsedTime}s')
-    return rotulos_previstos
\ No newline at end of file
+    return rotulos_previstos
+
+def atualizar_knn(modelo_knn, caracteristicas, rotulos):
+    """
+    Insere novas amostras em um KNN já treinado, sem treiná-lo do zero.
+
+    No KNNIVF as amostras são inseridas nas células dos centróides mais próximos (o k-means não
+    é refeito). No KNeighborsClassifier a base é estendida e o índice reconstruído, o que para o
+    algoritmo 'brute' se resume a concatenar as matrizes. Rótulos de classes novas são aceitos.
+
+    Parâmetros:
+    - modelo_knn: Modelo treinado (KNeighborsClassifier ou KNNIVF), atualizado no lugar.
+    - caracteristicas: Matriz (n_novas, n_caracteristicas) das novas amostras.
+    - rotulos: Rótulos codificados das novas amostras.
+
+    Retorno:
+    - modelo_knn: O mesmo modelo, com as novas amostras.
+    """
+    print('Atualizando o modelo KNN...')
+    with instrumentacao.intervalo('knn.atualizar', amostras=len(caracteristicas)) as medicao:
+        if isinstance(modelo_knn, KNNIVF):
+            modelo_knn.adicionar(caracteristicas, rotulos)
+        else:
+            if modelo_knn.outputs_2d_:
+                raise ValueError('A atualização do KNN requer um modelo treinado com códigos de rótulos (1D).')
+            base = modelo_knn._fit_X
+            rotulos_base = modelo_knn.classes_[modelo_knn._y]
+            modelo_knn.fit(np.concatenate([base, np.asarray(caracteristicas, dtype=base.dtype)]),
+                           np.concatenate([rotulos_base, np.asarray(rotulos)]))
+    elapsedTime = round(medicao.duracao, 2)
+    print(f'Atualização realizada em {elapsedTime}s')
+    return modelo_knn
+
+
+class KNNIVF:
+    """
+    Classificador KNN aproximado com índice de listas invertidas (IVF), implementado com NumPy.
+
+    No treinamento as amostras são agrupadas por k-means em n_listas células e armazenadas
+    contiguamente por célula. Cada consulta visita apenas as n_sondas células de centróide
+    mais próximo, de modo que o custo de previsão cresce com n_sondas / n_listas da base e
+    não com a base inteira. A votação segue a do KNeighborsClassifier (pesos uniformes).
+
+    Parâmetros:
+    - n_neighbors (int): Número de vizinhos. Default é 5.
+    - n_listas (int): Número de células do índice. Default é sqrt(n_amostras).
+    - n_sondas (int): Células visitadas por consulta (mais sondas = maior recall). Default é 8.
+    - n_jobs (int): Threads usadas para processar lotes de consultas (-1 usa todos os núcleos). Default é None (1).
+    - tamanho_lote (int): Consultas processadas por lote. Default é 1024.
+    - random_state (int): Semente do k-means. Default é 42.
+    """
+
+    def __init__(self, n_neighbors=5, n_listas=None, n_sondas=8, n_jobs=None, tamanho_lote=1024, random_state=42):
+        self.n_neighbors = n_neighbors
+        self.n_listas = n_listas
+        self.n_sondas = n_sondas
+        self.n_jobs = n_jobs
+        self.tamanho_lote = tamanho_lote
+        self.random_state = random_state
+
+    def fit(self, caracteristicas, rotulos):
+        caracteristicas = np.asarray(caracteristicas, dtype=np.float32)
+        self.classes_, rotulos_codificados = np.unique(np.asarray(rotulos), return_inverse=True)
+        n_listas = self.n_listas or max(1, int(np.sqrt(len(caracteristicas))))
+        n_listas = min(n_listas, len(caracteristicas))
+
+        # Quantizador grosso: cada amostra pertence à célula do centróide mais próximo
+        kmeans = MiniBatchKMeans(n_clusters=n_listas, random_state=self.random_state, n_init=3,
+                                 batch_size=max(1024, 4 * n_listas))
+        celulas = kmeans.fit_predict(caracteristicas)
+        self.centroides_ = kmeans.cluster_centers_.astype(np.float32)
+
+        # Armazena as amostras ordenadas por célula, com o deslocamento de início de cada uma
+        ordem = np.argsort(celulas, kind='stable')
+        self.dados_ = np.ascontiguousarray(caracteristicas[ordem])
+        self.normas_ = np.einsum('ij,ij->i', self.dados_, self.dados_)
+        self.rotulos_ = rotulos_codificados[ordem].astype(np.intp)
+        self.indices_ = ordem
+        self.inicios_ = np.concatenate([[0], np.cumsum(np.bincount(celulas, minlength=n_listas))])
+        return self
+
+    def adicionar(self, caracteristicas, rotulos):
+        """
+        Insere amostras no índice, cada uma na célula do centróide mais próximo, sem refazer o
+        k-means. Os índices de treinamento das novas amostras continuam a numeração existente.
+        Classes novas são incorporadas mantendo classes_ ordenado, como no fit.
+        """
+        caracteristicas = np.atleast_2d(np.asarray(caracteristicas, dtype=np.float32))
+        rotulos = np.asarray(rotulos)
+        classes = np.union1d(self.classes_, rotulos)
+        if len(classes) != len(self.classes_):
+            # Renumera os códigos internos para a nova lista ordenada de classes
+            self.rotulos_ = np.searchsorted(classes, self.classes_)[self.rotulos_]
+            self.classes_ = classes
+        rotulos_codificados = np.searchsorted(self.classes_, rotulos)
+
+        normas = np.einsum('ij,ij->i', caracteristicas, caracteristicas)
+        celulas = np.argmin(-2 * caracteristicas @ self.centroides_.T
+                            + np.einsum('ij,ij->i', self.centroides_, self.centroides_), axis=1)
+        n_listas = len(self.centroides_)
+        celulas_atuais = np.repeat(np.arange(n_listas), np.diff(self.inicios_))
+
+        # Reordena a base estendida por célula; a ordem estável mantém as novas amostras no fim de cada célula
+        ordem = np.argsort(np.concatenate([celulas_atuais, celulas]), kind='stable')
+        self.dados_ = np.ascontiguousarray(np.concatenate([self.dados_, caracteristicas])[ordem])
+        self.normas_ = np.concatenate([self.normas_, normas])[ordem]
+        self.rotulos_ = np.concatenate([self.rotulos_, rotulos_codificados]).astype(np.intp)[ordem]
+        novos_indices = np.arange(len(self.indices_), len(self.indices_) + len(caracteristicas))
+        self.indices_ = np.concatenate([self.indices_, novos_indices])[ordem]
+        self.inicios_ = self.inicios_ + np.concatenate([[0], np.cumsum(np.bincount(celulas, minlength=n_listas))])
+        return self
+
+    def kneighbors(self, caracteristicas, n_neighbors=None):
+        """
+        Retorna (distâncias, índices) dos vizinhos aproximados, com índices relativos ao treinamento.
+        """
+        distancias, posicoes = self._buscar(caracteristicas, n_neighbors or self.n_neighbors)
+        indices = np.where(posicoes >= 0, self.indices_[np.maximum(posicoes, 0)], -1)
+        return distancias, indices
+
+    def predict(self, caracteristicas):
+        _, posicoes = self._buscar(caracteristicas, self.n_neighbors)
+        # Votação uniforme; em caso de empate vence a menor classe, como no scikit-learn
+        votos = np.zeros((len(posicoes), len(self.classes_)), dtype=np.intp)
+        validos = posicoes >= 0
+        linhas = np.repeat(np.arange(len(posicoes)), posicoes.shape[1])[validos.ravel()]
+        np.add.at(votos, (linhas, self.rotulos_[posicoes[validos]]), 1)
+        return self.classes_[np.argmax(votos, axis=1)]
+
+    def _buscar(self, caracteristicas, k):
+        caracteristicas = np.atleast_2d(np.asarray(caracteristicas, dtype=np.float32))
+        instrumentacao.contar('knn.ivf.consultas', len(caracteristicas))
+        lotes = [caracteristicas[inicio:inicio + self.tamanho_lote]
+                 for inicio in range(0, len(caracteristicas), self.tamanho_lote)]
+        n_threads = self.n_jobs if self.n_jobs and self.n_jobs > 0 else 1
+        if self.n_jobs == -1:
+            n_threads = os.cpu_count() or 1
+        if n_threads > 1 and len(lotes) > 1:
+            with ThreadPoolExecutor(max_workers=min(n_threads, len(lotes))) as executor:
+                resultados = list(executor.map(lambda lote: self._buscar_lote(lote, k), lotes))
+        else:
+            resultados = [self._buscar_lote(lote, k) for lote in lotes]
+        if not resultados:
+            return np.empty((0, k), dtype=np.float32), np.empty((0, k), dtype=np.intp)
+        return (np.concatenate([distancias for distancias, _ in resultados]),
+                np.concatenate([posicoes for _, posicoes in resultados]))
+
+    def _buscar_lote(self, consultas, k):
+        n_consultas = len(consultas)
+        n_sondas = min(self.n_sondas, len(self.centroides_))
+        normas_consultas = np.einsum('ij,ij->i', consultas, consultas)
+
+        # Seleciona as células mais próximas de cada consulta
+        dist_centroides = (normas_consultas[:, None] - 2 * consultas @ self.centroides_.T
+                           + np.einsum('ij,ij->i', self.centroides_, self.centroides_))
+        sondas = np.argpartition(dist_centroides, n_sondas - 1, axis=1)[:, :n_sondas]
+
+        melhores_dist = np.full((n_consultas, k), np.inf, dtype=np.float32)
+        melhores_pos = np.full((n_consultas, k), -1, dtype=np.intp)
+        # Visita cada célula uma única vez, comparando-a com todas as consultas que a sondam
+        consultas_por_celula = np.argsort(sondas.ravel(), kind='stable') // n_sondas
+        limites = np.searchsorted(np.sort(sondas.ravel()), np.arange(len(self.centroides_) + 1))
+        for celula in range(len(self.centroides_)):
+            inicio, fim = self.inicios_[celula], self.inicios_[celula + 1]
+            selecionadas = consultas_por_celula[limites[celula]:limites[celula + 1]]
+            if fim == inicio or len(selecionadas) == 0:
+                continue
+            distancias = (normas_consultas[selecionadas, None] - 2 * consultas[selecionadas] @ self.dados_[inicio:fim].T
+                          + self.normas_[inicio:fim])
+            # Junta os candidatos da célula aos melhores atuais e mantém os k menores
+            todas_dist = np.concatenate([melhores_dist[selecionadas], distancias], axis=1)
+            todas_pos = np.concatenate([melhores_pos[selecionadas],
+                                        np.broadcast_to(np.arange(inicio, fim), distancias.shape)], axis=1)
+            manter = np.argpartition(todas_dist, k - 1, axis=1)[:, :k]
+            melhores_dist[selecionadas] = np.take_along_axis(todas_dist, manter, axis=1)
+            melhores_pos[selecionadas] = np.take_along_axis(todas_pos, manter, axis=1)
+
+        # Ordena os vizinhos por distância
+        ordem = np.argsort(melhores_dist, axis=1)
+        melhores_dist = np.sqrt(np.maximum(np.take_along_axis(melhores_dist, ordem, axis=1), 0))
+        return melhores_dist, np.take_along_axis(melhores_pos, ordem, axis=1)
@@ -1,26 +1,185 @@
-import time
 from sklearn.neural_network import MLPClassifier
 import numpy as np
+from modulos.utils import instrumentacao
 
-def treinar_mlp(caracteristicas,rotulos):
+# Arquiteturas pré-definidas. 'original' reproduz a configuração histórica (uma camada de 5000
+# neurônios, até 1000 épocas); as demais são dimensionadas para as ~50 componentes do PCA e
+# usam parada antecipada em uma fração de validação.
+PRESETS_MLP = {
+    'original': {'hidden_layer_sizes': (5000,), 'max_iter': 1000, 'early_stopping': False},
+    'compacto': {'hidden_layer_sizes': (64,), 'max_iter': 500, 'early_stopping': True},
+    'medio': {'hidden_layer_sizes': (256,), 'max_iter': 500, 'early_stopping': True},
+    'profundo': {'hidden_layer_sizes': (256, 128), 'max_iter': 500, 'early_stopping': True},
+}
+
+def treinar_mlp(caracteristicas, rotulos, hidden_layer_sizes=(5000), max_iter=1000, alpha=0.0001, learning_rate_init=0.001,
+                preset=None, early_stopping=False, validation_fraction=0.1, n_iter_no_change=10, float32=False):
+    """
+    Treina um classificador MLP.
+
+    Parâmetros:
+    - caracteristicas: Matriz (n_amostras, n_caracteristicas) de treinamento.
+    - rotulos: Rótulos de cada amostra (codificados com LabelEncoder ou OneHotEncoder).
+    - hidden_layer_sizes (int ou tuple): Número de neurônios de cada camada oculta. Default é (5000).
+    - max_iter (int): Número máximo de épocas. Default é 1000.
+    - alpha (float): Regularização L2. Default é 0.0001.
+    - learning_rate_init (float): Taxa de aprendizado inicial. Default é 0.001.
+    - preset (str): Nome de uma arquitetura de PRESETS_MLP; substitui hidden_layer_sizes, max_iter
+                    e early_stopping. Default é None.
+    - early_stopping (bool): Se True, interrompe o treinamento quando a acurácia na fração de
+                             validação para de melhorar. Default é False.
+    - validation_fraction (float): Fração das amostras reservada para a validação. Default é 0.1.
+    - n_iter_no_change (int): Épocas sem melhora antes de interromper. Default é 10.
+    - float32 (bool): Se True, treina com características e pesos em float32 (metade da memória e
+                      do tamanho do modelo). Default é False.
+
+    Retorno:
+    - modelo_mlp: Modelo MLPClassifier treinado.
+    """
+    if preset is not None:
+        hidden_layer_sizes, max_iter, early_stopping = _configuracao_preset(preset)
     print('Treinando o modelo MLP...')
     modelo_mlp = MLPClassifier(
         random_state=1,
         # Qtde de camadas ocultas e num de neurônios em cada
-        hidden_layer_sizes=(5000),  
-        max_iter=1000
+        hidden_layer_sizes=hidden_layer_sizes,
+        max_iter=max_iter,
+        alpha=alpha,
+        learning_rate_init=learning_rate_init,
+        early_stopping=early_stopping,
+        validation_fraction=validation_fraction,
+        n_iter_no_change=n_iter_no_change
     )
-    startTime = time.time()
-    modelo_mlp.fit(caracteristicas,rotulos)
-    elapsedTime = round(time.time() - startTime,2)
-    print(f'Treinamento realizado em {elapsedTime}s')
+    if float32:
+        caracteristicas = np.asarray(caracteristicas, dtype=np.float32)
+    with instrumentacao.intervalo('mlp.treinar', amostras=len(caracteristicas)) as medicao:
+        modelo_mlp.fit(caracteristicas,rotulos)
+    elapsedTime = round(medicao.duracao, 2)
+    print(f'Treinamento realizado em {elapsedTime}s ({modelo_mlp.n_iter_} épocas)')
+    return modelo_mlp
+
+def treinar_mlp_lotes(caracteristicas, rotulos, preset='compacto', n_epocas=200, tamanho_lote=4096, alpha=0.0001,
+                      learning_rate_init=0.001, fracao_validacao=0.1, paciencia=10, float32=False, random_state=1):
+    """
+    Treina um MLP época a época com partial_fit, lendo um lote de amostras por vez. Permite treinar
+    a partir do armazenamento colunar (dados.abrir_armazenamento) sem carregar a matriz inteira.
+
+    A cada época os lotes são formados por índices embaralhados (ordenados dentro do lote para
+    leitura sequencial do np.memmap). Ao fim da época a acurácia é medida na fração de validação;
+    o treinamento para após `paciencia` épocas sem melhora e os pesos da melhor época são restaurados.
+
+    Parâmetros:
+    - caracteristicas: Matriz (n_amostras, n_caracteristicas) de treinamento (pode ser um np.memmap).
+    - rotulos: Códigos dos rótulos (1D) ou matriz one-hot (2D).
+    - preset (str): Arquitetura de PRESETS_MLP. Default é 'compacto'.
+    - n_epocas (int): Número máximo de épocas (pelo menos 1). Default é 200.
+    - tamanho_lote (int): Amostras lidas por chamada de partial_fit. Default é 4096.
+    - alpha (float): Regularização L2. Default é 0.0001.
+    - learning_rate_init (float): Taxa de aprendizado inicial. Default é 0.001.
+    - fracao_validacao (float): Fração das amostras usada na parada antecipada (0 desativa). Default é 0.1.
+    - paciencia (int): Épocas sem melhora antes de interromper. Default é 10.
+    - float32 (bool): Se True, os lotes são convertidos para float32 (pesos em float32). Default é False.
+    - random_state (int): Semente do embaralhamento e da inicialização dos pesos. Default é 1.
+
+    Retorno:
+    - modelo_mlp: Modelo MLPClassifier treinado.
+    """
+    hidden_layer_sizes, _, _ = _configuracao_preset(preset)
+    if n_epocas < 1:
+        raise ValueError(f'n_epocas deve ser pelo menos 1, recebido {n_epocas}.')
+    tipo = np.float32 if float32 else np.float64
+    gerador = np.random.default_rng(random_state)
+    indices = gerador.permutation(len(rotulos))
+    n_validacao = int(len(indices) * fracao_validacao)
+    indices_validacao, indices = np.sort(indices[:n_validacao]), indices[n_validacao:]
+    classes = np.arange(rotulos.shape[1]) if np.ndim(rotulos) == 2 else np.unique(rotulos)
+
+    print('Treinando o modelo MLP em lotes...')
+    modelo_mlp = MLPClassifier(random_state=random_state, hidden_layer_sizes=hidden_layer_sizes, alpha=alpha,
+                               learning_rate_init=learning_rate_init)
+    melhor_acuracia, melhores_pesos, sem_melhora, epocas = -1.0, None, 0, 0
+    with instrumentacao.intervalo('mlp.treinar_lotes', amostras=len(rotulos)) as medicao:
+        for _ in range(n_epocas):
+            epocas += 1
+            ordem = gerador.permutation(indices)
+            for inicio in range(0, len(ordem), tamanho_lote):
+                lote = np.sort(ordem[inicio:inicio + tamanho_lote])
+                modelo_mlp.partial_fit(np.asarray(caracteristicas[lote], dtype=tipo), np.asarray(rotulos[lote]), classes=classes)
+            if n_validacao == 0:
+                continue
+            acuracia = _acuracia_lotes(modelo_mlp, caracteristicas, rotulos, indices_validacao, tamanho_lote, tipo)
+            if acuracia > melhor_acuracia:
+                melhor_acuracia, sem_melhora = acuracia, 0
+                melhores_pesos = ([c.copy() for c in modelo_mlp.coefs_], [b.copy() for b in modelo_mlp.intercepts_])
+            else:
+                sem_melhora += 1
+                if sem_melhora >= paciencia:
+                    break
+        if melhores_pesos is not None:
+            # Copia no lugar: o otimizador mantém referências aos mesmos arrays e continua válido
+            # para um partial_fit posterior (atualizar_mlp)
+            for atual, melhor in zip(modelo_mlp.coefs_ + modelo_mlp.intercepts_, melhores_pesos[0] + melhores_pesos[1]):
+                atual[...] = melhor
+            modelo_mlp.best_validation_score_ = melhor_acuracia
+    elapsedTime = round(medicao.duracao, 2)
+    print(f'Treinamento realizado em {elapsedTime}s ({epocas} épocas)')
+    return modelo_mlp
+
+def atualizar_mlp(modelo_mlp, caracteristicas, rotulos, n_epocas=1, tamanho_lote=4096):
+    """
+    Continua o treinamento de um MLP com novas amostras, via partial_fit.
+
+    A parada antecipada é desativada no modelo, pois o scikit-learn não a permite no
+    partial_fit. A camada de saída tem uma unidade por classe conhecida no treinamento,
+    portanto amostras de classes novas exigem um novo treinamento (treinar_mlp).
+
+    Parâmetros:
+    - modelo_mlp: Modelo MLPClassifier treinado, atualizado no lugar.
+    - caracteristicas: Matriz (n_novas, n_caracteristicas) das novas amostras.
+    - rotulos: Códigos dos rótulos (1D) ou matriz one-hot (2D). Códigos são convertidos para
+               one-hot quando o modelo foi treinado com OneHotEncoder.
+    - n_epocas (int): Passadas sobre as novas amostras. Default é 1.
+    - tamanho_lote (int): Amostras por chamada de partial_fit. Default é 4096.
+
+    Retorno:
+    - modelo_mlp: O mesmo modelo, atualizado.
+    """
+    rotulos = np.asarray(rotulos)
+    n_saidas = modelo_mlp.n_outputs_ if modelo_mlp._label_binarizer.y_type_ == 'multilabel-indicator' else None
+    if n_saidas is not None and rotulos.ndim == 1:
+        if rotulos.max(initial=-1) >= n_saidas:
+            raise ValueError(f'O modelo possui {n_saidas} saídas e recebeu a classe {rotulos.max()}. Treine o MLP novamente.')
+        rotulos = np.eye(n_saidas, dtype=int)[rotulos]
+    elif n_saidas is None:
+        desconhecidas = np.setdiff1d(rotulos, modelo_mlp.classes_)
+        if len(desconhecidas):
+            raise ValueError(f'Classes ausentes do modelo: {desconhecidas.tolist()}. Treine o MLP novamente.')
+    elif rotulos.shape[1] != n_saidas:
+        raise ValueError(f'O modelo possui {n_saidas} saídas e recebeu rótulos com {rotulos.shape[1]} colunas.')
+    tipo = modelo_mlp.coefs_[0].dtype
+
+    print('Atualizando o modelo MLP...')
+    modelo_mlp.set_params(early_stopping=False)
+    if getattr(modelo_mlp, 'best_loss_', None) is None:
+        # Com parada antecipada o scikit-learn não registra a melhor perda de treinamento,
+        # que o partial_fit passa a comparar a cada época
+        modelo_mlp.best_loss_ = np.inf
+    gerador = np.random.default_rng(modelo_mlp.random_state)
+    with instrumentacao.intervalo('mlp.atualizar', amostras=len(rotulos)) as medicao:
+        for _ in range(n_epocas):
+            ordem = gerador.permutation(len(rotulos))
+            for inicio in range(0, len(ordem), tamanho_lote):
+                lote = np.sort(ordem[inicio:inicio + tamanho_lote])
+                modelo_mlp.partial_fit(np.asarray(caracteristicas[lote], dtype=tipo), rotulos[lote])
+    elapsedTime = round(medicao.duracao, 2)
+    print(f'Atualização realizada em {elapsedTime}s')
     return modelo_mlp
 
 def testar_mlp(modelo_mlp,caracteristicas):
     print('Iniciando previsão...')
-    startTime = time.time()
-    rotulos_previstos =  modelo_mlp.predict(caracteristicas)
-    elapsedTime = round(time.time() - startTime,2)
+    with instrumentacao.intervalo('mlp.prever', amostras=len(caracteristicas)) as medicao:
+        rotulos_previstos =  modelo_mlp.predict(caracteristicas)
+    elapsedTime = round(medicao.duracao, 2)
     print(f'Previsão encerrada em {elapsedTime}s')
     return rotulos_previstos
 
@@ -38,4 +197,25 @@ def ajustar_amostras_zero(X):
     X_ajustado = np.copy(X)
     X_ajustado[amostras_zero, 0] = 1  # Define o primeiro bit como 1 para amostras com todos os valores zero
     
-    return X_ajustado
\ No newline at end of file
+    return X_ajustado
+
+def _configuracao_preset(preset):
+    """
+    Retorna (hidden_layer_sizes, max_iter, early_stopping) de um preset de PRESETS_MLP.
+    """
+    if preset not in PRESETS_MLP:
+        raise ValueError(f"{preset} não é um preset válido. Opções: {', '.join(PRESETS_MLP)}")
+    configuracao = PRESETS_MLP[preset]
+    return configuracao['hidden_layer_sizes'], configuracao['max_iter'], configuracao['early_stopping']
+
+def _acuracia_lotes(modelo_mlp, caracteristicas, rotulos, indices, tamanho_lote, tipo):
+    """
+    Calcula a acurácia (exata, no caso one-hot) nas amostras de `indices`, lote a lote.
+    """
+    acertos = 0
+    for inicio in range(0, len(indices), tamanho_lote):
+        lote = indices[inicio:inicio + tamanho_lote]
+        previstos = modelo_mlp.predict(np.asarray(caracteristicas[lote], dtype=tipo))
+        verdadeiros = np.asarray(rotulos[lote])
+        acertos += np.sum(np.all(previstos == verdadeiros, axis=1) if verdadeiros.ndim == 2 else previstos == verdadeiros)
+    return acertos / len(indices)
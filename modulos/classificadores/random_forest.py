@@ -1,23 +1,175 @@
-import time
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 from sklearn.ensemble import RandomForestClassifier
+from modulos.utils import instrumentacao
 
-def treinar_rf(caracteristicas,rotulos):
+def treinar_rf(caracteristicas, rotulos, n_estimators=100, max_depth=None, max_features='sqrt', min_samples_leaf=1, n_jobs=None):
+    """
+    Treina um classificador Random Forest.
+
+    Parâmetros:
+    - caracteristicas: Matriz (n_amostras, n_caracteristicas) de treinamento.
+    - rotulos: Rótulos codificados de cada amostra.
+    - n_estimators (int): Número de árvores. Default é 100.
+    - max_depth (int): Profundidade máxima das árvores (None = sem limite). Default é None.
+    - max_features (str, int ou float): Características sorteadas em cada divisão. Default é 'sqrt'.
+    - min_samples_leaf (int): Número mínimo de amostras em cada folha. Default é 1.
+    - n_jobs (int): Threads usadas no treinamento e na previsão (-1 usa todos os núcleos). Default é None.
+
+    Retorno:
+    - modelo_rf: Modelo RandomForestClassifier treinado.
+    """
     print('Treinando o modelo Random Forest...')
-    modelo_rf = RandomForestClassifier(n_estimators=100, random_state=42)
-    startTime = time.time()
-    modelo_rf.fit(caracteristicas, rotulos)
-    elapsedTime = round(time.time() - startTime,2)
+    modelo_rf = RandomForestClassifier(n_estimators=n_estimators, max_depth=max_depth, max_features=max_features,
+                                       min_samples_leaf=min_samples_leaf, n_jobs=n_jobs, random_state=42)
+    with instrumentacao.intervalo('rf.treinar', amostras=len(caracteristicas)) as medicao:
+        modelo_rf.fit(caracteristicas, rotulos)
+    elapsedTime = round(medicao.duracao, 2)
     print(f'Treinamento encerrado em {elapsedTime}s')
     return modelo_rf
 
 def testar_rf(modelo_rf,caracteristicas):
     print('Iniciando previsão...')
-    startTime = time.time()
-    rotulos_previstos = modelo_rf.predict(caracteristicas)
-    elapsedTime = round(time.time() - startTime,2)
+    with instrumentacao.intervalo('rf.prever', amostras=len(caracteristicas)) as medicao:
+        rotulos_previstos = modelo_rf.predict(caracteristicas)
+    elapsedTime = round(medicao.duracao, 2)
     print(f'Previsão encerrada em {elapsedTime}s')
     return rotulos_previstos
 
+def compilar_rf(modelo_rf, n_jobs=None, tamanho_lote=4096):
+    """
+    Compila um RandomForestClassifier treinado em uma FlorestaCompilada.
+
+    Parâmetros:
+    - modelo_rf (RandomForestClassifier): Floresta treinada (uma única saída).
+    - n_jobs (int): Threads usadas na previsão (-1 usa todos os núcleos). Default é None (1).
+    - tamanho_lote (int): Amostras percorridas por vez. Default é 4096.
+
+    Retorno:
+    - floresta (FlorestaCompilada): Floresta com as mesmas previsões do modelo original.
+    """
+    return FlorestaCompilada(n_jobs=n_jobs, tamanho_lote=tamanho_lote).compilar(modelo_rf)
+
+
+class FlorestaCompilada:
+    """
+    Random Forest de inferência com todas as árvores em arrays contíguos, implementada com NumPy.
+
+    Os nós de todas as árvores são concatenados em uma tabela (característica, limiar, filho
+    esquerdo, distância até o filho direito) com índices globais; nas folhas, que não usam o
+    limiar, o segundo campo guarda a linha da folha na tabela de probabilidades, que só tem as
+    folhas. A previsão percorre todos os
+    pares (amostra, árvore) de um lote ao mesmo tempo, um nível por iteração. As folhas apontam
+    para si mesmas, de modo que os pares que já chegaram a uma folha podem seguir no lote e só
+    são removidos a cada `niveis_compactacao` níveis.
+
+    A comparação é feita com as características em float32, como no scikit-learn, e as
+    probabilidades das árvores são somadas na ordem das árvores: as previsões são idênticas bit a
+    bit às de RandomForestClassifier (executado com n_jobs=None).
+
+    Parâmetros:
+    - n_jobs (int): Threads usadas para processar lotes de amostras (-1 usa todos os núcleos). Default é None (1).
+    - tamanho_lote (int): Amostras percorridas por vez. Default é 4096.
+    - niveis_compactacao (int): Níveis percorridos entre duas remoções dos pares já em folhas. Default é 8.
+    """
+
+    def __init__(self, n_jobs=None, tamanho_lote=4096, niveis_compactacao=8):
+        self.n_jobs = n_jobs
+        self.tamanho_lote = tamanho_lote
+        self.niveis_compactacao = niveis_compactacao
+
+    def compilar(self, modelo_rf):
+        if modelo_rf.n_outputs_ != 1:
+            raise ValueError('FlorestaCompilada suporta apenas florestas com uma única saída.')
+        arvores = [estimador.tree_ for estimador in modelo_rf.estimators_]
+        n_classes = int(modelo_rf.n_classes_)
+        contagens = np.array([arvore.node_count for arvore in arvores])
+        if contagens.sum() >= np.iinfo(np.int32).max:
+            raise ValueError('A floresta tem nós demais para índices de 32 bits.')
+        deslocamentos = np.concatenate([[0], np.cumsum(contagens)[:-1]])
+
+        esquerda, direita = [], []
+        for arvore, deslocamento in zip(arvores, deslocamentos):
+            indices = np.arange(arvore.node_count)
+            folhas = arvore.children_left < 0
+            # Folhas apontam para si mesmas; os filhos passam a ter índice global
+            esquerda.append(np.where(folhas, indices, arvore.children_left) + deslocamento)
+            direita.append(np.where(folhas, indices, arvore.children_right) + deslocamento)
+        esquerda, direita = np.concatenate(esquerda), np.concatenate(direita)
+        caracteristica = np.concatenate([arvore.feature for arvore in arvores])
+        self.folha_ = caracteristica < 0
+        # Como as características são float32, x <= limiar equivale a x <= maior float32 que não
+        # excede o limiar, e a comparação pode ser feita em float32 sem alterar nenhuma decisão
+        limiar = np.concatenate([arvore.threshold for arvore in arvores])
+        limiar_32 = limiar.astype(np.float32)
+        excede = limiar_32 > limiar
+        limiar_32[excede] = np.nextafter(limiar_32[excede], np.float32(-np.inf))
+
+        # Uma linha de 16 bytes por nó: um único acesso à memória traz tudo que um nível precisa
+        self.nos_ = np.empty((len(limiar), 4), dtype=np.int32)
+        self.nos_[:, 0] = np.where(self.folha_, 0, caracteristica)
+        self.nos_[:, 1] = np.where(self.folha_, np.cumsum(self.folha_) - 1, limiar_32.view(np.int32))
+        self.nos_[:, 2] = esquerda
+        self.nos_[:, 3] = direita - esquerda
+        self.faltante_esquerda_ = np.concatenate([arvore.missing_go_to_left for arvore in arvores]).astype(bool)
+        valores = np.concatenate([arvore.value[:, 0, :n_classes] for arvore in arvores])
+        self.valores_ = np.ascontiguousarray(valores[self.folha_])
+        self.raizes_ = deslocamentos.astype(np.int32)
+        self.classes_ = modelo_rf.classes_
+        self.n_features_in_ = modelo_rf.n_features_in_
+        return self
+
+    def predict_proba(self, caracteristicas):
+        caracteristicas = np.atleast_2d(np.asarray(caracteristicas, dtype=np.float32))
+        if caracteristicas.shape[1] != self.n_features_in_:
+            raise ValueError(f'Esperadas {self.n_features_in_} características, recebidas {caracteristicas.shape[1]}.')
+        lotes = [caracteristicas[inicio:inicio + self.tamanho_lote]
+                 for inicio in range(0, len(caracteristicas), self.tamanho_lote)]
+        n_threads = self.n_jobs if self.n_jobs and self.n_jobs > 0 else 1
+        if self.n_jobs == -1:
+            n_threads = os.cpu_count() or 1
+        if n_threads > 1 and len(lotes) > 1:
+            with ThreadPoolExecutor(max_workers=min(n_threads, len(lotes))) as executor:
+                resultados = list(executor.map(self._prever_lote, lotes))
+        else:
+            resultados = [self._prever_lote(lote) for lote in lotes]
+        if not resultados:
+            return np.empty((0, len(self.classes_)), dtype=np.float64)
+        return np.concatenate(resultados)
 
+    def predict(self, caracteristicas):
+        return self.classes_.take(np.argmax(self.predict_proba(caracteristicas), axis=1), axis=0)
 
+    def _prever_lote(self, lote):
+        n_amostras, n_arvores = len(lote), len(self.raizes_)
+        valores_lote = np.ascontiguousarray(lote).ravel()
+        tem_faltantes = np.isnan(valores_lote).any()
+        folhas = np.empty(n_amostras * n_arvores, dtype=np.int32)
+        # Pares (amostra, árvore) em percurso: posição do par, nó atual e início da linha da amostra
+        pendentes = np.arange(n_amostras * n_arvores, dtype=np.int32)
+        no = np.tile(self.raizes_, n_amostras)
+        linha = np.repeat(np.arange(0, len(valores_lote), lote.shape[1], dtype=np.int32), n_arvores)
+        nivel = 0
+        while len(pendentes):
+            nivel += 1
+            if nivel % self.niveis_compactacao == 0:
+                # Remove os pares que já chegaram a uma folha
+                interno = ~self.folha_[no]
+                folhas[pendentes[~interno]] = no[~interno]
+                pendentes, no, linha = pendentes[interno], no[interno], linha[interno]
+            registro = self.nos_.take(no, axis=0)
+            valor = valores_lote.take(linha + registro[:, 0])
+            vai_direita = valor > registro[:, 1].view(np.float32)
+            if tem_faltantes:
+                faltante = np.isnan(valor)
+                vai_direita[faltante] = ~self.faltante_esquerda_[no[faltante]]
+            no = registro[:, 2] + vai_direita * registro[:, 3]
 
+        # Soma árvore a árvore (mesma ordem de acumulação do scikit-learn) e divide pelo total
+        folhas = self.nos_[:, 1].take(folhas).reshape(n_amostras, n_arvores)
+        probabilidades = np.zeros((n_amostras, self.valores_.shape[1]), dtype=np.float64)
+        for arvore in range(n_arvores):
+            probabilidades += self.valores_.take(folhas[:, arvore], axis=0)
+        probabilidades /= n_arvores
+        return probabilidades
@@ -1,19 +1,146 @@
-import time
+import numpy as np
 from sklearn import svm
+from sklearn.calibration import CalibratedClassifierCV
+from sklearn.frozen import FrozenEstimator
+from sklearn.linear_model import SGDClassifier
+from sklearn.pipeline import Pipeline, make_pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.utils.class_weight import compute_class_weight
+from modulos.utils import instrumentacao
 
-def treinar_svm(caracteristicas,rotulos):
+def treinar_svm(caracteristicas, rotulos, kernel='linear', C=1, gamma='scale', modo='svc', class_weight=None, calibrar=False, tamanho_lote=4096, n_epocas=5):
+    """
+    Treina um classificador SVM.
+
+    O modo 'svc' usa a libsvm, cujo custo cresce de forma quadrática a cúbica com o número de
+    amostras. Os modos 'linear' e 'sgd' resolvem o SVM linear no primal e escalam linearmente:
+    'linear' usa a liblinear (LinearSVC) com todas as amostras em memória e 'sgd' usa
+    SGDClassifier (perda hinge) com partial_fit em mini-lotes, lendo apenas um lote por vez,
+    o que permite treinar a partir de um np.memmap maior que a memória. Nos dois modos as
+    características são padronizadas por um StandardScaler ajustado no treinamento.
+
+    Parâmetros:
+    - caracteristicas: Matriz (n_amostras, n_caracteristicas) de treinamento (pode ser um np.memmap).
+    - rotulos: Rótulos codificados de cada amostra.
+    - kernel (str): Kernel do SVC ('linear', 'rbf', 'poly' ou 'sigmoid'); apenas no modo 'svc'. Default é 'linear'.
+    - C (float): Parâmetro de regularização (no modo 'sgd', alpha = 1 / (C * n_amostras)). Default é 1.
+    - gamma (str ou float): Coeficiente dos kernels não lineares. Default é 'scale'.
+    - modo (str): 'svc', 'linear' ou 'sgd'. Default é 'svc'.
+    - class_weight (dict ou 'balanced'): Pesos das classes. Default é None.
+    - calibrar (bool): Se True, calibra as probabilidades (sigmoide), habilitando predict_proba.
+                       Nos modos 'svc' e 'linear' usa validação cruzada com 3 folds; no modo 'sgd'
+                       reserva 10% das amostras para a calibração. Default é False.
+    - tamanho_lote (int): Amostras por mini-lote no modo 'sgd'. Default é 4096.
+    - n_epocas (int): Passadas sobre os dados no modo 'sgd'. Default é 5.
+
+    Retorno:
+    - modelo_svm: Modelo treinado (SVC, Pipeline com o escalonador ou CalibratedClassifierCV).
+    """
     print('Treinando o modelo SVM...')
-    modelo_svm = svm.SVC(kernel='linear', C=1, random_state=42)
-    startTime = time.time()
-    modelo_svm.fit(caracteristicas, rotulos)
-    elapsedTime = round(time.time() - startTime,2)
+    with instrumentacao.intervalo('svm.treinar', amostras=len(caracteristicas), modo=modo) as medicao:
+        if modo == 'svc':
+            modelo_svm = svm.SVC(kernel=kernel, C=C, gamma=gamma, class_weight=class_weight, random_state=42)
+            if calibrar:
+                modelo_svm = CalibratedClassifierCV(modelo_svm, method='sigmoid', cv=3)
+            modelo_svm.fit(caracteristicas, rotulos)
+        elif modo == 'linear':
+            modelo_svm = make_pipeline(StandardScaler(),
+                                       svm.LinearSVC(C=C, class_weight=class_weight, random_state=42))
+            if calibrar:
+                modelo_svm = CalibratedClassifierCV(modelo_svm, method='sigmoid', cv=3)
+            modelo_svm.fit(caracteristicas, rotulos)
+        elif modo == 'sgd':
+            modelo_svm = _treinar_sgd(caracteristicas, rotulos, C, class_weight, calibrar, tamanho_lote, n_epocas)
+        else:
+            raise ValueError(f"{modo} não é um modo válido. Opções: 'svc', 'linear', 'sgd'")
+    elapsedTime = round(medicao.duracao, 2)
     print(f'Treinamento encerrado em {elapsedTime}s')
     return modelo_svm
 
 def testar_svm(modelo_svm,caracteristicas):
     print('Iniciando previsão...')
-    startTime = time.time()
-    rotulos_previstos = modelo_svm.predict(caracteristicas)
-    elapsedTime = round(time.time() - startTime,2)
+    with instrumentacao.intervalo('svm.prever', amostras=len(caracteristicas)) as medicao:
+        rotulos_previstos = modelo_svm.predict(caracteristicas)
+    elapsedTime = round(medicao.duracao, 2)
     print(f'Previsão encerrada em {elapsedTime}s')
-    return rotulos_previstos
\ No newline at end of file
+    return rotulos_previstos
+
+def atualizar_svm(modelo_svm, caracteristicas, rotulos, n_epocas=1, tamanho_lote=4096):
+    """
+    Continua o treinamento de um SVM do modo 'sgd' com novas amostras, via partial_fit.
+
+    O escalonador não é reajustado: os pesos aprendidos dependem da padronização usada no
+    treinamento, e alterá-la deslocaria a fronteira já aprendida. Como o partial_fit do
+    SGDClassifier fixa as classes na primeira chamada, amostras de classes novas exigem um
+    novo treinamento (treinar_svm). Os modos 'svc', 'linear' e os modelos calibrados não
+    suportam atualização incremental.
+
+    Parâmetros:
+    - modelo_svm: Pipeline (escalonador + SGDClassifier) retornado por treinar_svm(modo='sgd').
+    - caracteristicas: Matriz (n_novas, n_caracteristicas) das novas amostras.
+    - rotulos: Rótulos codificados das novas amostras.
+    - n_epocas (int): Passadas sobre as novas amostras. Default é 1.
+    - tamanho_lote (int): Amostras por chamada de partial_fit. Default é 4096.
+
+    Retorno:
+    - modelo_svm: O mesmo modelo, atualizado no lugar.
+    """
+    if not isinstance(modelo_svm, Pipeline) or not isinstance(modelo_svm[-1], SGDClassifier):
+        raise ValueError("Apenas modelos treinados com modo='sgd' (sem calibração) podem ser atualizados.")
+    escalonador, sgd = modelo_svm[0], modelo_svm[-1]
+    rotulos = np.asarray(rotulos)
+    desconhecidas = np.setdiff1d(rotulos, sgd.classes_)
+    if len(desconhecidas):
+        raise ValueError(f'Classes ausentes do modelo: {desconhecidas.tolist()}. Treine o SVM novamente.')
+
+    print('Atualizando o modelo SVM...')
+    gerador = np.random.default_rng(42)
+    with instrumentacao.intervalo('svm.atualizar', amostras=len(rotulos)) as medicao:
+        for _ in range(n_epocas):
+            ordem = gerador.permutation(len(rotulos))
+            for inicio in range(0, len(ordem), tamanho_lote):
+                lote = np.sort(ordem[inicio:inicio + tamanho_lote])
+                sgd.partial_fit(escalonador.transform(caracteristicas[lote]), rotulos[lote])
+    elapsedTime = round(medicao.duracao, 2)
+    print(f'Atualização realizada em {elapsedTime}s')
+    return modelo_svm
+
+def _treinar_sgd(caracteristicas, rotulos, C, class_weight, calibrar, tamanho_lote, n_epocas):
+    """
+    Treina o escalonador e o SGDClassifier em mini-lotes com partial_fit.
+
+    Os lotes são formados por índices embaralhados a cada época (ordenados dentro do lote para
+    leitura sequencial de um np.memmap), de modo que dados gravados classe a classe não enviesam
+    o gradiente. Retorna um Pipeline (escalonador + SGD), calibrado se solicitado.
+    """
+    rotulos = np.asarray(rotulos)
+    gerador = np.random.default_rng(42)
+    indices = gerador.permutation(len(rotulos))
+    indices_calibracao = np.array([], dtype=np.intp)
+    if calibrar:
+        n_calibracao = max(len(indices) // 10, 1)
+        indices_calibracao, indices = np.sort(indices[:n_calibracao]), indices[n_calibracao:]
+    n_amostras = len(indices)
+    classes = np.unique(rotulos)
+
+    # Primeira passada: média e desvio das características, lote a lote
+    escalonador = StandardScaler()
+    for inicio in range(0, n_amostras, tamanho_lote):
+        escalonador.partial_fit(caracteristicas[np.sort(indices[inicio:inicio + tamanho_lote])])
+
+    # partial_fit não aceita class_weight='balanced'; os pesos são calculados uma vez no início
+    if isinstance(class_weight, str):
+        pesos = compute_class_weight(class_weight, classes=classes, y=rotulos[indices])
+        class_weight = dict(zip(classes, pesos))
+    sgd = SGDClassifier(loss='hinge', alpha=1.0 / (C * n_amostras), class_weight=class_weight, average=True, random_state=42)
+    for _ in range(n_epocas):
+        ordem = gerador.permutation(indices)
+        for inicio in range(0, n_amostras, tamanho_lote):
+            lote = np.sort(ordem[inicio:inicio + tamanho_lote])
+            sgd.partial_fit(escalonador.transform(caracteristicas[lote]), rotulos[lote], classes=classes)
+
+    modelo_svm = Pipeline([('standardscaler', escalonador), ('sgdclassifier', sgd)])
+    if calibrar:
+        modelo_svm = CalibratedClassifierCV(FrozenEstimator(modelo_svm), method='sigmoid')
+        modelo_svm.fit(caracteristicas[indices_calibracao], rotulos[indices_calibracao])
+    return modelo_svm
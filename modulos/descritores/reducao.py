@@ -0,0 +1,78 @@
+# Este módulo permite a redução de dimensionalidade das características extraídas
+# O redutor (PCA) é ajustado uma única vez no conjunto de treinamento, salvo junto
+# ao modelo e depois aplicado com transform aos conjuntos de teste e às novas imagens
+
+import numpy as np
+from sklearn.decomposition import PCA, IncrementalPCA
+
+from modulos.utils import instrumentacao
+
+def ajustar_redutor(caracteristicas, n_componentes=50, incremental=False, tamanho_lote=1024):
+    """
+    Ajusta um redutor PCA nas características de treinamento.
+
+    Parâmetros:
+    - caracteristicas: Array (n_amostras, n_caracteristicas) com as características brutas.
+                       Pode ser um np.memmap; com incremental=True apenas um lote por vez
+                       é carregado na memória.
+    - n_componentes: Número máximo de componentes principais mantidos. Default é 50.
+    - incremental: Se True, utiliza IncrementalPCA ajustado lote a lote. Default é False.
+    - tamanho_lote: Número de amostras por lote no ajuste incremental. Default é 1024.
+
+    Retorno:
+    - redutor (PCA ou IncrementalPCA): O redutor ajustado, ou None quando o número de
+      componentes disponíveis não permite a redução.
+    """
+    n_amostras, n_caracteristicas = caracteristicas.shape
+    n_componentes_pca = min(n_componentes, n_amostras, n_caracteristicas)  # Limita ao número de amostras/features
+
+    if n_componentes_pca <= 1:
+        print('PCA não aplicado devido ao número insuficiente de componentes.')
+        return None
+
+    print(f'Ajustando PCA para reduzir de {n_caracteristicas} para {n_componentes_pca} dimensões...')
+    with instrumentacao.intervalo('pca.ajustar', amostras=n_amostras, incremental=incremental):
+        if incremental:
+            redutor = IncrementalPCA(n_components=n_componentes_pca)
+            # Cada lote precisa ter pelo menos n_componentes amostras
+            tamanho_lote = max(tamanho_lote, n_componentes_pca)
+            inicio = 0
+            while inicio < n_amostras:
+                fim = inicio + tamanho_lote
+                # Incorpora ao lote atual um resto pequeno demais para formar um lote próprio
+                if n_amostras - fim < n_componentes_pca:
+                    fim = n_amostras
+                redutor.partial_fit(np.asarray(caracteristicas[inicio:fim], dtype=np.float64))
+                inicio = fim
+        else:
+            redutor = PCA(n_components=n_componentes_pca)
+            redutor.fit(caracteristicas)
+
+    print(f'Variância explicada pelo PCA: {sum(redutor.explained_variance_ratio_)*100:.2f}%')
+    return redutor
+
+def aplicar_redutor(redutor, caracteristicas, tamanho_lote=4096):
+    """
+    Projeta as características no espaço do redutor já ajustado, em lotes.
+
+    Parâmetros:
+    - redutor (PCA, IncrementalPCA ou None): Redutor retornado por ajustar_redutor.
+                                            Com None as características são devolvidas sem alteração.
+    - caracteristicas: Array (n_amostras, n_caracteristicas) com as características brutas.
+                       Aceita uma única amostra (n_caracteristicas,).
+    - tamanho_lote: Número de amostras projetadas por vez. Default é 4096.
+
+    Retorno:
+    - Array (n_amostras, n_componentes) com as características reduzidas.
+    """
+    caracteristicas = np.atleast_2d(caracteristicas)
+    if redutor is None:
+        return np.asarray(caracteristicas)
+
+    n_amostras = caracteristicas.shape[0]
+    reduzidas = np.empty((n_amostras, redutor.n_components_), dtype=np.float64)
+    with instrumentacao.intervalo('pca.aplicar', amostras=n_amostras):
+        for inicio in range(0, n_amostras, tamanho_lote):
+            lote = np.asarray(caracteristicas[inicio:inicio + tamanho_lote], dtype=np.float64)
+            reduzidas[inicio:inicio + len(lote)] = redutor.transform(lote)
+    return reduzidas
@@ -0,0 +1,208 @@
+# Este módulo permite classificar novas imagens com um modelo já treinado
+# O modelo, o redutor PCA e o encoder de rótulos são carregados uma única vez e
+# mantidos em memória, de modo que cada previsão executa apenas a extração GLCM
+# e a predição no próprio processo
+
+import json
+import time
+import queue
+import threading
+from concurrent.futures import Future
+
+import numpy as np
+
+from modulos.descritores import glcm, reducao
+from modulos.utils import artefatos, dados, instrumentacao
+
+class Classificador:
+    """
+    Classificador de imagens pronto para inferência.
+
+    Parâmetros:
+    - caminho_modelo (str): Caminho do modelo treinado (salvo com dados.salvar_modelo) ou diretório
+                            de artefato (artefatos.salvar_artefato).
+    - caminho_rotulos (str): Caminho dos rótulos de treinamento com o encoder (dados.salvar_rotulos).
+                             Pode ser None se o artefato contiver o encoder.
+    - caminho_redutor (str): Caminho do redutor PCA ajustado no treinamento, ou None. Com um artefato,
+                             o redutor salvo nele é usado por padrão. Default é None.
+    - parametros_glcm (dict): Parâmetros repassados a glcm.extrair_glcm (distancias, angulos,
+                              propriedades). Devem ser os mesmos usados no treinamento. Com um artefato,
+                              o padrão é metadados['glcm'] do manifesto. Default é None.
+    - tamanho_maximo_lote (int): Número máximo de requisições agrupadas em prever_concorrente. Default é 32.
+    - janela_ms (float): Tempo máximo, em milissegundos, que uma requisição aguarda outras para
+                         formar um lote em prever_concorrente. Default é 2.
+    - leitor (dados.LeitorImagens): Leitor usado no treinamento, aplicado aos bytes e aos arrays
+                                    recebidos. Com None é criado um dados.LeitorImagens com o
+                                    tamanho registrado em metadados['leitor'] do artefato (256, sem
+                                    artefato), o mesmo usado na extração do treinamento. Default é None.
+    """
+
+    def __init__(self, caminho_modelo, caminho_rotulos, caminho_redutor=None, parametros_glcm=None,
+                 tamanho_maximo_lote=32, janela_ms=2, leitor=None):
+        if artefatos.eh_artefato(caminho_modelo):
+            # O artefato pode trazer o redutor e o encoder usados no treinamento
+            self.modelo, self.redutor, self.encoder, manifesto = artefatos.carregar_artefato(caminho_modelo)
+            if parametros_glcm is None:
+                parametros_glcm = manifesto['metadados'].get('glcm')
+            parametros_leitor = manifesto['metadados'].get('leitor') or {}
+        else:
+            self.modelo, self.redutor, self.encoder = dados.carregar_modelo(caminho_modelo), None, None
+            parametros_leitor = {}
+        if leitor is None:
+            # Os bytes recebidos passam pela mesma decodificação reduzida e redimensionamento do treinamento
+            leitor = dados.LeitorImagens(tamanho=parametros_leitor.get('tamanho', 256), n_threads=1)
+        if caminho_redutor:
+            self.redutor = dados.carregar_modelo(caminho_redutor)
+        if caminho_rotulos:
+            _, self.encoder = dados.carregar_rotulos(caminho_rotulos)
+        if self.encoder is None:
+            raise ValueError('Informe caminho_rotulos ou um artefato que contenha o encoder dos rótulos.')
+        # Características convertidas para o dtype dos arrays do modelo (float32 em artefatos reduzidos)
+        self._dtype_entrada = artefatos.dtype_entrada(self.modelo)
+        self.parametros_glcm = dict(parametros_glcm or {})
+        self.leitor = leitor
+        self.tamanho_maximo_lote = tamanho_maximo_lote
+        self.janela_ms = janela_ms
+        self._fila = queue.Queue()
+        self._trava = threading.Lock()
+        self._agrupador = None
+        # Executa uma previsão de aquecimento para inicializar caches internos do modelo
+        self.prever([np.zeros((256, 256), dtype=np.uint8)])
+
+    def prever(self, entradas):
+        """
+        Classifica uma ou mais imagens.
+
+        Parâmetros:
+        - entradas: Imagem única ou lista de imagens. Cada imagem pode ser um array numpy
+                    (RGB ou escala de cinza) ou os bytes de um arquivo codificado (PNG, JPEG...).
+
+        Retorno:
+        - Array com os rótulos previstos (nomes das classes), na ordem das entradas.
+        """
+        if isinstance(entradas, (bytes, bytearray, memoryview, np.ndarray)):
+            entradas = [entradas]
+        instrumentacao.contar('inferencia.imagens', len(entradas))
+        with instrumentacao.intervalo('inferencia.decodificar', imagens=len(entradas)):
+            imagens = [self._decodificar(entrada) for entrada in entradas]
+        caracteristicas = glcm.extrair_glcm(imagens, tamanho_lote=max(len(imagens), 1), progresso=False,
+                                            **self.parametros_glcm)
+        caracteristicas = reducao.aplicar_redutor(self.redutor, caracteristicas)
+        if self._dtype_entrada is not None:
+            caracteristicas = np.asarray(caracteristicas, dtype=self._dtype_entrada)
+        with instrumentacao.intervalo('inferencia.prever', imagens=len(entradas)):
+            previstos = self.modelo.predict(caracteristicas)
+        return self._decodificar_rotulos(previstos)
+
+    def prever_concorrente(self, entrada):
+        """
+        Enfileira uma imagem para ser classificada junto com requisições simultâneas.
+
+        Requisições que chegam dentro da janela de janela_ms são agrupadas (até
+        tamanho_maximo_lote) e classificadas em uma única chamada de prever.
+
+        Parâmetros:
+        - entrada: Array numpy ou bytes de um arquivo de imagem.
+
+        Retorno:
+        - Future (concurrent.futures) cujo resultado é o rótulo previsto.
+        """
+        with self._trava:
+            if self._agrupador is None:
+                self._agrupador = threading.Thread(target=self._agrupar_requisicoes, daemon=True)
+                self._agrupador.start()
+        futuro = Future()
+        self._fila.put((entrada, futuro))
+        return futuro
+
+    def fechar(self):
+        """
+        Encerra a thread de agrupamento de requisições, se estiver ativa.
+        """
+        with self._trava:
+            if self._agrupador is not None:
+                self._fila.put(None)
+                self._agrupador.join()
+                self._agrupador = None
+
+    def _agrupar_requisicoes(self):
+        while True:
+            item = self._fila.get()
+            if item is None:
+                return
+            lote = [item]
+            # Aguarda novas requisições até completar o lote ou esgotar a janela
+            prazo = time.monotonic() + self.janela_ms / 1000
+            encerrar = False
+            while len(lote) < self.tamanho_maximo_lote:
+                restante = prazo - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    item = self._fila.get(timeout=restante)
+                except queue.Empty:
+                    break
+                if item is None:
+                    encerrar = True
+                    break
+                lote.append(item)
+            self._processar_lote(lote)
+            if encerrar:
+                return
+
+    def _processar_lote(self, lote):
+        entradas = [entrada for entrada, _ in lote]
+        try:
+            rotulos = self.prever(entradas)
+        except Exception:
+            # Classifica individualmente para isolar a requisição com erro
+            for entrada, futuro in lote:
+                try:
+                    futuro.set_result(self.prever([entrada])[0])
+                except Exception as e:
+                    futuro.set_exception(e)
+            return
+        for (_, futuro), rotulo in zip(lote, rotulos):
+            futuro.set_result(rotulo)
+
+    def _decodificar(self, entrada):
+        if isinstance(entrada, np.ndarray):
+            # Arrays passam pela mesma conversão para cinza e redimensionamento dos bytes
+            return self.leitor.normalizar(entrada)
+        imagem = self.leitor.decodificar(entrada)
+        if imagem is None:
+            raise ValueError('Não foi possível decodificar a imagem recebida.')
+        return imagem
+
+    def _decodificar_rotulos(self, previstos):
+        previstos = np.asarray(previstos)
+        if previstos.ndim == 2:
+            # Modelos treinados com OneHotEncoder (MLP) retornam uma matriz de indicadores
+            return self.encoder.categories_[0][np.argmax(previstos, axis=1)]
+        return self.encoder.inverse_transform(previstos)
+
+
+# Classificadores já carregados, indexados pelos caminhos dos artefatos e pelas demais opções
+_registro = {}
+_trava_registro = threading.Lock()
+
+def obter_classificador(caminho_modelo, caminho_rotulos, caminho_redutor=None, **kwargs):
+    """
+    Retorna o Classificador dos artefatos informados, carregando-o apenas na primeira chamada.
+
+    Chamadas com opções diferentes (parametros_glcm, leitor...) para os mesmos caminhos recebem
+    instâncias diferentes.
+
+    Parâmetros:
+    - Os mesmos de Classificador.
+
+    Retorno:
+    - classificador (Classificador): Instância mantida em memória para as próximas chamadas.
+    """
+    # Objetos sem representação JSON (como o leitor) entram na chave pela identidade
+    opcoes = json.dumps(kwargs, sort_keys=True, default=lambda objeto: f'{type(objeto).__qualname__}@{id(objeto)}')
+    chave = (caminho_modelo, caminho_rotulos, caminho_redutor, opcoes)
+    with _trava_registro:
+        if chave not in _registro:
+            _registro[chave] = Classificador(caminho_modelo, caminho_rotulos, caminho_redutor, **kwargs)
+        return _registro[chave]
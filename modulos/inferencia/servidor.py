@@ -0,0 +1,210 @@
+# Este módulo disponibiliza um servidor HTTP local (asyncio) para classificar imagens
+# Requisições simultâneas são agrupadas em micro-lotes dentro de uma janela de latência
+# configurável e processadas em um pool de threads, sem bloquear o laço de eventos
+#
+# Uso:
+#   python -m modulos.inferencia.servidor --modelo modelos/knn/covid19/knn_glcm.pkl \
+#       --rotulos features/glcm/covid19/train/rotulos_labelenc.npy \
+#       --redutor modelos/pca/covid19/pca_glcm.pkl --porta 8000
+#
+# Rotas:
+#   POST /prever   corpo = bytes do arquivo de imagem -> {"rotulo": "..."}
+#   GET  /metricas -> latências p50/p99, vazão e contadores
+#   GET  /saude    -> {"status": "ok"}
+
+import time
+import json
+import asyncio
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from modulos.inferencia.classificador import Classificador
+from modulos.utils import instrumentacao
+
+class ServidorInferencia:
+    """
+    Servidor HTTP de inferência com agrupamento de requisições em micro-lotes.
+
+    Parâmetros:
+    - classificador (Classificador): Classificador já carregado.
+    - janela_ms (float): Tempo máximo que uma requisição aguarda outras para formar um lote. Default é 5.
+    - tamanho_maximo_lote (int): Número máximo de imagens por lote. Default é 32.
+    - n_workers (int): Threads que executam extração e predição (OpenCV e NumPy liberam o GIL). Default é 4.
+    - amostras_latencia (int): Quantidade de latências recentes usadas nos percentis. Default é 10000.
+    """
+
+    def __init__(self, classificador, janela_ms=5, tamanho_maximo_lote=32, n_workers=4, amostras_latencia=10000):
+        self.classificador = classificador
+        self.janela_ms = janela_ms
+        self.tamanho_maximo_lote = tamanho_maximo_lote
+        self.n_workers = n_workers
+        self._executor = ThreadPoolExecutor(max_workers=n_workers)
+        self._fila = None
+        self._latencias = deque(maxlen=amostras_latencia)
+        self._inicio = time.monotonic()
+        self.requisicoes = 0
+        self.erros = 0
+        self.lotes = 0
+        self.imagens_em_lotes = 0
+
+    async def iniciar(self, host='127.0.0.1', porta=8000):
+        """
+        Inicia o servidor e o agrupador de requisições. Executa até ser cancelado.
+        """
+        self._fila = asyncio.Queue()
+        self._inicio = time.monotonic()
+        agrupador = asyncio.create_task(self._agrupar_requisicoes())
+        servidor = await asyncio.start_server(self._atender_conexao, host, porta)
+        print(f'Servidor de inferência em http://{host}:{porta} '
+              f'(janela {self.janela_ms} ms, lote máximo {self.tamanho_maximo_lote}, {self.n_workers} workers)')
+        try:
+            async with servidor:
+                await servidor.serve_forever()
+        finally:
+            agrupador.cancel()
+            self._executor.shutdown(wait=False)
+
+    def metricas(self):
+        """
+        Retorna latências (p50/p99, em ms, medidas no servidor), vazão e contadores.
+        """
+        latencias = np.array(self._latencias) * 1000
+        duracao = time.monotonic() - self._inicio
+        return {
+            'requisicoes': self.requisicoes,
+            'erros': self.erros,
+            'lotes': self.lotes,
+            'tamanho_medio_lote': self.imagens_em_lotes / self.lotes if self.lotes else 0.0,
+            'latencia_p50_ms': float(np.percentile(latencias, 50)) if len(latencias) else None,
+            'latencia_p99_ms': float(np.percentile(latencias, 99)) if len(latencias) else None,
+            'vazao_rps': self.requisicoes / duracao if duracao > 0 else 0.0,
+        }
+
+    async def _classificar(self, imagem_bytes):
+        futuro = asyncio.get_running_loop().create_future()
+        await self._fila.put((imagem_bytes, futuro))
+        return await futuro
+
+    async def _agrupar_requisicoes(self):
+        laco = asyncio.get_running_loop()
+        vagas = asyncio.Semaphore(self.n_workers)
+        while True:
+            lote = [await self._fila.get()]
+            # Aguarda novas requisições até completar o lote ou esgotar a janela
+            prazo = laco.time() + self.janela_ms / 1000
+            while len(lote) < self.tamanho_maximo_lote:
+                restante = prazo - laco.time()
+                if restante <= 0:
+                    break
+                try:
+                    lote.append(await asyncio.wait_for(self._fila.get(), restante))
+                except asyncio.TimeoutError:
+                    break
+            # Limita os lotes em execução ao número de workers; os demais continuam se acumulando
+            await vagas.acquire()
+            tarefa = asyncio.create_task(self._processar_lote(lote))
+            tarefa.add_done_callback(lambda _: vagas.release())
+
+    async def _processar_lote(self, lote):
+        laco = asyncio.get_running_loop()
+        entradas = [entrada for entrada, _ in lote]
+        self.lotes += 1
+        self.imagens_em_lotes += len(lote)
+        instrumentacao.contar('servidor.lotes')
+        try:
+            with instrumentacao.intervalo('servidor.lote', imagens=len(lote)):
+                rotulos = await laco.run_in_executor(self._executor, self.classificador.prever, entradas)
+            resultados = [(rotulo, None) for rotulo in rotulos]
+        except Exception:
+            # Reprocessa individualmente para isolar a requisição com erro
+            resultados = []
+            for entrada in entradas:
+                try:
+                    rotulo = await laco.run_in_executor(self._executor, self.classificador.prever, [entrada])
+                    resultados.append((rotulo[0], None))
+                except Exception as e:
+                    resultados.append((None, e))
+        for (_, futuro), (rotulo, erro) in zip(lote, resultados):
+            if futuro.done():
+                continue
+            if erro is not None:
+                futuro.set_exception(erro)
+            else:
+                futuro.set_result(rotulo)
+
+    async def _atender_conexao(self, leitor, escritor):
+        try:
+            while True:
+                linha = await leitor.readline()
+                if not linha:
+                    break
+                metodo, rota, _ = linha.decode('latin-1').split(' ', 2)
+                cabecalhos = {}
+                while True:
+                    linha = await leitor.readline()
+                    if linha in (b'\r\n', b'\n', b''):
+                        break
+                    nome, _, valor = linha.decode('latin-1').partition(':')
+                    cabecalhos[nome.strip().lower()] = valor.strip()
+                tamanho = int(cabecalhos.get('content-length', 0))
+                corpo = await leitor.readexactly(tamanho) if tamanho else b''
+                status, resposta = await self._rotear(metodo, rota, corpo)
+                manter = cabecalhos.get('connection', '').lower() != 'close'
+                conteudo = json.dumps(resposta).encode()
+                escritor.write(
+                    f'HTTP/1.1 {status}\r\nContent-Type: application/json\r\n'
+                    f'Content-Length: {len(conteudo)}\r\nConnection: {"keep-alive" if manter else "close"}\r\n\r\n'.encode()
+                    + conteudo
+                )
+                await escritor.drain()
+                if not manter:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            escritor.close()
+
+    async def _rotear(self, metodo, rota, corpo):
+        if metodo == 'POST' and rota == '/prever':
+            inicio = time.perf_counter()
+            self.requisicoes += 1
+            try:
+                rotulo = await self._classificar(corpo)
+            except Exception as e:
+                self.erros += 1
+                instrumentacao.contar('servidor.erros')
+                return '400 Bad Request', {'erro': str(e)}
+            self._latencias.append(time.perf_counter() - inicio)
+            return '200 OK', {'rotulo': str(rotulo)}
+        if metodo == 'GET' and rota == '/metricas':
+            return '200 OK', self.metricas()
+        if metodo == 'GET' and rota == '/saude':
+            return '200 OK', {'status': 'ok'}
+        return '404 Not Found', {'erro': f'Rota {metodo} {rota} não encontrada.'}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Servidor HTTP local de inferência GLCM')
+    parser.add_argument('--modelo', required=True, help='Caminho do modelo treinado (.pkl) ou diretório de artefato')
+    parser.add_argument('--rotulos', default=None, help='Caminho dos rótulos de treinamento com o encoder (opcional com artefato)')
+    parser.add_argument('--redutor', default=None, help='Caminho do redutor PCA ajustado no treinamento')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, default=8000)
+    parser.add_argument('--janela_ms', type=float, default=5)
+    parser.add_argument('--lote_maximo', type=int, default=32)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    classificador = Classificador(args.modelo, args.rotulos, args.redutor)
+    servidor = ServidorInferencia(classificador, args.janela_ms, args.lote_maximo, args.workers)
+    try:
+        asyncio.run(servidor.iniciar(args.host, args.porta))
+    except KeyboardInterrupt:
+        print('Servidor encerrado.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,270 @@
+# Este módulo executa o pipeline completo (listagem, extração GLCM, PCA, codificação dos rótulos,
+# treinamento e avaliação dos classificadores) pela linha de comando, sem o Colab nem widgets
+# As etapas formam um grafo (grafo.py): resultados cujas entradas não mudaram são reaproveitados,
+# e os ramos independentes (extração de treino e de teste, os quatro classificadores) rodam em paralelo
+#
+# Uso:
+#   python -m modulos.pipeline.executar --base /dados/Extracao_Classificacao --dataset covid19 \
+#       --classificadores knn svm --parametros '{"svm": {"modo": "sgd"}}' --workers 4
+#
+# Estrutura esperada: <base>/datasets/<dataset>/train e .../test, com uma subpasta por classe.
+# Os resultados ficam em <base>/pipeline/<dataset>/<etapa>/<chave>/ e o resumo em resumo.json.
+
+import os
+import json
+import hashlib
+import argparse
+
+import numpy as np
+
+from modulos.classificadores import knn, mlp, random_forest, svm
+from modulos.descritores import glcm, reducao
+from modulos.pipeline.grafo import GrafoEtapas
+from modulos.utils import cache, dados, instrumentacao, metricas, rotulos
+
+# Funções de treinamento e de previsão de cada classificador
+CLASSIFICADORES = {
+    'rf': (random_forest.treinar_rf, random_forest.testar_rf),
+    'svm': (svm.treinar_svm, svm.testar_svm),
+    'knn': (knn.treinar_knn, knn.testar_knn),
+    'mlp': (mlp.treinar_mlp, mlp.testar_mlp),
+}
+# Parâmetros de treinamento usados quando não informados em parametros_classificadores
+# (n_jobs não altera o modelo treinado, só o tempo, e por isso não entra na chave da etapa)
+PARAMETROS_PADRAO = {
+    'rf': {'n_jobs': -1},
+}
+CONJUNTOS = ('treino', 'teste')
+
+def montar_grafo(diretorio_treino, diretorio_teste, diretorio_saida, classificadores=tuple(CLASSIFICADORES),
+                 parametros_classificadores=None, parametros_glcm=None, n_componentes=50, tamanho_lote=256,
+                 n_jobs_extracao=1, n_threads_leitura=None, diretorio_cache_imagens=None, figuras=False, n_workers=4):
+    """
+    Monta o grafo de etapas do pipeline.
+
+    Etapas: listar_<conjunto> -> extrair_<conjunto> -> reduzir_<conjunto> e codificar_<conjunto> ->
+    treinar_<classificador> -> avaliar_<classificador>, para os conjuntos 'treino' e 'teste'. O PCA e
+    os encoders são ajustados nas etapas de treino e apenas aplicados nas de teste, de modo que uma
+    mudança no conjunto de teste não invalida os modelos treinados.
+
+    Parâmetros:
+    - diretorio_treino (str): Diretório das imagens de treinamento (uma subpasta por classe).
+    - diretorio_teste (str): Diretório das imagens de teste.
+    - diretorio_saida (str): Diretório raiz dos resultados das etapas.
+    - classificadores (list): Classificadores treinados e avaliados ('rf', 'svm', 'knn', 'mlp').
+                              Default é todos.
+    - parametros_classificadores (dict): Parâmetros repassados a treinar_<classificador>, por
+                                         classificador (ex.: {'svm': {'modo': 'sgd'}}), sobre os de
+                                         PARAMETROS_PADRAO (o Random Forest usa n_jobs=-1). Default é None.
+    - parametros_glcm (dict): Parâmetros repassados a glcm.extrair_glcm_arquivos (distancias,
+                              angulos, niveis, propriedades, escalas). Default é None.
+    - n_componentes (int): Componentes do PCA. Default é 50.
+    - tamanho_lote (int): Imagens decodificadas e extraídas por vez. Default é 256.
+    - n_jobs_extracao (int): Processos usados na extração GLCM de cada lote. Default é 1.
+    - n_threads_leitura (int): Threads de decodificação do LeitorImagens. Default é None (todos os núcleos).
+    - diretorio_cache_imagens (str): Diretório do cache de características por imagem (um arquivo
+                                     SQLite por conjunto), ou None para não usar. Default é None.
+    - figuras (bool): Se True, a avaliação também salva as figuras da matriz de confusão e do
+                      relatório de classificação (metricas.gerar_relatorio). Default é False.
+    - n_workers (int): Etapas executadas ao mesmo tempo. Default é 4.
+
+    Retorno:
+    - grafo (GrafoEtapas): O grafo, pronto para grafo.executar().
+    """
+    parametros_classificadores = parametros_classificadores or {}
+    parametros_glcm = parametros_glcm or {}
+    for classificador in classificadores:
+        if classificador not in CLASSIFICADORES:
+            raise ValueError(f"Classificador {classificador} inválido. Opções: {', '.join(CLASSIFICADORES)}")
+
+    grafo = GrafoEtapas(diretorio_saida, n_workers=n_workers)
+    for conjunto, diretorio in zip(CONJUNTOS, (diretorio_treino, diretorio_teste)):
+        grafo.adicionar(f'listar_{conjunto}', _listar(diretorio), parametros={'diretorio': os.path.abspath(diretorio)},
+                        impressao=_impressao_diretorio(diretorio))
+        grafo.adicionar(f'extrair_{conjunto}',
+                        _extrair(conjunto, parametros_glcm, tamanho_lote, n_jobs_extracao, n_threads_leitura, diretorio_cache_imagens),
+                        dependencias=[f'listar_{conjunto}'], parametros={'glcm': parametros_glcm, 'tamanho': 256})
+    grafo.adicionar('reduzir_treino', _reduzir_treino(n_componentes), dependencias=['extrair_treino'],
+                    parametros={'n_componentes': n_componentes})
+    grafo.adicionar('reduzir_teste', _reduzir_teste, dependencias=['reduzir_treino', 'extrair_teste'])
+    grafo.adicionar('codificar_treino', _codificar_treino, dependencias=['extrair_treino'])
+    grafo.adicionar('codificar_teste', _codificar_teste, dependencias=['codificar_treino', 'extrair_teste'])
+    for classificador in classificadores:
+        parametros = parametros_classificadores.get(classificador, {})
+        grafo.adicionar(f'treinar_{classificador}', _treinar(classificador, parametros),
+                        dependencias=['reduzir_treino', 'codificar_treino'], parametros=parametros)
+        grafo.adicionar(f'avaliar_{classificador}', _avaliar(classificador, figuras),
+                        dependencias=[f'treinar_{classificador}', 'reduzir_teste', 'codificar_teste'],
+                        parametros={'figuras': figuras})
+    return grafo
+
+def _impressao_diretorio(diretorio):
+    # Caminho relativo, tamanho e data de modificação de cada arquivo identificam o conteúdo
+    # do dataset sem precisar ler as imagens
+    def impressao():
+        caminhos, _ = dados.listar_imagens(diretorio)
+        resumo = hashlib.sha256()
+        for caminho in caminhos:
+            informacoes = os.stat(caminho)
+            resumo.update(f'{os.path.relpath(caminho, diretorio)}|{informacoes.st_size}|{informacoes.st_mtime_ns}\n'.encode())
+        return resumo.hexdigest()
+    return impressao
+
+def _listar(diretorio):
+    def etapa(entradas, diretorio_etapa):
+        caminhos, rotulos_arquivos = dados.listar_imagens(diretorio)
+        return {'caminhos': caminhos, 'rotulos': rotulos_arquivos}
+    return etapa
+
+def _extrair(conjunto, parametros_glcm, tamanho_lote, n_jobs, n_threads_leitura, diretorio_cache_imagens):
+    def etapa(entradas, diretorio_etapa):
+        lista = entradas[f'listar_{conjunto}']
+        leitor = dados.LeitorImagens(tamanho=256, n_threads=n_threads_leitura)
+        # Um arquivo por conjunto: as extrações de treino e de teste gravam ao mesmo tempo
+        cache_imagens = None
+        if diretorio_cache_imagens:
+            cache_imagens = cache.CacheCaracteristicas(os.path.join(diretorio_cache_imagens, f'{conjunto}.sqlite'))
+        try:
+            caracteristicas, validos = glcm.extrair_glcm_arquivos(lista['caminhos'], leitor, cache_imagens, leitor.parametros,
+                                                                  tamanho_lote=tamanho_lote, n_jobs=n_jobs, progresso=False,
+                                                                  **parametros_glcm)
+        finally:
+            leitor.fechar()
+            if cache_imagens is not None:
+                cache_imagens.fechar()
+        caminho = os.path.join(diretorio_etapa, 'caracteristicas.npy')
+        np.save(caminho, caracteristicas)
+        rotulos_validos = [rotulo for rotulo, valido in zip(lista['rotulos'], validos) if valido]
+        return {'caracteristicas': caminho, 'rotulos': rotulos_validos}
+    return etapa
+
+def _reduzir_treino(n_componentes):
+    # O PCA é ajustado apenas no treinamento
+    def etapa(entradas, diretorio_etapa):
+        brutas = dados.carregar_caracteristicas(entradas['extrair_treino']['caracteristicas'])
+        redutor = reducao.ajustar_redutor(brutas, n_componentes=n_componentes)
+        resultado = {'redutor': os.path.join(diretorio_etapa, 'pca.pkl'),
+                     'caracteristicas': os.path.join(diretorio_etapa, 'caracteristicas.npy')}
+        dados.salvar_modelo(redutor, resultado['redutor'])
+        dados.salvar_caracteristicas(reducao.aplicar_redutor(redutor, brutas), resultado['caracteristicas'],
+                                     parametros={'n_componentes': n_componentes})
+        return resultado
+    return etapa
+
+def _reduzir_teste(entradas, diretorio_etapa):
+    brutas = dados.carregar_caracteristicas(entradas['extrair_teste']['caracteristicas'])
+    redutor = dados.carregar_modelo(entradas['reduzir_treino']['redutor'])
+    caminho = os.path.join(diretorio_etapa, 'caracteristicas.npy')
+    dados.salvar_caracteristicas(reducao.aplicar_redutor(redutor, brutas), caminho)
+    return {'caracteristicas': caminho}
+
+def _codificar_treino(entradas, diretorio_etapa):
+    rotulos_treino = entradas['extrair_treino']['rotulos']
+    resultado = {'label': os.path.join(diretorio_etapa, 'rotulos_labelenc.npy'),
+                 'onehot': os.path.join(diretorio_etapa, 'rotulos_onehotenc.npy')}
+    dados.salvar_rotulos(*rotulos.codificar_rotulos_label(rotulos_treino), resultado['label'])
+    dados.salvar_rotulos(*rotulos.codificar_rotulos_onehot(rotulos_treino), resultado['onehot'])
+    return resultado
+
+def _codificar_teste(entradas, diretorio_etapa):
+    # Os encoders do treinamento são reaplicados, de modo que os códigos de uma mesma classe
+    # coincidem nos dois conjuntos
+    rotulos_teste = entradas['extrair_teste']['rotulos']
+    resultado = {'label': os.path.join(diretorio_etapa, 'rotulos_labelenc.npy'),
+                 'onehot': os.path.join(diretorio_etapa, 'rotulos_onehotenc.npy')}
+    _, encoder = dados.carregar_rotulos(entradas['codificar_treino']['label'])
+    dados.salvar_rotulos(encoder.transform(rotulos_teste), encoder, resultado['label'])
+    _, encoder = dados.carregar_rotulos(entradas['codificar_treino']['onehot'])
+    dados.salvar_rotulos(encoder.transform(np.array(rotulos_teste).reshape(-1, 1)), encoder, resultado['onehot'])
+    return resultado
+
+def _treinar(classificador, parametros):
+    def etapa(entradas, diretorio_etapa):
+        treinar, _ = CLASSIFICADORES[classificador]
+        caracteristicas = dados.carregar_caracteristicas(entradas['reduzir_treino']['caracteristicas'])
+        # O MLP é treinado com os rótulos one-hot, como no notebook
+        codificacao = 'onehot' if classificador == 'mlp' else 'label'
+        rotulos_treino, _ = dados.carregar_rotulos(entradas['codificar_treino'][codificacao])
+        modelo = treinar(caracteristicas, rotulos_treino, **{**PARAMETROS_PADRAO.get(classificador, {}), **parametros})
+        caminho = os.path.join(diretorio_etapa, f'{classificador}.pkl')
+        dados.salvar_modelo(modelo, caminho)
+        return {'modelo': caminho}
+    return etapa
+
+def _avaliar(classificador, figuras):
+    def etapa(entradas, diretorio_etapa):
+        _, testar = CLASSIFICADORES[classificador]
+        caracteristicas = dados.carregar_caracteristicas(entradas['reduzir_teste']['caracteristicas'])
+        codificacao = 'onehot' if classificador == 'mlp' else 'label'
+        rotulos_verdadeiros, encoder = dados.carregar_rotulos(entradas['codificar_teste'][codificacao])
+        modelo = dados.carregar_modelo(entradas[f'treinar_{classificador}']['modelo'])
+        rotulos_previstos = testar(modelo, caracteristicas)
+        if classificador == 'mlp':
+            # Decodifica os vetores one-hot para os nomes das classes
+            rotulos_previstos = encoder.inverse_transform(mlp.ajustar_amostras_zero(rotulos_previstos)).ravel()
+            rotulos_verdadeiros = encoder.inverse_transform(rotulos_verdadeiros).ravel()
+            nomes_das_classes = encoder.categories_[0]
+        else:
+            nomes_das_classes = encoder.classes_
+            rotulos_previstos = nomes_das_classes[rotulos_previstos]
+            rotulos_verdadeiros = nomes_das_classes[rotulos_verdadeiros]
+
+        # As figuras são desenhadas pela thread de figuras do metricas; a etapa só termina depois delas
+        resultado, futuro = metricas.gerar_relatorio(nomes_das_classes, rotulos_verdadeiros, rotulos_previstos,
+                                                     os.path.join(diretorio_etapa, 'metricas.json'),
+                                                     os.path.join(diretorio_etapa, f'{classificador}_mc.png'),
+                                                     os.path.join(diretorio_etapa, f'{classificador}_rc.png'),
+                                                     figuras='segundo_plano' if figuras else 'nenhum')
+        futuro.result()
+        return resultado
+    return etapa
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pipeline GLCM completo pela linha de comando, com etapas em cache')
+    parser.add_argument('--base', default='.', help='Diretório base (contém datasets/<dataset>/train e test)')
+    parser.add_argument('--dataset', required=True, help='Nome do dataset (ex.: covid19)')
+    parser.add_argument('--treino', default=None, help='Diretório das imagens de treino (padrão: <base>/datasets/<dataset>/train)')
+    parser.add_argument('--teste', default=None, help='Diretório das imagens de teste (padrão: <base>/datasets/<dataset>/test)')
+    parser.add_argument('--saida', default=None, help='Diretório dos resultados (padrão: <base>/pipeline/<dataset>)')
+    parser.add_argument('--classificadores', nargs='+', default=list(CLASSIFICADORES), choices=list(CLASSIFICADORES))
+    parser.add_argument('--parametros', default='{}', help='JSON com os parâmetros de cada classificador, ex.: \'{"svm": {"modo": "sgd"}}\'')
+    parser.add_argument('--glcm', default='{}', help='JSON com os parâmetros da extração GLCM, ex.: \'{"niveis": 16}\'')
+    parser.add_argument('--n_componentes', type=int, default=50)
+    parser.add_argument('--tamanho_lote', type=int, default=256)
+    parser.add_argument('--n_jobs_extracao', type=int, default=1)
+    parser.add_argument('--threads_leitura', type=int, default=-1)
+    parser.add_argument('--cache_imagens', default=None, help='Diretório do cache de características por imagem')
+    parser.add_argument('--workers', type=int, default=4, help='Etapas executadas ao mesmo tempo')
+    parser.add_argument('--figuras', action='store_true', help='Salva as figuras da matriz de confusão e do relatório')
+    parser.add_argument('--forcar', nargs='*', default=[], help='Etapas reexecutadas (com as que dependem delas) mesmo com resultado em cache')
+    parser.add_argument('--instrumentacao', action='store_true', help='Imprime os tempos de cada etapa ao final')
+    args = parser.parse_args()
+
+    # Sem display: as figuras são apenas salvas em arquivo
+    os.environ.setdefault('MPLBACKEND', 'Agg')
+    if args.instrumentacao:
+        instrumentacao.configurar(saidas=[instrumentacao.SaidaTexto()])
+    diretorio_dataset = os.path.join(args.base, 'datasets', args.dataset)
+    saida = args.saida or os.path.join(args.base, 'pipeline', args.dataset)
+    grafo = montar_grafo(args.treino or os.path.join(diretorio_dataset, 'train'),
+                         args.teste or os.path.join(diretorio_dataset, 'test'),
+                         saida, args.classificadores, json.loads(args.parametros), json.loads(args.glcm),
+                         args.n_componentes, args.tamanho_lote, args.n_jobs_extracao, args.threads_leitura,
+                         args.cache_imagens, args.figuras, args.workers)
+    resultados = grafo.executar(forcar=args.forcar)
+
+    resumo = {classificador: {'acuracia': resultados[f'avaliar_{classificador}']['acuracia'],
+                              'estado': grafo.estados[f'avaliar_{classificador}']}
+              for classificador in args.classificadores}
+    with open(os.path.join(saida, 'resumo.json'), 'w', encoding='utf-8') as arquivo:
+        json.dump({'etapas': grafo.estados, 'classificadores': resumo}, arquivo, indent=2)
+    print(f'\n{"classificador":<15}{"acurácia":>10}  estado')
+    for classificador, linha in resumo.items():
+        print(f'{classificador:<15}{linha["acuracia"] * 100:>9.2f}%  {linha["estado"]}')
+    if args.instrumentacao:
+        instrumentacao.exportar()
+
+
+if __name__ == '__main__':
+    main()
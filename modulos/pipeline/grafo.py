@@ -0,0 +1,188 @@
+# Este módulo implementa um executor de etapas organizadas em um grafo de dependências
+# Cada etapa tem uma chave calculada a partir do seu nome, dos seus parâmetros, da impressão
+# digital das suas entradas externas e das chaves das etapas de que depende. O resultado fica
+# em um diretório identificado pela chave, de modo que etapas cujas entradas não mudaram são
+# puladas, e etapas independentes são executadas em paralelo em um pool de threads
+
+import os
+import json
+import shutil
+import hashlib
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from modulos.utils import instrumentacao
+
+# Incrementar quando o formato dos diretórios das etapas mudar, invalidando os resultados salvos
+VERSAO_GRAFO = 1
+ARQUIVO_RESULTADO = 'resultado.json'
+
+class Etapa:
+    """
+    Uma etapa do grafo.
+
+    Parâmetros:
+    - nome (str): Nome único da etapa.
+    - funcao: Função chamada com (entradas, diretorio): `entradas` é um dicionário com o resultado
+              de cada dependência e `diretorio` é onde a etapa grava os seus arquivos. Deve retornar
+              um dicionário serializável em JSON (por exemplo, com os caminhos gravados).
+    - dependencias (list): Nomes das etapas cujos resultados a função recebe. Default é ().
+    - parametros (dict): Parâmetros que alteram o resultado; precisam ser serializáveis em JSON.
+                         Default é None.
+    - impressao: Função sem argumentos que retorna uma impressão digital (str) das entradas
+                 externas da etapa, como os arquivos de um diretório. Default é None.
+    """
+
+    def __init__(self, nome, funcao, dependencias=(), parametros=None, impressao=None):
+        self.nome = nome
+        self.funcao = funcao
+        self.dependencias = list(dependencias)
+        self.parametros = parametros or {}
+        self.impressao = impressao
+
+
+class GrafoEtapas:
+    """
+    Grafo de etapas com resultados em cache por chave e execução concorrente.
+
+    Os arquivos de cada etapa ficam em <diretorio>/<nome>/<chave>. O resultado.json é gravado por
+    último, de forma atômica, e só a sua presença marca a etapa como concluída; uma execução
+    interrompida é refeita do início na próxima vez. Diretórios de chaves antigas não são removidos.
+
+    Parâmetros:
+    - diretorio (str): Diretório raiz dos resultados das etapas.
+    - n_workers (int): Etapas executadas ao mesmo tempo. Default é 4.
+    """
+
+    def __init__(self, diretorio, n_workers=4):
+        self.diretorio = diretorio
+        self.n_workers = n_workers
+        self.etapas = {}
+        self.estados = {}
+
+    def adicionar(self, nome, funcao, dependencias=(), parametros=None, impressao=None):
+        """
+        Adiciona uma etapa ao grafo (ver Etapa) e a retorna.
+        """
+        if nome in self.etapas:
+            raise ValueError(f'Etapa {nome} já existe no grafo.')
+        self.etapas[nome] = Etapa(nome, funcao, dependencias, parametros, impressao)
+        return self.etapas[nome]
+
+    def ordem(self, alvos=None):
+        """
+        Retorna, em ordem topológica, as etapas necessárias para obter os alvos (todas, com None).
+        """
+        ordem, visitando, visitadas = [], set(), set()
+
+        def visitar(nome):
+            if nome in visitadas:
+                return
+            if nome not in self.etapas:
+                raise ValueError(f'Etapa {nome} não existe no grafo.')
+            if nome in visitando:
+                raise ValueError(f'Ciclo de dependências envolvendo a etapa {nome}.')
+            visitando.add(nome)
+            for dependencia in self.etapas[nome].dependencias:
+                visitar(dependencia)
+            visitando.discard(nome)
+            visitadas.add(nome)
+            ordem.append(nome)
+
+        for nome in (alvos if alvos is not None else self.etapas):
+            visitar(nome)
+        return ordem
+
+    def chaves(self, alvos=None):
+        """
+        Calcula a chave de cada etapa necessária para os alvos, em ordem topológica.
+        """
+        chaves = {}
+        for nome in self.ordem(alvos):
+            etapa = self.etapas[nome]
+            conteudo = {
+                'versao': VERSAO_GRAFO,
+                'nome': nome,
+                'parametros': etapa.parametros,
+                'impressao': etapa.impressao() if etapa.impressao is not None else None,
+                'dependencias': {dependencia: chaves[dependencia] for dependencia in etapa.dependencias},
+            }
+            chaves[nome] = hashlib.sha256(json.dumps(conteudo, sort_keys=True, default=str).encode()).hexdigest()[:16]
+        return chaves
+
+    def executar(self, alvos=None, forcar=()):
+        """
+        Executa as etapas necessárias para os alvos, pulando as que já têm resultado para a chave atual.
+
+        Parâmetros:
+        - alvos (list): Etapas desejadas; as dependências são incluídas. Default é None (todas).
+        - forcar (list): Etapas reexecutadas mesmo que o resultado já exista; as etapas que dependem
+                         delas, direta ou indiretamente, também são reexecutadas. Default é ().
+
+        Retorno:
+        - resultados (dict): Resultado de cada etapa executada ou lida do cache. O estado de cada
+                             etapa ('cache' ou 'executada') fica em self.estados.
+        """
+        chaves = self.chaves(alvos)
+        for nome in forcar:
+            if nome not in self.etapas:
+                raise ValueError(f'Etapa {nome} não existe no grafo.')
+        # Os resultados em cache das etapas posteriores foram calculados a partir da saída antiga
+        # (as chaves estão em ordem topológica)
+        forcadas = set(forcar)
+        for nome in chaves:
+            if any(dependencia in forcadas for dependencia in self.etapas[nome].dependencias):
+                forcadas.add(nome)
+        resultados = {}
+        pendentes = []
+        for nome, chave in chaves.items():
+            caminho_resultado = os.path.join(self._diretorio_etapa(nome, chave), ARQUIVO_RESULTADO)
+            if nome not in forcadas and os.path.exists(caminho_resultado):
+                with open(caminho_resultado, 'r', encoding='utf-8') as arquivo:
+                    resultados[nome] = json.load(arquivo)
+                self.estados[nome] = 'cache'
+                instrumentacao.contar('pipeline.etapas_cache')
+            else:
+                pendentes.append(nome)
+        print(f'Pipeline: {len(chaves) - len(pendentes)} etapas em cache, {len(pendentes)} a executar')
+
+        with ThreadPoolExecutor(max_workers=max(1, self.n_workers)) as executor:
+            em_execucao = {}
+            while pendentes or em_execucao:
+                # Submete as etapas cujas dependências já têm resultado
+                for nome in [nome for nome in pendentes
+                             if all(dependencia in resultados for dependencia in self.etapas[nome].dependencias)]:
+                    pendentes.remove(nome)
+                    entradas = {dependencia: resultados[dependencia] for dependencia in self.etapas[nome].dependencias}
+                    em_execucao[executor.submit(self._executar_etapa, nome, chaves[nome], entradas)] = nome
+                concluidas, _ = wait(em_execucao, return_when=FIRST_COMPLETED)
+                for futuro in concluidas:
+                    nome = em_execucao.pop(futuro)
+                    erro = futuro.exception()
+                    if erro is not None:
+                        # Não inicia novas etapas; as que já estão em execução terminam antes do erro subir
+                        pendentes.clear()
+                        for outro in em_execucao:
+                            outro.cancel()
+                        raise RuntimeError(f'Falha na etapa {nome}: {erro}') from erro
+                    resultados[nome] = futuro.result()
+                    self.estados[nome] = 'executada'
+        return resultados
+
+    def _diretorio_etapa(self, nome, chave):
+        return os.path.join(self.diretorio, nome, chave)
+
+    def _executar_etapa(self, nome, chave, entradas):
+        diretorio = self._diretorio_etapa(nome, chave)
+        # Restos de uma execução interrompida (ou forçada) são descartados
+        if os.path.exists(diretorio):
+            shutil.rmtree(diretorio)
+        os.makedirs(diretorio)
+        print(f'Pipeline: iniciando {nome} ({chave})')
+        with instrumentacao.intervalo(f'pipeline.{nome}') as medicao:
+            resultado = self.etapas[nome].funcao(entradas, diretorio)
+        caminho_resultado = os.path.join(diretorio, ARQUIVO_RESULTADO)
+        with open(caminho_resultado + '.tmp', 'w', encoding='utf-8') as arquivo:
+            json.dump(resultado, arquivo, indent=2, default=str)
+        os.replace(caminho_resultado + '.tmp', caminho_resultado)
+        print(f'Pipeline: {nome} concluída em {round(medicao.duracao, 2)}s')
+        return resultado
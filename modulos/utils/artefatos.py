@@ -0,0 +1,322 @@
+# Este módulo implementa o formato de artefato dos modelos treinados: um diretório com um
+# manifesto JSON versionado, a estrutura do modelo (pickle sem os arrays) e os arrays
+# numéricos em arquivos .npy que são abertos com memória mapeada.
+#
+# Os arrays são agrupados por tipo e forma das linhas e concatenados em um único arquivo por
+# grupo. Na leitura cada array é uma fatia (view) do arquivo mapeado: nada é copiado até ser
+# acessado e o carregamento não depende do tamanho do modelo. Com compilar_rf=True, um
+# RandomForestClassifier é gravado já compilado (random_forest.FlorestaCompilada), cujos arrays
+# planos de nós e de folhas são usados diretamente na previsão, sem reconstruir os objetos Tree
+# do scikit-learn.
+# Modelos pequenos (como o MLP) ficam inteiros no pickle, onde abrir arquivos mapeados só
+# acrescentaria tempo ao carregamento.
+#
+# Estrutura do diretório:
+#   manifesto.json      versão do formato, classe do modelo, versões das bibliotecas,
+#                       metadados (extrator, redutor, classes) e SHA-256 de cada arquivo
+#   estrutura.pkl       pickle dos objetos com referências aos arrays externos
+#   arrays_<n>.npy      arrays concatenados de cada grupo (ausentes em modelos pequenos)
+#
+# Uso:
+#   from modulos.utils import artefatos
+#   artefatos.salvar_artefato(modelo, 'modelos/knn', redutor=redutor, encoder=encoder,
+#                             metadados={'glcm': parametros_glcm})
+#   modelo, redutor, encoder, manifesto = artefatos.carregar_artefato('modelos/knn')
+
+import io
+import os
+import copy
+import json
+import time
+import pickle
+import hashlib
+import platform
+
+import numpy as np
+import sklearn
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.neural_network import MLPClassifier
+
+from modulos.classificadores import random_forest
+from modulos.utils import instrumentacao
+
+VERSAO_FORMATO = 1
+ARQUIVO_MANIFESTO = 'manifesto.json'
+ARQUIVO_ESTRUTURA = 'estrutura.pkl'
+# Arrays menores que isso (em bytes) ficam dentro do pickle da estrutura
+TAMANHO_MINIMO_EXTERNO = 1024
+# Se os arrays externos somarem menos que isso (em bytes), o modelo todo fica no pickle
+TAMANHO_MINIMO_MAPEADO = 1 << 20
+
+
+def salvar_artefato(modelo, diretorio, redutor=None, encoder=None, metadados=None, float32=True, compilar_rf=False):
+    """
+    Salva um modelo (e, opcionalmente, o redutor PCA e o encoder de rótulos) como artefato.
+
+    Parâmetros:
+    - modelo (object): Classificador treinado (qualquer objeto serializável com pickle).
+    - diretorio (str): Diretório do artefato (criado se necessário; arquivos anteriores são substituídos).
+    - redutor (PCA ou IncrementalPCA): Redutor usado para produzir as entradas do modelo. Default é None.
+    - encoder (LabelEncoder ou OneHotEncoder): Encoder dos rótulos de treinamento. Default é None.
+    - metadados (dict): Informações serializáveis em JSON sobre a origem das entradas (parâmetros
+                        do extrator GLCM, dataset...). Default é None.
+    - float32 (bool): Se True, armazena em float32 os pesos do MLP e a base de treinamento do KNN
+                      com busca por força bruta. Default é True.
+    - compilar_rf (bool): Se True, um RandomForestClassifier de uma saída é gravado como
+                          random_forest.FlorestaCompilada (mesmas previsões, carregada no lugar
+                          do modelo original). A floresta compilada é mais rápida em lotes de até
+                          cerca de mil amostras (5x com 64, 1.2x com 1000) e mais lenta em lotes
+                          maiores (0.7x com 10000, ver benchmarks/benchmark_rf.py): use True em
+                          artefatos de inferência (Classificador, servidor) e False nos de
+                          classificação em massa. Default é False.
+
+    Retorno:
+    - manifesto (dict): O manifesto gravado em manifesto.json.
+    """
+    os.makedirs(diretorio, exist_ok=True)
+    print('Salvando artefato do modelo...')
+    with instrumentacao.intervalo('artefatos.salvar'):
+        gravado = modelo
+        if compilar_rf and isinstance(modelo, RandomForestClassifier) and modelo.n_outputs_ == 1:
+            gravado = random_forest.compilar_rf(modelo)
+        objetos = {'modelo': _reduzir_precisao(gravado) if float32 else gravado, 'redutor': redutor, 'encoder': encoder}
+        separador = _SeparadorArrays()
+        estrutura = io.BytesIO()
+        _PicklerArtefato(estrutura, separador).dump(objetos)
+        if separador.total_bytes < TAMANHO_MINIMO_MAPEADO:
+            # Modelo pequeno: um único pickle carrega mais rápido que vários arquivos mapeados
+            separador = _SeparadorArrays()
+            estrutura = io.BytesIO(pickle.dumps(objetos, protocol=pickle.HIGHEST_PROTOCOL))
+
+        arquivos = {}
+        for numero, (partes, dtype, forma_linha) in enumerate(separador.grupos()):
+            nome = f'arrays_{numero}.npy'
+            dados = partes[0] if len(partes) == 1 else np.concatenate(partes)
+            np.save(os.path.join(diretorio, nome), dados)
+            arquivos[nome] = {'dtype': str(dtype), 'shape': list(dados.shape)}
+        _gravar_atomico(os.path.join(diretorio, ARQUIVO_ESTRUTURA), estrutura.getvalue())
+        arquivos[ARQUIVO_ESTRUTURA] = {}
+        for nome, informacoes in arquivos.items():
+            caminho = os.path.join(diretorio, nome)
+            informacoes['bytes'] = os.path.getsize(caminho)
+            informacoes['sha256'] = _sha256(caminho)
+
+        manifesto = {
+            'formato': 'artefato-modelo',
+            'versao': VERSAO_FORMATO,
+            'criado_em': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'classe': f'{type(modelo).__module__}.{type(modelo).__qualname__}',
+            'classe_gravada': f'{type(gravado).__module__}.{type(gravado).__qualname__}',
+            'redutor': type(redutor).__name__ if redutor is not None else None,
+            'classes': [str(classe) for classe in _classes_encoder(encoder)] if encoder is not None else None,
+            'float32': float32,
+            'ambiente': {'python': platform.python_version(), 'numpy': np.__version__, 'scikit-learn': sklearn.__version__},
+            'metadados': metadados or {},
+            'arrays': separador.referencias,
+            'arquivos': arquivos,
+        }
+        _remover_arquivos_antigos(diretorio, arquivos)
+        _gravar_atomico(os.path.join(diretorio, ARQUIVO_MANIFESTO),
+                        json.dumps(manifesto, indent=2, ensure_ascii=False, default=str).encode('utf-8'))
+    tamanho = sum(informacoes['bytes'] for informacoes in arquivos.values())
+    print(f'Artefato salvo em: {diretorio} ({tamanho / 1024 ** 2:.2f} MB)')
+    return manifesto
+
+
+def carregar_artefato(diretorio, verificar=False):
+    """
+    Carrega um artefato salvo com salvar_artefato.
+
+    Os arrays são fatias de arquivos mapeados em memória no modo cópia-na-escrita: só as páginas
+    acessadas são lidas do disco e o arquivo nunca é alterado. A estrutura (pickle) é sempre
+    conferida com o SHA-256 do manifesto; com verificar=True todos os arrays também são conferidos,
+    o que exige ler o artefato inteiro.
+
+    Parâmetros:
+    - diretorio (str): Diretório do artefato.
+    - verificar (bool): Se True, confere o SHA-256 de todos os arquivos. Default é False.
+
+    Retorno:
+    - modelo (object): O classificador (um Random Forest gravado com compilar_rf=True volta como
+                       random_forest.FlorestaCompilada, ver manifesto['classe_gravada']).
+    - redutor (PCA, IncrementalPCA ou None): O redutor salvo junto ao modelo.
+    - encoder (LabelEncoder, OneHotEncoder ou None): O encoder salvo junto ao modelo.
+    - manifesto (dict): Manifesto do artefato.
+
+    Exceções:
+    - ValueError: Levantada se a versão do formato não for suportada ou se um checksum não conferir.
+    """
+    with instrumentacao.intervalo('artefatos.carregar'):
+        manifesto = carregar_manifesto(diretorio)
+        if manifesto.get('formato') != 'artefato-modelo' or manifesto.get('versao', 0) > VERSAO_FORMATO:
+            raise ValueError(f'Formato de artefato não suportado em {diretorio}: '
+                             f'{manifesto.get("formato")} versão {manifesto.get("versao")}.')
+        if verificar:
+            verificar_artefato(diretorio, manifesto)
+
+        with open(os.path.join(diretorio, ARQUIVO_ESTRUTURA), 'rb') as arquivo:
+            estrutura = arquivo.read()
+        if hashlib.sha256(estrutura).hexdigest() != manifesto['arquivos'][ARQUIVO_ESTRUTURA]['sha256']:
+            raise ValueError(f'Checksum de {ARQUIVO_ESTRUTURA} não confere em {diretorio}.')
+
+        mapeados = {}
+
+        def carregar_array(referencia):
+            nome, inicio, forma, transposto = manifesto['arrays'][referencia]
+            if nome not in mapeados:
+                mapeados[nome] = np.load(os.path.join(diretorio, nome), mmap_mode='c')
+            # ndarray comum (sem a subclasse memmap, que torna cada operação mais lenta) sobre o mesmo mapeamento
+            array = np.asarray(mapeados[nome][inicio:inicio + forma[0]]).reshape(forma)
+            return array.T if transposto else array
+
+        desserializador = pickle.Unpickler(io.BytesIO(estrutura))
+        desserializador.persistent_load = carregar_array
+        objetos = desserializador.load()
+    print(f'Modelo carregado de: {diretorio}')
+    return objetos['modelo'], objetos['redutor'], objetos['encoder'], manifesto
+
+
+def carregar_manifesto(diretorio):
+    """
+    Lê o manifesto de um artefato sem carregar o modelo.
+    """
+    with open(os.path.join(diretorio, ARQUIVO_MANIFESTO), 'r', encoding='utf-8') as arquivo:
+        return json.load(arquivo)
+
+
+def verificar_artefato(diretorio, manifesto=None):
+    """
+    Confere o tamanho e o SHA-256 de todos os arquivos do artefato.
+
+    Exceções:
+    - ValueError: Levantada com a lista de arquivos ausentes ou corrompidos.
+    """
+    manifesto = manifesto or carregar_manifesto(diretorio)
+    problemas = []
+    for nome, informacoes in manifesto['arquivos'].items():
+        caminho = os.path.join(diretorio, nome)
+        if not os.path.exists(caminho):
+            problemas.append(f'{nome} (ausente)')
+        elif os.path.getsize(caminho) != informacoes['bytes'] or _sha256(caminho) != informacoes['sha256']:
+            problemas.append(f'{nome} (checksum não confere)')
+    if problemas:
+        raise ValueError(f'Artefato {diretorio} corrompido: {", ".join(problemas)}')
+
+
+def eh_artefato(caminho):
+    """
+    Indica se o caminho é um diretório de artefato (contém manifesto.json).
+    """
+    return os.path.isdir(caminho) and os.path.exists(os.path.join(caminho, ARQUIVO_MANIFESTO))
+
+
+class _SeparadorArrays:
+    """
+    Recebe os arrays encontrados durante a serialização e os agrupa por (dtype, forma das
+    linhas). Cada array recebe uma referência [arquivo, linha inicial, forma, transposto].
+    """
+
+    def __init__(self):
+        self.referencias = []
+        self.total_bytes = 0
+        self._grupos = {}
+        self._vistos = {}
+
+    def referencia(self, array):
+        # O mesmo array referenciado por vários objetos (ex.: _fit_X e a KDTree) é gravado uma vez
+        if id(array) in self._vistos:
+            return self._vistos[id(array)][0]
+        transposto = not array.flags.c_contiguous and array.flags.f_contiguous
+        dados = np.ascontiguousarray(array.T if transposto else array)
+        chave = (dados.dtype, dados.shape[1:])
+        grupo = self._grupos.setdefault(chave, {'numero': len(self._grupos), 'partes': [], 'linhas': 0})
+        self.referencias.append([f'arrays_{grupo["numero"]}.npy', grupo['linhas'], list(dados.shape), transposto])
+        grupo['partes'].append(dados)
+        grupo['linhas'] += dados.shape[0]
+        self.total_bytes += dados.nbytes
+        # Mantém o array vivo para que seu id não seja reutilizado durante a serialização
+        self._vistos[id(array)] = (len(self.referencias) - 1, array)
+        return len(self.referencias) - 1
+
+    def grupos(self):
+        for (dtype, forma_linha), grupo in sorted(self._grupos.items(), key=lambda item: item[1]['numero']):
+            yield grupo['partes'], dtype, forma_linha
+
+
+class _PicklerArtefato(pickle.Pickler):
+    """
+    Pickler que substitui os arrays numéricos grandes por referências persistentes.
+    """
+
+    def __init__(self, arquivo, separador):
+        super().__init__(arquivo, protocol=pickle.HIGHEST_PROTOCOL)
+        self.separador = separador
+
+    def persistent_id(self, objeto):
+        if (type(objeto) is np.ndarray or isinstance(objeto, np.memmap)) and objeto.ndim > 0 \
+                and not objeto.dtype.hasobject and objeto.nbytes >= TAMANHO_MINIMO_EXTERNO:
+            return self.separador.referencia(objeto)
+        return None
+
+
+def _reduzir_precisao(modelo):
+    """
+    Retorna uma cópia rasa do modelo com os arrays que toleram float32 convertidos. Os demais
+    classificadores (SVC, Random Forest) dependem de float64 e são mantidos como estão.
+    """
+    if isinstance(modelo, KNeighborsClassifier) and getattr(modelo, '_fit_method', None) == 'brute':
+        modelo = copy.copy(modelo)
+        modelo._fit_X = np.asarray(modelo._fit_X, dtype=np.float32)
+    elif isinstance(modelo, MLPClassifier) and hasattr(modelo, 'coefs_'):
+        modelo = copy.copy(modelo)
+        modelo.coefs_ = [np.asarray(pesos, dtype=np.float32) for pesos in modelo.coefs_]
+        modelo.intercepts_ = [np.asarray(pesos, dtype=np.float32) for pesos in modelo.intercepts_]
+    return modelo
+
+
+def dtype_entrada(modelo):
+    """
+    Retorna o dtype dos arrays do modelo que as características devem ter antes do predict, ou
+    None se o modelo não exigir conversão.
+
+    Modelos gravados com float32=True (KNN de força bruta e MLP) guardam os arrays em float32; sem
+    a conversão das características, o scikit-learn promove esses arrays para float64 a cada
+    previsão.
+    """
+    if isinstance(modelo, KNeighborsClassifier) and getattr(modelo, '_fit_method', None) == 'brute':
+        return np.asarray(modelo._fit_X).dtype
+    if isinstance(modelo, MLPClassifier) and hasattr(modelo, 'coefs_'):
+        return np.asarray(modelo.coefs_[0]).dtype
+    return None
+
+
+def _classes_encoder(encoder):
+    # LabelEncoder guarda as classes em classes_; OneHotEncoder em categories_ (uma lista por coluna)
+    if hasattr(encoder, 'classes_'):
+        return list(encoder.classes_)
+    if hasattr(encoder, 'categories_'):
+        return list(encoder.categories_[0])
+    return []
+
+
+def _sha256(caminho):
+    resumo = hashlib.sha256()
+    with open(caminho, 'rb') as arquivo:
+        for bloco in iter(lambda: arquivo.read(1 << 20), b''):
+            resumo.update(bloco)
+    return resumo.hexdigest()
+
+
+def _gravar_atomico(caminho, conteudo):
+    temporario = caminho + '.tmp'
+    with open(temporario, 'wb') as arquivo:
+        arquivo.write(conteudo)
+    os.replace(temporario, caminho)
+
+
+def _remover_arquivos_antigos(diretorio, arquivos):
+    # Remove arrays de um artefato anterior salvo no mesmo diretório
+    for nome in os.listdir(diretorio):
+        if nome.startswith('arrays_') and nome.endswith('.npy') and nome not in arquivos:
+            os.remove(os.path.join(diretorio, nome))
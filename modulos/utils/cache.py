@@ -0,0 +1,145 @@
+# Este módulo implementa um cache persistente de características por imagem
+# As entradas são endereçadas pelo conteúdo do arquivo (ou caminho + data de modificação
+# + tamanho) junto com os parâmetros do extrator, de modo que apenas imagens novas ou
+# alteradas precisam ser reprocessadas
+
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import numpy as np
+
+from modulos.utils import instrumentacao
+
+class CacheCaracteristicas:
+    """
+    Cache em disco (SQLite) de vetores de características brutas por imagem.
+
+    Parâmetros:
+    - caminho_arquivo (str): Caminho do arquivo do banco SQLite do cache.
+    - tamanho_maximo (int): Limite, em bytes, para a soma dos vetores armazenados. Quando
+                            excedido, as entradas usadas há mais tempo (LRU) são removidas.
+                            Default é 1 GB.
+    - modo_chave (str): 'conteudo' calcula o hash SHA-256 do arquivo; 'metadados' usa
+                        caminho, data de modificação e tamanho, sem ler o arquivo.
+                        Default é 'conteudo'.
+
+    Os contadores de acertos, falhas, gravações e remoções ficam disponíveis em estatisticas().
+    """
+
+    def __init__(self, caminho_arquivo, tamanho_maximo=1024**3, modo_chave='conteudo'):
+        if modo_chave not in ('conteudo', 'metadados'):
+            raise ValueError("Modo de chave inválido. Escolha entre 'conteudo' e 'metadados'.")
+        diretorio = os.path.dirname(caminho_arquivo)
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+        self.caminho_arquivo = caminho_arquivo
+        self.tamanho_maximo = tamanho_maximo
+        self.modo_chave = modo_chave
+        self.acertos = 0
+        self.falhas = 0
+        self.gravacoes = 0
+        self.remocoes = 0
+        self._conexao = sqlite3.connect(caminho_arquivo)
+        self._conexao.execute(
+            'CREATE TABLE IF NOT EXISTS entradas ('
+            'chave TEXT PRIMARY KEY, dtype TEXT, vetor BLOB, tamanho INTEGER, ultimo_uso REAL)'
+        )
+        self._conexao.execute('CREATE INDEX IF NOT EXISTS idx_ultimo_uso ON entradas (ultimo_uso)')
+        self._conexao.commit()
+
+    def chave(self, caminho_arquivo, parametros):
+        """
+        Calcula a chave de uma imagem para um conjunto de parâmetros do extrator.
+
+        Parâmetros:
+        - caminho_arquivo (str): Caminho da imagem.
+        - parametros (dict): Parâmetros que alteram o vetor extraído (distâncias, ângulos,
+                             níveis, propriedades, leitura...). Precisa ser serializável em JSON.
+
+        Retorno:
+        - chave (str): Hash hexadecimal que identifica a entrada no cache.
+        """
+        resumo = hashlib.sha256()
+        if self.modo_chave == 'conteudo':
+            with open(caminho_arquivo, 'rb') as arquivo:
+                for bloco in iter(lambda: arquivo.read(1 << 20), b''):
+                    resumo.update(bloco)
+        else:
+            informacoes = os.stat(caminho_arquivo)
+            resumo.update(f'{os.path.abspath(caminho_arquivo)}|{informacoes.st_mtime_ns}|{informacoes.st_size}'.encode())
+        resumo.update(json.dumps(parametros, sort_keys=True, default=str).encode())
+        return resumo.hexdigest()
+
+    def obter(self, chave):
+        """
+        Retorna o vetor armazenado para a chave, ou None em caso de falha (miss).
+        """
+        linha = self._conexao.execute('SELECT dtype, vetor FROM entradas WHERE chave = ?', (chave,)).fetchone()
+        if linha is None:
+            self.falhas += 1
+            instrumentacao.contar('cache.falhas')
+            return None
+        self.acertos += 1
+        instrumentacao.contar('cache.acertos')
+        # Atualiza o último uso para a política LRU
+        self._conexao.execute('UPDATE entradas SET ultimo_uso = ? WHERE chave = ?', (time.time(), chave))
+        return np.frombuffer(linha[1], dtype=linha[0]).copy()
+
+    def armazenar(self, chave, vetor):
+        """
+        Armazena o vetor de características da chave e aplica o limite de tamanho do cache.
+        """
+        vetor = np.ascontiguousarray(vetor)
+        self._conexao.execute(
+            'INSERT OR REPLACE INTO entradas (chave, dtype, vetor, tamanho, ultimo_uso) VALUES (?, ?, ?, ?, ?)',
+            (chave, vetor.dtype.str, vetor.tobytes(), vetor.nbytes, time.time())
+        )
+        self.gravacoes += 1
+
+    def salvar(self):
+        """
+        Remove as entradas excedentes (LRU) e grava as alterações pendentes no disco.
+        """
+        with instrumentacao.intervalo('cache.salvar'):
+            tamanho_total = self._tamanho_total()
+            if tamanho_total > self.tamanho_maximo:
+                cursor = self._conexao.execute('SELECT chave, tamanho FROM entradas ORDER BY ultimo_uso')
+                removidas = []
+                for chave, tamanho in cursor:
+                    if tamanho_total <= self.tamanho_maximo:
+                        break
+                    removidas.append((chave,))
+                    tamanho_total -= tamanho
+                self._conexao.executemany('DELETE FROM entradas WHERE chave = ?', removidas)
+                self.remocoes += len(removidas)
+            self._conexao.commit()
+
+    def fechar(self):
+        """
+        Salva as alterações pendentes e fecha o banco do cache.
+        """
+        self.salvar()
+        self._conexao.close()
+
+    def _tamanho_total(self):
+        return self._conexao.execute('SELECT COALESCE(SUM(tamanho), 0) FROM entradas').fetchone()[0]
+
+    def estatisticas(self):
+        """
+        Retorna os contadores do cache.
+
+        Retorno:
+        - dict com acertos, falhas, taxa_acerto, gravacoes, remocoes, entradas e bytes.
+        """
+        consultas = self.acertos + self.falhas
+        return {
+            'acertos': self.acertos,
+            'falhas': self.falhas,
+            'taxa_acerto': self.acertos / consultas if consultas else 0.0,
+            'gravacoes': self.gravacoes,
+            'remocoes': self.remocoes,
+            'entradas': self._conexao.execute('SELECT COUNT(*) FROM entradas').fetchone()[0],
+            'bytes': self._tamanho_total(),
+        }
@@ -1,14 +1,23 @@
 # Este módulo possui funções utilitárias para 
 # manipulação de arquivos, carregamento e armazenamento de dados
 
+import io
 import os
 import cv2
+import json
 import pickle
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from tqdm.notebook import tqdm  
 
+from modulos.utils import artefatos, instrumentacao
+
 def ler_imagem(caminho_arquivo):
     # Lê uma imagem com a OpenCV
     imagem = cv2.imread(caminho_arquivo, cv2.IMREAD_UNCHANGED)
+    # Arquivos que não são imagens (ou corrompidos) são retornados como None
+    if imagem is None:
+        return None
     # Verifica se é uma imagem colorida
     if len(imagem.shape) > 2: 
         # Convert de BGR para RGB
@@ -51,7 +60,8 @@ def carregar_imagens(diretorio):
                     caminho = os.path.join(caminho_subpasta, arquivo)
                     
                     # Carrega a imagem
-                    imagem = ler_imagem(caminho)
+                    with instrumentacao.intervalo('dados.decodificar'):
+                        imagem = ler_imagem(caminho)
                     
                     if imagem is not None:  # Verifica se a imagem foi carregada com sucesso
                         imagens_memoria.append(imagem)  # Armazena a imagem
@@ -61,6 +71,242 @@ def carregar_imagens(diretorio):
     return imagens_memoria, rotulos
     
 
+def listar_imagens(diretorio):
+    """
+    Lista os arquivos de imagem de um diretório organizado em subpastas por classe,
+    sem carregá-los.
+
+    Parâmetros:
+    - diretorio (str): Caminho para o diretório raiz que contém as subpastas com as imagens.
+
+    Retorno:
+    - caminhos (list): Lista com o caminho de cada arquivo.
+    - rotulos (list): Lista contendo o rótulo (nome da subpasta) de cada arquivo.
+    """
+    caminhos = []
+    rotulos = []
+    for subpasta in sorted(os.listdir(diretorio)):
+        caminho_subpasta = os.path.join(diretorio, subpasta)
+        if os.path.isdir(caminho_subpasta):  # Verifica se o caminho é uma subpasta
+            for arquivo in sorted(os.listdir(caminho_subpasta)):
+                caminhos.append(os.path.join(caminho_subpasta, arquivo))
+                rotulos.append(subpasta)  # O nome da subpasta é utilizado como rótulo
+    return caminhos, rotulos
+
+# Flags da OpenCV que decodificam direto em escala de cinza, reduzindo a resolução
+# durante a decodificação (JPEG) pelo fator indicado
+FLAGS_REDUCAO_CINZA = {
+    1: cv2.IMREAD_GRAYSCALE,
+    2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    8: cv2.IMREAD_REDUCED_GRAYSCALE_8,
+}
+
+def ler_imagem_cinza(caminho_arquivo, fator_reducao=1):
+    """
+    Lê uma imagem já em escala de cinza de 8 bits, opcionalmente reduzida na decodificação.
+
+    Parâmetros:
+    - caminho_arquivo (str): Caminho da imagem.
+    - fator_reducao (int): 1, 2, 4 ou 8. Divide largura e altura durante a decodificação,
+                           evitando alocar a imagem em resolução cheia. Default é 1.
+
+    Retorno:
+    - imagem (numpy array): Imagem 2D uint8, ou None se o arquivo não puder ser lido.
+    """
+    if fator_reducao not in FLAGS_REDUCAO_CINZA:
+        raise ValueError(f'Fator de redução {fator_reducao} inválido. Use 1, 2, 4 ou 8.')
+    return cv2.imread(caminho_arquivo, FLAGS_REDUCAO_CINZA[fator_reducao])
+
+def iterar_imagens(diretorio, tamanho_lote=64, fator_reducao=1):
+    """
+    Percorre as imagens de um diretório e suas subpastas sob demanda, em lotes.
+
+    Ao contrário de carregar_imagens, apenas um lote fica em memória por vez e cada imagem
+    é decodificada direto em escala de cinza (e reduzida, se fator_reducao > 1), de modo
+    que o pico de memória depende do tamanho do lote e não do tamanho do dataset.
+
+    Parâmetros:
+    - diretorio (str): Caminho para o diretório raiz que contém as subpastas com as imagens.
+    - tamanho_lote (int): Número de imagens por lote. Default é 64.
+    - fator_reducao (int): Fator de redução aplicado na decodificação (1, 2, 4 ou 8). Default é 1.
+
+    Retorno:
+    - Gerador de tuplas (imagens, rotulos), ambos listas com até tamanho_lote elementos.
+    """
+    caminhos, rotulos_arquivos = listar_imagens(diretorio)
+
+    imagens = []
+    rotulos = []
+    with tqdm(total=len(caminhos), desc="Carregando imagens") as pbar:
+        for caminho, rotulo in zip(caminhos, rotulos_arquivos):
+            with instrumentacao.intervalo('dados.decodificar'):
+                imagem = ler_imagem_cinza(caminho, fator_reducao)
+            if imagem is not None:  # Verifica se a imagem foi carregada com sucesso
+                imagens.append(imagem)
+                rotulos.append(rotulo)
+            pbar.update(1)
+            if len(imagens) == tamanho_lote:
+                yield imagens, rotulos
+                imagens = []
+                rotulos = []
+    if imagens:
+        yield imagens, rotulos
+
+
+class LeitorImagens:
+    """
+    Etapa de decodificação que entrega as imagens já em escala de cinza de 8 bits e no tamanho
+    final (tamanho x tamanho), prontas para a extração GLCM.
+
+    Cada arquivo é decodificado direto em cinza (o canal alfa é descartado e imagens de 16 bits
+    são convertidas para 8 bits pelo byte mais significativo, como em ler_imagem_cinza). Em
+    arquivos JPEG a resolução é reduzida pelo próprio decodificador (por 2, 4 ou 8) até o menor
+    tamanho que ainda não fica abaixo do tamanho final. O redimensionamento (INTER_AREA ao
+    reduzir) escreve direto em um buffer reaproveitado entre lotes, e os arquivos de um lote são
+    decodificados em threads, já que a OpenCV libera o GIL.
+
+    Pode ser usado como leitor de glcm.extrair_glcm_arquivos: o objeto é chamável com um caminho
+    e ler_lote decodifica um lote inteiro em paralelo.
+
+    Parâmetros:
+    - tamanho (int): Lado das imagens entregues, em pixels. Default é 256.
+    - n_threads (int): Threads de decodificação (-1 ou None usa todos os núcleos). Default é None.
+    """
+
+    def __init__(self, tamanho=256, n_threads=None):
+        self.tamanho = tamanho
+        self.n_threads = (os.cpu_count() or 1) if n_threads is None or n_threads < 0 else max(1, n_threads)
+        self._buffer = np.empty((0, tamanho, tamanho), dtype=np.uint8)
+        self._executor = None
+
+    @property
+    def parametros(self):
+        """
+        Parâmetros que alteram a imagem entregue (para a chave do cache de características).
+        """
+        return {'leitor': 'LeitorImagens', 'tamanho': self.tamanho}
+
+    def __call__(self, caminho_arquivo):
+        imagem = np.empty((self.tamanho, self.tamanho), dtype=np.uint8)
+        return imagem if self._ler(caminho_arquivo, imagem) else None
+
+    def ler_lote(self, caminhos):
+        """
+        Decodifica um lote de arquivos em paralelo.
+
+        Retorno:
+        - imagens (numpy array): Array uint8 (n_validos, tamanho, tamanho). Quando todos os arquivos
+                                 são válidos, é uma view do buffer interno, sobrescrita no próximo lote.
+        - validos (numpy array): Array booleano indicando quais caminhos puderam ser lidos.
+        """
+        if len(caminhos) > len(self._buffer):
+            self._buffer = np.empty((len(caminhos), self.tamanho, self.tamanho), dtype=np.uint8)
+        with instrumentacao.intervalo('dados.decodificar', imagens=len(caminhos)):
+            if self.n_threads > 1 and len(caminhos) > 1:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.n_threads)
+                validos = list(self._executor.map(self._ler, caminhos, self._buffer))
+            else:
+                validos = [self._ler(caminho, destino) for caminho, destino in zip(caminhos, self._buffer)]
+        validos = np.array(validos, dtype=bool)
+        imagens = self._buffer[:len(caminhos)]
+        return (imagens if validos.all() else imagens[validos]), validos
+
+    def decodificar(self, conteudo, destino=None):
+        """
+        Decodifica os bytes de um arquivo de imagem (PNG, JPEG...) já em cinza e no tamanho final.
+
+        Retorno:
+        - imagem (numpy array): Array uint8 (tamanho, tamanho), ou None se não for uma imagem.
+        """
+        destino = np.empty((self.tamanho, self.tamanho), dtype=np.uint8) if destino is None else destino
+        return destino if self._decodificar(np.frombuffer(conteudo, dtype=np.uint8), destino) else None
+
+    def normalizar(self, imagem, destino=None):
+        """
+        Aplica a uma imagem já decodificada a mesma conversão de decodificar: cinza de 8 bits
+        (alfa descartado, 16 bits pelo byte mais significativo) e redimensionamento ao tamanho final.
+
+        Parâmetros:
+        - imagem (numpy array): Imagem 2D (cinza) ou 3D (RGB ou RGBA), uint8 ou uint16.
+
+        Retorno:
+        - imagem (numpy array): Array uint8 (tamanho, tamanho).
+        """
+        imagem = np.asarray(imagem)
+        if imagem.dtype == np.uint16:
+            imagem = (imagem >> 8).astype(np.uint8)
+        elif imagem.dtype != np.uint8:
+            raise ValueError(f'Tipo de imagem {imagem.dtype} não suportado. Use uint8 ou uint16.')
+        if imagem.ndim == 3:
+            if imagem.shape[2] == 1:
+                imagem = imagem[..., 0]
+            else:
+                conversao = cv2.COLOR_RGBA2GRAY if imagem.shape[2] == 4 else cv2.COLOR_RGB2GRAY
+                imagem = cv2.cvtColor(imagem, conversao)
+        elif imagem.ndim != 2:
+            raise ValueError(f'Imagem com forma {imagem.shape} não suportada.')
+        destino = np.empty((self.tamanho, self.tamanho), dtype=np.uint8) if destino is None else destino
+        self._redimensionar(imagem, destino)
+        return destino
+
+    def fechar(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def _ler(self, caminho_arquivo, destino):
+        try:
+            conteudo = np.fromfile(caminho_arquivo, dtype=np.uint8)
+        except OSError:
+            return False
+        return self._decodificar(conteudo, destino)
+
+    def _decodificar(self, conteudo, destino):
+        fator = 1
+        dimensoes = _dimensoes_jpeg(conteudo)
+        if dimensoes is not None:
+            # Maior redução do decodificador que mantém a imagem com pelo menos `tamanho` pixels
+            fator = max(f for f in FLAGS_REDUCAO_CINZA if min(dimensoes) // f >= self.tamanho or f == 1)
+        imagem = cv2.imdecode(conteudo, FLAGS_REDUCAO_CINZA[fator]) if len(conteudo) else None
+        if imagem is None:
+            return False
+        self._redimensionar(imagem, destino)
+        return True
+
+    def _redimensionar(self, imagem, destino):
+        interpolacao = cv2.INTER_AREA if min(imagem.shape) >= self.tamanho else cv2.INTER_LINEAR
+        if imagem.shape == destino.shape:
+            destino[...] = imagem
+        else:
+            cv2.resize(imagem, (self.tamanho, self.tamanho), dst=destino, interpolation=interpolacao)
+
+
+def _dimensoes_jpeg(conteudo):
+    """
+    Lê (altura, largura) do cabeçalho de um JPEG sem decodificá-lo, ou retorna None se o
+    conteúdo não for um JPEG.
+    """
+    if len(conteudo) < 4 or conteudo[0] != 0xFF or conteudo[1] != 0xD8:
+        return None
+    posicao = 2
+    while posicao + 9 < len(conteudo):
+        if conteudo[posicao] != 0xFF:
+            return None
+        marcador = conteudo[posicao + 1]
+        if marcador == 0xFF:  # Bytes de preenchimento entre segmentos
+            posicao += 1
+            continue
+        # Marcadores SOF (início do quadro), exceto DHT (C4), JPG (C8) e DAC (CC)
+        if 0xC0 <= marcador <= 0xCF and marcador not in (0xC4, 0xC8, 0xCC):
+            altura = (int(conteudo[posicao + 5]) << 8) | int(conteudo[posicao + 6])
+            largura = (int(conteudo[posicao + 7]) << 8) | int(conteudo[posicao + 8])
+            return altura, largura
+        posicao += 2 + ((int(conteudo[posicao + 2]) << 8) | int(conteudo[posicao + 3]))
+    return None
+    
+
 def verificar_e_criar_diretorios(caminho_arquivo):
     """
     Verifica se os diretórios no caminho fornecido existem e os cria se necessário.
@@ -75,39 +321,53 @@ def verificar_e_criar_diretorios(caminho_arquivo):
     else:
         print(f'Diretório já existe: {diretorio}')    
 
-def salvar_caracteristicas(caracteristicas, caminho_arquivo):
+def salvar_caracteristicas(caracteristicas, caminho_arquivo, parametros=None, classes=None):
     """
-    Salva as características extraídas em um arquivo usando pickle.
+    Salva as características extraídas em um arquivo .npy, acompanhado de um cabeçalho JSON.
+
+    O arquivo é um .npy de verdade (np.save), que pode ser aberto com memória mapeada.
+    O cabeçalho (mesmo nome, extensão .json) registra dtype, forma, parâmetros do extrator
+    e as classes do encoder de rótulos.
 
     Parâmetros:
-    - caracteristicas (list of numpy arrays): Lista de arrays de características.
+    - caracteristicas (numpy array): Matriz (n_amostras, n_caracteristicas).
     - caminho_arquivo (str): Caminho onde o arquivo será salvo.
+    - parametros (dict): Parâmetros do extrator/redutor que produziram as características. Default é None.
+    - classes (list): Classes do encoder de rótulos. Default é None.
     """
     verificar_e_criar_diretorios(caminho_arquivo)
     print('Salvando características...')
+    caracteristicas = np.asarray(caracteristicas)
     with open(caminho_arquivo, 'wb') as arquivo:
-        pickle.dump(caracteristicas, arquivo)
+        np.save(arquivo, caracteristicas)
+    _salvar_cabecalho(_caminho_cabecalho(caminho_arquivo), caracteristicas.dtype, caracteristicas.shape, parametros, classes)
     print(f'Características salvas em: {caminho_arquivo}')
 
-def carregar_caracteristicas(caminho_arquivo):
+def carregar_caracteristicas(caminho_arquivo, mmap=True):
     """
-    Carrega as características de um arquivo salvo com pickle.
+    Carrega as características de um arquivo .npy (ou de um arquivo antigo salvo com pickle).
 
     Parâmetros:
     - caminho_arquivo (str): Caminho de onde o arquivo será carregado.
+    - mmap (bool): Se True, o arquivo é mapeado em memória (somente leitura) e nenhum dado é
+                   copiado até ser acessado. Default é True.
 
     Retorno:
-    - caracteristicas (list of numpy arrays): Lista de arrays de características carregadas.
+    - caracteristicas (numpy array): Matriz de características (np.memmap quando mmap=True).
 
     Exceções:
     - FileNotFoundError: Levantada se o arquivo não for encontrado.
     - Exception: Levantada para qualquer outro erro durante o carregamento das características.
     """
     try:
-        # Abre o arquivo no modo de leitura binária
         with open(caminho_arquivo, 'rb') as arquivo:
-            # Desserializa as características do arquivo
-            caracteristicas = pickle.load(arquivo)
+            formato_npy = arquivo.read(6) == b'\x93NUMPY'
+        if formato_npy:
+            caracteristicas = np.load(caminho_arquivo, mmap_mode='r' if mmap else None)
+        else:
+            # Compatibilidade com os arquivos salvos com pickle nas versões anteriores
+            with open(caminho_arquivo, 'rb') as arquivo:
+                caracteristicas = pickle.load(arquivo)
         print(f'\n\nCaracterísticas carregadas de: {caminho_arquivo}')
         return caracteristicas
     except FileNotFoundError:
@@ -115,6 +375,163 @@ def carregar_caracteristicas(caminho_arquivo):
     except Exception as e:
         raise Exception(f'Erro ao carregar as características: {e}')
 
+def criar_armazenamento(diretorio, n_caracteristicas, dtype='float64', parametros=None, classes=None):
+    """
+    Cria um armazenamento de características com escrita somente por anexação.
+
+    O diretório contém caracteristicas.npy (n_amostras, n_caracteristicas), rotulos.npy
+    (códigos inteiros dos rótulos) e cabecalho.json. Os arquivos .npy crescem no lugar a
+    cada anexar_caracteristicas e podem ser lidos com memória mapeada por outros processos.
+
+    Parâmetros:
+    - diretorio (str): Diretório do armazenamento (criado se necessário).
+    - n_caracteristicas (int): Número de colunas da matriz de características.
+    - dtype (str): Tipo dos valores armazenados. Default é 'float64'.
+    - parametros (dict): Parâmetros do extrator que produziu as características. Default é None.
+    - classes (list): Classes do encoder de rótulos (a posição é o código). Default é None.
+    """
+    os.makedirs(diretorio, exist_ok=True)
+    np.save(os.path.join(diretorio, 'caracteristicas.npy'), np.empty((0, n_caracteristicas), dtype=dtype))
+    np.save(os.path.join(diretorio, 'rotulos.npy'), np.empty((0,), dtype=np.int32))
+    _salvar_cabecalho(os.path.join(diretorio, 'cabecalho.json'), np.dtype(dtype), (0, n_caracteristicas), parametros, classes)
+
+def anexar_caracteristicas(diretorio, caracteristicas, rotulos=None, classes=None):
+    """
+    Anexa linhas de características (e os códigos dos rótulos) ao armazenamento.
+
+    Os dados são gravados no fim de cada arquivo e só depois o cabeçalho .npy é atualizado
+    com a nova forma, de modo que leitores nunca enxergam linhas incompletas.
+
+    Parâmetros:
+    - diretorio (str): Diretório criado com criar_armazenamento.
+    - caracteristicas (numpy array): Matriz (n_novas, n_caracteristicas).
+    - rotulos (numpy array): Códigos inteiros dos rótulos de cada linha. Default é None.
+    - classes (list): Lista de classes atualizada (ex.: rotulos.CodificadorIncremental.classes_),
+                      gravada no cabeçalho junto com a nova forma. Default é None (mantém a atual).
+    """
+    cabecalho = carregar_cabecalho(diretorio)
+    caracteristicas = np.ascontiguousarray(caracteristicas, dtype=cabecalho['dtype'])
+    if caracteristicas.ndim != 2 or caracteristicas.shape[1] != cabecalho['shape'][1]:
+        raise ValueError(f"Esperado um array com {cabecalho['shape'][1]} colunas, recebido {caracteristicas.shape}.")
+    with instrumentacao.intervalo('dados.anexar', linhas=len(caracteristicas)):
+        _anexar_npy(os.path.join(diretorio, 'caracteristicas.npy'), caracteristicas)
+        if rotulos is not None:
+            _anexar_npy(os.path.join(diretorio, 'rotulos.npy'), np.ascontiguousarray(rotulos, dtype=np.int32))
+    cabecalho['shape'] = [cabecalho['shape'][0] + len(caracteristicas), cabecalho['shape'][1]]
+    _salvar_cabecalho(os.path.join(diretorio, 'cabecalho.json'), np.dtype(cabecalho['dtype']), cabecalho['shape'],
+                      cabecalho['parametros'], cabecalho['classes'] if classes is None else classes)
+
+def truncar_armazenamento(diretorio, n_linhas, classes=None):
+    """
+    Descarta as linhas do armazenamento a partir de n_linhas (por exemplo, as de uma anexação interrompida).
+
+    Parâmetros:
+    - diretorio (str): Diretório criado com criar_armazenamento.
+    - n_linhas (int): Número de linhas mantidas em caracteristicas.npy e rotulos.npy.
+    - classes (list): Lista de classes gravada no cabeçalho. Default é None (mantém a atual).
+    """
+    cabecalho = carregar_cabecalho(diretorio)
+    for nome in ('caracteristicas.npy', 'rotulos.npy'):
+        _truncar_npy(os.path.join(diretorio, nome), n_linhas)
+    cabecalho['shape'] = [int(n_linhas), cabecalho['shape'][1]]
+    _salvar_cabecalho(os.path.join(diretorio, 'cabecalho.json'), np.dtype(cabecalho['dtype']), cabecalho['shape'],
+                      cabecalho['parametros'], cabecalho['classes'] if classes is None else classes)
+
+def abrir_armazenamento(diretorio):
+    """
+    Abre um armazenamento de características sem copiar os dados para a memória.
+
+    Parâmetros:
+    - diretorio (str): Diretório criado com criar_armazenamento.
+
+    Retorno:
+    - caracteristicas (np.memmap): Matriz (n_amostras, n_caracteristicas), somente leitura.
+    - rotulos (np.memmap): Códigos dos rótulos, somente leitura.
+    - cabecalho (dict): dtype, forma, parâmetros do extrator e classes do encoder.
+    """
+    caracteristicas = np.load(os.path.join(diretorio, 'caracteristicas.npy'), mmap_mode='r')
+    rotulos = np.load(os.path.join(diretorio, 'rotulos.npy'), mmap_mode='r')
+    return caracteristicas, rotulos, carregar_cabecalho(diretorio)
+
+def carregar_cabecalho(caminho):
+    """
+    Lê o cabeçalho JSON de um armazenamento (diretório) ou de um arquivo de características.
+    """
+    if os.path.isdir(caminho):
+        caminho = os.path.join(caminho, 'cabecalho.json')
+    elif not caminho.endswith('.json'):
+        caminho = _caminho_cabecalho(caminho)
+    with open(caminho, 'r', encoding='utf-8') as arquivo:
+        return json.load(arquivo)
+
+def _caminho_cabecalho(caminho_arquivo):
+    return os.path.splitext(caminho_arquivo)[0] + '.json'
+
+def _salvar_cabecalho(caminho, dtype, forma, parametros, classes):
+    # Escreve em um arquivo temporário e substitui o anterior de forma atômica
+    cabecalho = {
+        'versao': 1,
+        'dtype': np.dtype(dtype).str,
+        'shape': [int(tamanho) for tamanho in forma],
+        'parametros': parametros,
+        'classes': [str(classe) for classe in classes] if classes is not None else None,
+    }
+    temporario = caminho + '.tmp'
+    with open(temporario, 'w', encoding='utf-8') as arquivo:
+        json.dump(cabecalho, arquivo, indent=2, default=str)
+    os.replace(temporario, caminho)
+
+def _anexar_npy(caminho_arquivo, dados):
+    """
+    Anexa linhas a um arquivo .npy (C-order) e reescreve o cabeçalho no lugar com a nova forma.
+    """
+    with open(caminho_arquivo, 'r+b') as arquivo:
+        versao, forma, ordem_fortran, dtype, inicio_dados = _ler_cabecalho_npy(arquivo)
+        if ordem_fortran or dtype != dados.dtype or forma[1:] != dados.shape[1:]:
+            raise ValueError(f'Os dados {dados.dtype}{dados.shape} não são compatíveis com {caminho_arquivo}.')
+        # Grava as novas linhas logo após as existentes
+        arquivo.seek(inicio_dados + int(np.prod(forma)) * dtype.itemsize)
+        arquivo.write(dados.tobytes())
+        arquivo.truncate()
+        arquivo.flush()
+        # O cabeçalho .npy reserva espaço para o crescimento do primeiro eixo
+        nova_forma = (forma[0] + dados.shape[0],) + tuple(forma[1:])
+        cabecalho = io.BytesIO()
+        escrever_cabecalho = np.lib.format.write_array_header_1_0 if versao == (1, 0) else np.lib.format.write_array_header_2_0
+        escrever_cabecalho(cabecalho, {'descr': np.lib.format.dtype_to_descr(dtype),
+                                       'fortran_order': False, 'shape': nova_forma})
+        if len(cabecalho.getvalue()) != inicio_dados:
+            raise ValueError(f'Não foi possível atualizar o cabeçalho de {caminho_arquivo} no lugar.')
+        arquivo.seek(0)
+        arquivo.write(cabecalho.getvalue())
+
+def _ler_cabecalho_npy(arquivo):
+    versao = np.lib.format.read_magic(arquivo)
+    ler_cabecalho = np.lib.format.read_array_header_1_0 if versao == (1, 0) else np.lib.format.read_array_header_2_0
+    forma, ordem_fortran, dtype = ler_cabecalho(arquivo)
+    return versao, forma, ordem_fortran, dtype, arquivo.tell()
+
+def _truncar_npy(caminho_arquivo, n_linhas):
+    """
+    Reduz o primeiro eixo de um arquivo .npy (C-order) para n_linhas, reescrevendo o cabeçalho no lugar.
+    """
+    with open(caminho_arquivo, 'r+b') as arquivo:
+        versao, forma, _, dtype, inicio_dados = _ler_cabecalho_npy(arquivo)
+        if n_linhas > forma[0]:
+            raise ValueError(f'{caminho_arquivo} tem {forma[0]} linhas, menos que as {n_linhas} pedidas.')
+        nova_forma = (int(n_linhas),) + tuple(forma[1:])
+        cabecalho = io.BytesIO()
+        escrever_cabecalho = np.lib.format.write_array_header_1_0 if versao == (1, 0) else np.lib.format.write_array_header_2_0
+        escrever_cabecalho(cabecalho, {'descr': np.lib.format.dtype_to_descr(dtype),
+                                       'fortran_order': False, 'shape': nova_forma})
+        if len(cabecalho.getvalue()) != inicio_dados:
+            raise ValueError(f'Não foi possível atualizar o cabeçalho de {caminho_arquivo} no lugar.')
+        # O cabeçalho é reduzido antes do arquivo, de modo que leitores nunca enxergam linhas ausentes
+        arquivo.seek(0)
+        arquivo.write(cabecalho.getvalue())
+        arquivo.flush()
+        arquivo.truncate(inicio_dados + int(np.prod(nova_forma)) * dtype.itemsize)
+
 
 
 def salvar_rotulos(rotulos_codificados, encoder, caminho_arquivo):
@@ -172,17 +589,23 @@ def carregar_rotulos(caminho_arquivo):
         raise Exception(f'Erro ao carregar os rótulos: {e}')
 
 
-def salvar_modelo(modelo, caminho_arquivo):
+def salvar_modelo(modelo, caminho_arquivo, formato='pickle', **opcoes_artefato):
     """
-    Salva um modelo de classificador em um arquivo usando pickle.
+    Salva um modelo de classificador em um arquivo usando pickle, ou como artefato.
 
     Parâmetros:
     - modelo (object): O modelo de classificador a ser salvo. Pode ser qualquer objeto que suporte a serialização com pickle.
-    - caminho_arquivo (str): Caminho do arquivo onde o modelo será salvo.
+    - caminho_arquivo (str): Caminho do arquivo onde o modelo será salvo (diretório, no formato 'artefato').
+    - formato (str): 'pickle' ou 'artefato' (manifesto + arrays .npy mapeáveis, ver artefatos.salvar_artefato).
+                     Default é 'pickle'.
+    - opcoes_artefato: Repassadas a artefatos.salvar_artefato (redutor, encoder, metadados, float32, compilar_rf).
 
     Retorno:
     - None: A função não retorna valor, mas salva o modelo no arquivo especificado.
     """
+    if formato == 'artefato':
+        artefatos.salvar_artefato(modelo, caminho_arquivo, **opcoes_artefato)
+        return
     verificar_e_criar_diretorios(caminho_arquivo)
     print('Salvando modelo...')
     # Abre o arquivo no modo de escrita binária
@@ -193,10 +616,10 @@ def salvar_modelo(modelo, caminho_arquivo):
 
 def carregar_modelo(caminho_arquivo):
     """
-    Carrega um modelo de classificador de um arquivo usando pickle.
+    Carrega um modelo de classificador de um arquivo usando pickle, ou de um diretório de artefato.
 
     Parâmetros:
-    - caminho_arquivo (str): Caminho do arquivo de onde o modelo será carregado.
+    - caminho_arquivo (str): Caminho do arquivo (ou diretório de artefato) de onde o modelo será carregado.
 
     Retorno:
     - modelo (object): O modelo de classificador carregado. O tipo específico depende do que foi salvo.
@@ -204,6 +627,9 @@ def carregar_modelo(caminho_arquivo):
     Exceções:
     - Levanta uma exceção se o arquivo não for encontrado ou se houver um erro durante a desserialização.
     """
+    if artefatos.eh_artefato(caminho_arquivo):
+        modelo, _, _, _ = artefatos.carregar_artefato(caminho_arquivo)
+        return modelo
     try:
         # Abre o arquivo no modo de leitura binária
         with open(caminho_arquivo, 'rb') as arquivo:
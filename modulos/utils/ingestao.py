@@ -0,0 +1,190 @@
+# Este módulo implementa a ingestão incremental de imagens
+# Um manifesto no diretório do armazenamento de características registra os arquivos já
+# ingeridos, de modo que cada execução extrai apenas as imagens novas, anexa as linhas ao
+# armazenamento e amplia o encoder de rótulos sem renumerar as classes existentes
+
+import os
+import json
+
+from sklearn.linear_model import SGDClassifier
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.neural_network import MLPClassifier
+from sklearn.pipeline import Pipeline
+
+from modulos.classificadores import knn, mlp, svm
+from modulos.descritores import glcm, reducao
+from modulos.utils import dados, instrumentacao, rotulos
+
+ARQUIVO_MANIFESTO = 'ingestao.json'
+
+def ingerir(diretorio_imagens, diretorio_armazenamento, leitor=None, cache=None, tamanho_lote=64, n_jobs=1, **parametros_glcm):
+    """
+    Extrai as características apenas das imagens ainda não ingeridas e as anexa ao armazenamento.
+
+    As imagens são listadas com dados.listar_imagens (uma subpasta por classe) e comparadas com o
+    manifesto da execução anterior. Na primeira execução o armazenamento é criado. Os códigos dos
+    rótulos vêm de um rotulos.CodificadorIncremental reconstruído a partir das classes do cabeçalho:
+    classes novas recebem os próximos códigos e as existentes mantêm os seus, de modo que as linhas
+    já gravadas e os modelos treinados continuam válidos. Arquivos do manifesto cujo tamanho ou data
+    de modificação mudaram não são reprocessados (o armazenamento só cresce por anexação); eles são
+    apenas contados no relatório impresso.
+
+    O manifesto também registra o número de linhas e as classes do armazenamento. Se uma execução
+    anterior foi interrompida depois de anexar as linhas e antes de gravar o manifesto, essas linhas
+    são descartadas no início da próxima execução, que volta a extrair os mesmos arquivos.
+
+    Parâmetros:
+    - diretorio_imagens (str): Diretório raiz com as subpastas de imagens.
+    - diretorio_armazenamento (str): Diretório do armazenamento (dados.criar_armazenamento).
+    - leitor: Leitor de imagens repassado a glcm.extrair_glcm_arquivos. Default é None
+              (dados.LeitorImagens com tamanho 256).
+    - cache: Objeto CacheCaracteristicas (cache.py) ou None. Default é None.
+    - tamanho_lote (int): Imagens lidas e extraídas por vez. Default é 64.
+    - n_jobs (int): Processos usados na extração de cada lote. Default é 1.
+    - parametros_glcm: Parâmetros de GLCM (distancias, angulos, niveis, propriedades, escalas).
+                       Precisam ser os mesmos em todas as execuções sobre o mesmo armazenamento.
+
+    Retorno:
+    - caracteristicas (numpy array): Características brutas das imagens ingeridas nesta execução.
+    - rotulos_codificados (numpy array): Códigos dos rótulos dessas imagens.
+    - encoder (CodificadorIncremental): Encoder com todas as classes do armazenamento.
+    - classes_novas (list): Classes que apareceram pela primeira vez nesta execução.
+    """
+    leitor_proprio = leitor is None
+    leitor = dados.LeitorImagens(tamanho=256) if leitor_proprio else leitor
+    parametros_leitor = getattr(leitor, 'parametros', None)
+    parametros = {'descritor': 'glcm', 'leitor': parametros_leitor or {}, **parametros_glcm}
+
+    manifesto = carregar_manifesto(diretorio_armazenamento)
+    existe = os.path.exists(os.path.join(diretorio_armazenamento, 'cabecalho.json'))
+    if existe:
+        cabecalho = dados.carregar_cabecalho(diretorio_armazenamento)
+        if json.loads(json.dumps(parametros, default=str)) != cabecalho['parametros']:
+            raise ValueError(f"Parâmetros de extração diferentes dos do armazenamento: {cabecalho['parametros']}")
+        cabecalho = _restaurar_armazenamento(diretorio_armazenamento, manifesto, cabecalho)
+        encoder = rotulos.CodificadorIncremental(cabecalho['classes'])
+    else:
+        encoder = rotulos.CodificadorIncremental()
+    n_classes = len(encoder.classes_)
+
+    # Separa os arquivos novos dos já registrados no manifesto
+    caminhos, rotulos_arquivos = dados.listar_imagens(diretorio_imagens)
+    novos, alterados = [], 0
+    for i, caminho in enumerate(caminhos):
+        chave = os.path.relpath(caminho, diretorio_imagens)
+        registro = manifesto['arquivos'].get(chave)
+        if registro is None:
+            novos.append(i)
+        elif registro != _assinatura(caminho):
+            alterados += 1
+    print(f'Ingestão: {len(novos)} arquivos novos, {len(caminhos) - len(novos)} já ingeridos'
+          + (f' ({alterados} alterados desde a ingestão, ignorados)' if alterados else ''))
+
+    caminhos_novos = [caminhos[i] for i in novos]
+    with instrumentacao.intervalo('ingestao.extrair', imagens=len(caminhos_novos)):
+        caracteristicas, validos = glcm.extrair_glcm_arquivos(caminhos_novos, leitor, cache=cache, parametros_leitor=parametros_leitor,
+                                                              tamanho_lote=tamanho_lote, n_jobs=n_jobs, **parametros_glcm)
+    if leitor_proprio:
+        leitor.fechar()
+    rotulos_novos = [rotulos_arquivos[i] for i, valido in zip(novos, validos) if valido]
+    rotulos_codificados = encoder.atualizar(rotulos_novos).transform(rotulos_novos)
+    classes_novas = [str(classe) for classe in encoder.classes_[n_classes:]]
+
+    if not existe:
+        dados.criar_armazenamento(diretorio_armazenamento, caracteristicas.shape[1], parametros=parametros, classes=[])
+        _salvar_manifesto(diretorio_armazenamento, {**manifesto, 'linhas': 0, 'classes': []})
+    dados.anexar_caracteristicas(diretorio_armazenamento, caracteristicas, rotulos_codificados, classes=encoder.classes_)
+
+    # O manifesto é gravado por último, com o número de linhas do armazenamento: uma interrupção
+    # antes deste ponto é desfeita por _restaurar_armazenamento na próxima execução. Arquivos
+    # ilegíveis também são registrados, para não serem lidos novamente a cada execução.
+    manifesto['linhas'] = _contar_linhas(diretorio_armazenamento)
+    manifesto['classes'] = [str(classe) for classe in encoder.classes_]
+    for i, valido in zip(novos, validos):
+        manifesto['arquivos'][os.path.relpath(caminhos[i], diretorio_imagens)] = _assinatura(caminhos[i])
+        if not valido:
+            manifesto['ilegiveis'].append(os.path.relpath(caminhos[i], diretorio_imagens))
+    _salvar_manifesto(diretorio_armazenamento, manifesto)
+    print(f'Ingestão: {len(rotulos_codificados)} amostras anexadas'
+          + (f", classes novas: {', '.join(classes_novas)}" if classes_novas else ''))
+    return caracteristicas, rotulos_codificados, encoder, classes_novas
+
+def atualizar_modelo(modelo, caracteristicas, rotulos_codificados, redutor=None, **opcoes):
+    """
+    Atualiza um modelo treinado com as amostras de uma ingestão, sem treiná-lo do zero.
+
+    O redutor não é reajustado: as novas características são apenas projetadas no espaço em que
+    o modelo foi treinado. KNN (KNeighborsClassifier ou KNNIVF) recebe as amostras no índice,
+    inclusive de classes novas; o SVM do modo 'sgd' e o MLP continuam o treinamento com
+    partial_fit e exigem um novo treinamento quando há classes novas. Random forest e os demais
+    modos do SVM não suportam atualização incremental.
+
+    Parâmetros:
+    - modelo: Modelo treinado, atualizado no lugar.
+    - caracteristicas (numpy array): Características brutas retornadas por ingerir.
+    - rotulos_codificados (numpy array): Códigos dos rótulos retornados por ingerir.
+    - redutor (PCA ou IncrementalPCA): Redutor usado no treinamento do modelo. Default é None.
+    - opcoes: Repassadas a svm.atualizar_svm ou mlp.atualizar_mlp (n_epocas, tamanho_lote).
+
+    Retorno:
+    - modelo: O mesmo modelo, atualizado.
+    """
+    if len(rotulos_codificados) == 0:
+        return modelo
+    caracteristicas = reducao.aplicar_redutor(redutor, caracteristicas)
+    if isinstance(modelo, (KNeighborsClassifier, knn.KNNIVF)):
+        return knn.atualizar_knn(modelo, caracteristicas, rotulos_codificados)
+    if isinstance(modelo, Pipeline) and isinstance(modelo[-1], SGDClassifier):
+        return svm.atualizar_svm(modelo, caracteristicas, rotulos_codificados, **opcoes)
+    if isinstance(modelo, MLPClassifier):
+        return mlp.atualizar_mlp(modelo, caracteristicas, rotulos_codificados, **opcoes)
+    raise ValueError(f'{type(modelo).__name__} não suporta atualização incremental; treine o modelo novamente.')
+
+def carregar_manifesto(diretorio_armazenamento):
+    """
+    Lê o manifesto de ingestão de um armazenamento (vazio se ainda não houver ingestão).
+    """
+    caminho = os.path.join(diretorio_armazenamento, ARQUIVO_MANIFESTO)
+    if not os.path.exists(caminho):
+        return {'versao': 1, 'arquivos': {}, 'ilegiveis': []}
+    with open(caminho, 'r', encoding='utf-8') as arquivo:
+        return json.load(arquivo)
+
+def _salvar_manifesto(diretorio_armazenamento, manifesto):
+    # Escreve em um arquivo temporário e substitui o anterior de forma atômica
+    caminho = os.path.join(diretorio_armazenamento, ARQUIVO_MANIFESTO)
+    temporario = caminho + '.tmp'
+    with open(temporario, 'w', encoding='utf-8') as arquivo:
+        json.dump(manifesto, arquivo, indent=2)
+    os.replace(temporario, caminho)
+
+def _contar_linhas(diretorio_armazenamento):
+    caracteristicas, rotulos_armazenados, _ = dados.abrir_armazenamento(diretorio_armazenamento)
+    if len(caracteristicas) != len(rotulos_armazenados):
+        raise ValueError(f'Armazenamento inconsistente: {len(caracteristicas)} linhas de características '
+                         f'e {len(rotulos_armazenados)} rótulos.')
+    return len(caracteristicas)
+
+def _restaurar_armazenamento(diretorio_armazenamento, manifesto, cabecalho):
+    # Descarta as linhas anexadas por uma execução interrompida antes de gravar o manifesto
+    caracteristicas, rotulos_armazenados, _ = dados.abrir_armazenamento(diretorio_armazenamento)
+    linhas = (len(caracteristicas), len(rotulos_armazenados))
+    del caracteristicas, rotulos_armazenados
+    esperado = manifesto.get('linhas')
+    if esperado is None:
+        # Manifesto anterior ao registro das linhas (ou armazenamento sem manifesto)
+        if linhas[0] != linhas[1]:
+            raise ValueError(f'Armazenamento inconsistente: {linhas[0]} linhas de características e {linhas[1]} rótulos.')
+        return cabecalho
+    if min(linhas) < esperado:
+        raise ValueError(f'O armazenamento tem menos linhas ({min(linhas)}) que as {esperado} registradas no manifesto.')
+    if linhas != (esperado, esperado) or cabecalho['classes'] != manifesto['classes']:
+        print(f'Ingestão: descartando {max(linhas) - esperado} linhas de uma execução interrompida')
+        dados.truncar_armazenamento(diretorio_armazenamento, esperado, classes=manifesto['classes'])
+        cabecalho = dados.carregar_cabecalho(diretorio_armazenamento)
+    return cabecalho
+
+def _assinatura(caminho):
+    # Tamanho e data de modificação identificam uma versão do arquivo sem precisar lê-lo
+    informacoes = os.stat(caminho)
+    return [informacoes.st_size, informacoes.st_mtime_ns]
@@ -0,0 +1,295 @@
+# Este módulo implementa a instrumentação do pipeline: intervalos nomeados (spans),
+# contadores e amostragem do pico de memória, com captura opcional de cProfile e
+# tracemalloc por etapa. Os eventos são enviados para saídas plugáveis (texto,
+# JSON lines e arquivo texto no formato do Prometheus).
+#
+# Desativada (padrão), um intervalo custa apenas duas leituras do relógio e um contador
+# não faz nada, de modo que as chamadas podem ficar nos trechos críticos.
+#
+# Uso:
+#   from modulos.utils import instrumentacao
+#   instrumentacao.configurar(saidas=[instrumentacao.SaidaTexto()], perfis=['glcm.extrair'])
+#   with instrumentacao.intervalo('svm.treinar') as medicao:
+#       ...
+#   print(medicao.duracao)
+#   instrumentacao.exportar()
+
+import os
+import sys
+import json
+import time
+import cProfile
+import threading
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_ativo = False
+_saidas = []
+_perfis = frozenset()
+_memoria_python = frozenset()
+_diretorio_perfis = 'perfis'
+_trava = threading.Lock()
+_intervalos = {}
+_contadores = {}
+_n_perfis = 0
+
+
+def configurar(ativo=True, saidas=None, perfis=(), memoria_python=(), diretorio_perfis='perfis'):
+    """
+    Ativa (ou desativa) a instrumentação e define as saídas dos eventos.
+
+    Parâmetros:
+    - ativo (bool): Se False, intervalos e contadores deixam de ser registrados. Default é True.
+    - saidas (list): Saídas dos eventos (SaidaTexto, SaidaJSONL, SaidaPrometheus). Default é [SaidaTexto()].
+    - perfis (iterable of str): Intervalos capturados com cProfile (arquivo .prof por execução). Default é ().
+    - memoria_python (iterable of str): Intervalos com pico de alocação medido por tracemalloc. Default é ().
+    - diretorio_perfis (str): Diretório dos arquivos .prof. Default é 'perfis'.
+    """
+    global _ativo, _saidas, _perfis, _memoria_python, _diretorio_perfis
+    _ativo = ativo
+    _saidas = list(saidas) if saidas is not None else [SaidaTexto()]
+    _perfis = frozenset(perfis)
+    _memoria_python = frozenset(memoria_python)
+    _diretorio_perfis = diretorio_perfis
+
+
+def ativo():
+    """
+    Indica se a instrumentação está ativa.
+    """
+    return _ativo
+
+
+class Intervalo:
+    """
+    Gerenciador de contexto que mede a duração de uma etapa. A duração fica disponível em
+    `duracao` mesmo com a instrumentação desativada; o evento só é registrado quando ativa.
+    """
+
+    __slots__ = ('nome', 'rotulos', 'inicio', 'duracao', '_perfil', '_tracemalloc')
+
+    def __init__(self, nome, rotulos):
+        self.nome = nome
+        self.rotulos = rotulos
+        self.duracao = 0.0
+        self._perfil = None
+        self._tracemalloc = None
+
+    def __enter__(self):
+        if _ativo:
+            self._iniciar_capturas()
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *excecao):
+        self.duracao = time.perf_counter() - self.inicio
+        if _ativo or self._perfil is not None or self._tracemalloc is not None:
+            self._registrar()
+        return False
+
+    def _iniciar_capturas(self):
+        if self.nome in _memoria_python:
+            # Se o tracemalloc já estava ativo, apenas zera o pico para medir esta etapa
+            self._tracemalloc = not tracemalloc.is_tracing()
+            if self._tracemalloc:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        if self.nome in _perfis:
+            perfil = cProfile.Profile()
+            try:
+                perfil.enable()
+                self._perfil = perfil
+            except ValueError:
+                # Outro profiler já está ativo (intervalos perfilados aninhados)
+                pass
+
+    def _registrar(self):
+        global _n_perfis
+        evento = {'tipo': 'intervalo', 'nome': self.nome, 'duracao_s': self.duracao, 'instante': time.time()}
+        if self.rotulos:
+            evento['rotulos'] = self.rotulos
+        if self._tracemalloc is not None:
+            evento['pico_python_mb'] = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+            if self._tracemalloc:
+                tracemalloc.stop()
+        if self._perfil is not None:
+            self._perfil.disable()
+            with _trava:
+                _n_perfis += 1
+                numero = _n_perfis
+            os.makedirs(_diretorio_perfis, exist_ok=True)
+            evento['perfil'] = os.path.join(_diretorio_perfis, f'{self.nome}_{numero}.prof')
+            self._perfil.dump_stats(evento['perfil'])
+        evento['pico_rss_mb'] = pico_memoria_mb()
+
+        with _trava:
+            agregado = _intervalos.get(self.nome)
+            if agregado is None:
+                _intervalos[self.nome] = [1, self.duracao, self.duracao]
+            else:
+                agregado[0] += 1
+                agregado[1] += self.duracao
+                agregado[2] = max(agregado[2], self.duracao)
+        for saida in _saidas:
+            saida.registrar(evento)
+
+
+def intervalo(nome, **rotulos):
+    """
+    Cria um intervalo nomeado para uso com `with`. Rótulos adicionais (ex.: lote=64) são
+    anexados ao evento.
+
+    Parâmetros:
+    - nome (str): Nome da etapa, no formato 'modulo.etapa' (ex.: 'glcm.coocorrencias').
+
+    Retorno:
+    - Intervalo: Gerenciador de contexto com a duração medida em `duracao` (segundos).
+    """
+    return Intervalo(nome, rotulos)
+
+
+def contar(nome, valor=1):
+    """
+    Incrementa um contador nomeado (sem efeito com a instrumentação desativada).
+    """
+    if not _ativo:
+        return
+    with _trava:
+        _contadores[nome] = _contadores.get(nome, 0) + valor
+
+
+def pico_memoria_mb():
+    """
+    Retorna o pico de memória residente (MB) do processo, ou None se indisponível.
+    """
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss é dado em bytes no macOS e em KB nos demais sistemas
+    return pico / 1024 ** 2 if sys.platform == 'darwin' else pico / 1024
+
+
+def resumo():
+    """
+    Retorna os totais acumulados: por intervalo (contagem, total, média e máximo em segundos),
+    os contadores e o pico de memória residente.
+    """
+    with _trava:
+        intervalos = {
+            nome: {'contagem': contagem, 'total_s': total, 'media_s': total / contagem, 'max_s': maximo}
+            for nome, (contagem, total, maximo) in _intervalos.items()
+        }
+        contadores = dict(_contadores)
+    return {'intervalos': intervalos, 'contadores': contadores, 'pico_rss_mb': pico_memoria_mb()}
+
+
+def exportar():
+    """
+    Envia o resumo acumulado para todas as saídas e o retorna.
+    """
+    dados_resumo = resumo()
+    for saida in _saidas:
+        saida.exportar(dados_resumo)
+    return dados_resumo
+
+
+def reiniciar():
+    """
+    Zera os totais acumulados de intervalos e contadores.
+    """
+    with _trava:
+        _intervalos.clear()
+        _contadores.clear()
+
+
+class SaidaTexto:
+    """
+    Escreve o resumo como tabela na saída padrão. Com detalhado=True, também escreve cada
+    intervalo ao terminar.
+    """
+
+    def __init__(self, detalhado=False, arquivo=None):
+        self.detalhado = detalhado
+        self.arquivo = arquivo
+
+    def registrar(self, evento):
+        if self.detalhado:
+            print(f"[{evento['nome']}] {evento['duracao_s']:.4f}s", file=self.arquivo or sys.stdout)
+
+    def exportar(self, dados_resumo):
+        arquivo = self.arquivo or sys.stdout
+        print(f'{"intervalo":<28}{"contagem":>10}{"total (s)":>12}{"média (ms)":>12}{"máx (ms)":>12}', file=arquivo)
+        for nome, medida in sorted(dados_resumo['intervalos'].items(), key=lambda item: -item[1]['total_s']):
+            print(f"{nome:<28}{medida['contagem']:>10}{medida['total_s']:>12.3f}"
+                  f"{medida['media_s'] * 1000:>12.3f}{medida['max_s'] * 1000:>12.3f}", file=arquivo)
+        for nome, valor in sorted(dados_resumo['contadores'].items()):
+            print(f'{nome:<28}{valor:>10}', file=arquivo)
+        if dados_resumo['pico_rss_mb'] is not None:
+            print(f"Pico de memória residente: {dados_resumo['pico_rss_mb']:.0f} MB", file=arquivo)
+
+
+class SaidaJSONL:
+    """
+    Acrescenta cada evento (e o resumo, ao exportar) como uma linha JSON em um arquivo.
+    """
+
+    def __init__(self, caminho_arquivo):
+        diretorio = os.path.dirname(caminho_arquivo)
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+        self._arquivo = open(caminho_arquivo, 'a', encoding='utf-8')
+        self._trava = threading.Lock()
+
+    def registrar(self, evento):
+        linha = json.dumps(evento, ensure_ascii=False) + '\n'
+        with self._trava:
+            self._arquivo.write(linha)
+
+    def exportar(self, dados_resumo):
+        self.registrar({'tipo': 'resumo', 'instante': time.time(), **dados_resumo})
+        with self._trava:
+            self._arquivo.flush()
+
+    def fechar(self):
+        with self._trava:
+            self._arquivo.close()
+
+
+class SaidaPrometheus:
+    """
+    Grava o resumo no formato texto do Prometheus (para o textfile collector do node_exporter).
+    O arquivo é substituído atomicamente a cada exportação.
+    """
+
+    def __init__(self, caminho_arquivo, prefixo='classificacao'):
+        self.caminho_arquivo = caminho_arquivo
+        self.prefixo = prefixo
+
+    def registrar(self, evento):
+        pass
+
+    def exportar(self, dados_resumo):
+        p = self.prefixo
+        linhas = [
+            f'# TYPE {p}_intervalo_segundos_total counter',
+            *(f'{p}_intervalo_segundos_total{{nome="{nome}"}} {m["total_s"]}' for nome, m in dados_resumo['intervalos'].items()),
+            f'# TYPE {p}_intervalo_execucoes_total counter',
+            *(f'{p}_intervalo_execucoes_total{{nome="{nome}"}} {m["contagem"]}' for nome, m in dados_resumo['intervalos'].items()),
+            f'# TYPE {p}_intervalo_max_segundos gauge',
+            *(f'{p}_intervalo_max_segundos{{nome="{nome}"}} {m["max_s"]}' for nome, m in dados_resumo['intervalos'].items()),
+            f'# TYPE {p}_contador_total counter',
+            *(f'{p}_contador_total{{nome="{nome}"}} {valor}' for nome, valor in dados_resumo['contadores'].items()),
+        ]
+        if dados_resumo['pico_rss_mb'] is not None:
+            linhas += [f'# TYPE {p}_pico_rss_bytes gauge', f'{p}_pico_rss_bytes {int(dados_resumo["pico_rss_mb"] * 1024 ** 2)}']
+        diretorio = os.path.dirname(self.caminho_arquivo)
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+        temporario = self.caminho_arquivo + '.tmp'
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            arquivo.write('\n'.join(linhas) + '\n')
+        os.replace(temporario, self.caminho_arquivo)
@@ -1,11 +1,23 @@
+# Este módulo calcula as métricas de avaliação e gera as figuras dos resultados
+# Todas as métricas (acurácia, precisão, revocação, F1 e suporte por classe e médias) são
+# derivadas de uma única matriz de confusão, que pode ser acumulada em blocos de previsões.
+# matplotlib, seaborn e pandas só são importados quando uma figura é de fato desenhada, e as
+# figuras podem ser desenhadas em segundo plano ou omitidas (execução sem display)
+
 import os
-import time
+import json
+from concurrent.futures import Future, ThreadPoolExecutor
+
 import numpy as np
-import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
-from sklearn import metrics
 
+from modulos.utils import instrumentacao
+
+# Modos de geração das figuras em gerar_relatorio
+MODOS_FIGURAS = ('sincrono', 'segundo_plano', 'nenhum')
+
+# Thread única que desenha as figuras em segundo plano (o estado global do seaborn não é
+# seguro entre threads), criada no primeiro uso
+_executor_figuras = None
 
 def verificar_e_criar_diretorios(caminho_arquivo):
     """
@@ -19,59 +31,271 @@ def verificar_e_criar_diretorios(caminho_arquivo):
         os.makedirs(diretorio)
         print(f'Diretório criado: {diretorio}')
     else:
-        print(f'Diretório já existe: {diretorio}')    
-
-def matriz_confusao(nomes_das_classes,rotulos_verdadeiros,rotulos_previstos,caminho_arquivo):
-    # Calcula a matriz de confusão
-    conf_matrix = metrics.confusion_matrix(rotulos_verdadeiros, rotulos_previstos)
-    # Calcula a acurácia do modelo em percentual
-    acuracia = metrics.accuracy_score(rotulos_verdadeiros, rotulos_previstos)*100
-    # Define o tamanho da fonte para a matriz de confusão e rótulos
-    sns.set_theme(font_scale=1.2)  # Ajuste o valor conforme necessário para aumentar a fonte
-    # Gera a figura da matriz de confusão usando o pacote seaborn
-    plt.figure(figsize=(4, 3))
-    sns.heatmap(conf_matrix, annot=True, cmap='Blues', fmt='g', cbar=False, 
-                annot_kws={"size": 12}, linewidths=0.4, square=True)
-    # Adiciona os nomes das classes, rótulos, título, subtítulo 
-    plt.xticks(np.arange(len(nomes_das_classes)) + 0.5, nomes_das_classes, rotation=0, ha='center', fontsize=14)
-    plt.yticks(np.arange(len(nomes_das_classes)) + 0.5, nomes_das_classes, rotation=0, va='center', fontsize=14)
-    plt.xlabel('Rótulos Previstos', fontsize=14)
-    plt.ylabel('Rótulos Verdadeiros', fontsize=14)
-    plt.title('Matriz de Confusão', fontsize=18, weight='bold', x=0.25, y=1.15)
-    plt.suptitle(f'Acurácia do Modelo: {acuracia:.2f}%', fontsize=14, x=0.37, y=0.98)
-    verificar_e_criar_diretorios(caminho_arquivo)
-    # Salva a figura da matriz de confusão
-    plt.savefig(caminho_arquivo, dpi=300) 
-    plt.show()
-
-def relatorio_classificacao(nomes_das_classes, rotulos_verdadeiros, rotulos_previstos, caminho_arquivo):
-    # Gera o relatório de classificação
-    report = metrics.classification_report(rotulos_verdadeiros, rotulos_previstos, target_names=nomes_das_classes, output_dict=True)
-    
-    # Converte o relatório para um DataFrame
-    report_df = pd.DataFrame(report).transpose()
-    
-    # Define o tamanho da figura e o estilo do seaborn
-    plt.figure(figsize=(6, len(report_df) / 2))
-    sns.set_theme(style="whitegrid")
-    
-    # Cria a tabela utilizando seaborn
-    sns.heatmap(report_df, annot=True, cmap='Blues', fmt='.2f', cbar=False, annot_kws={"size": 12})
-    
-    # Adiciona uma linha em branco antes do título
-    plt.subplots_adjust(top=0.85) 
-    # Ajusta os rótulos e o título
-    plt.title('Relatório de Classificação', fontsize=16, weight='bold', x=0.5, y=1.05)
-    plt.xticks(fontsize=12)
-    plt.yticks(fontsize=12, rotation=0)
+        print(f'Diretório já existe: {diretorio}')
+
+class AcumuladorMetricas:
+    """
+    Acumula a matriz de confusão de previsões recebidas em blocos, sem guardar as previsões.
+
+    Parâmetros:
+    - classes (list): Valores possíveis dos rótulos (nomes ou códigos), na ordem das linhas e
+                      colunas da matriz.
+    - nomes_das_classes (list): Nomes usados no relatório. Default é None (os próprios valores).
+    """
+
+    def __init__(self, classes, nomes_das_classes=None):
+        self.classes = np.asarray(classes)
+        self.nomes_das_classes = [str(nome) for nome in (nomes_das_classes if nomes_das_classes is not None else classes)]
+        n_classes = len(self.classes)
+        if len(self.nomes_das_classes) != n_classes:
+            raise ValueError(f'{len(self.nomes_das_classes)} nomes informados para {n_classes} classes.')
+        self.matriz_ = np.zeros((n_classes, n_classes), dtype=np.int64)
+        self._ordem = np.argsort(self.classes, kind='stable')
+        self._ordenadas = self.classes[self._ordem]
+
+    def atualizar(self, rotulos_verdadeiros, rotulos_previstos):
+        """
+        Soma à matriz de confusão um bloco de rótulos verdadeiros e previstos.
+        """
+        verdadeiros = self._indices(rotulos_verdadeiros)
+        previstos = self._indices(rotulos_previstos)
+        n_classes = len(self.classes)
+        self.matriz_ += np.bincount(verdadeiros * n_classes + previstos, minlength=n_classes * n_classes).reshape(n_classes, n_classes)
+        return self
+
+    def resultado(self):
+        """
+        Retorna as métricas da matriz acumulada (ver metricas_da_matriz).
+        """
+        return metricas_da_matriz(self.matriz_, self.nomes_das_classes)
+
+    def _indices(self, rotulos):
+        rotulos = np.asarray(rotulos).ravel()
+        posicoes = np.minimum(np.searchsorted(self._ordenadas, rotulos), len(self._ordenadas) - 1)
+        desconhecidos = self._ordenadas[posicoes] != rotulos
+        if np.any(desconhecidos):
+            raise ValueError(f'Rótulos fora das classes informadas: {np.unique(rotulos[desconhecidos]).tolist()}')
+        return self._ordem[posicoes]
+
+def calcular_metricas(rotulos_verdadeiros, rotulos_previstos, classes=None, nomes_das_classes=None, tamanho_bloco=1 << 20):
+    """
+    Calcula todas as métricas de avaliação a partir de uma única matriz de confusão.
+
+    Os resultados coincidem com os de metrics.confusion_matrix, accuracy_score e
+    classification_report (zero_division=0) do scikit-learn, que percorreriam as previsões uma vez cada.
+
+    Parâmetros:
+    - rotulos_verdadeiros: Rótulos verdadeiros (nomes ou códigos).
+    - rotulos_previstos: Rótulos previstos, do mesmo tipo.
+    - classes (list): Valores possíveis dos rótulos, na ordem da matriz. Default é None (os valores
+                      presentes, ordenados, como no scikit-learn).
+    - nomes_das_classes (list): Nomes usados no relatório. Default é None (os próprios valores).
+    - tamanho_bloco (int): Previsões processadas por vez, limitando a memória temporária. Default é 2^20.
+
+    Retorno:
+    - resultado (dict): Ver metricas_da_matriz.
+    """
+    rotulos_verdadeiros = np.asarray(rotulos_verdadeiros).ravel()
+    rotulos_previstos = np.asarray(rotulos_previstos).ravel()
+    if classes is None:
+        classes = np.union1d(rotulos_verdadeiros, rotulos_previstos)
+    acumulador = AcumuladorMetricas(classes, nomes_das_classes)
+    with instrumentacao.intervalo('metricas.calcular', amostras=len(rotulos_verdadeiros)):
+        for inicio in range(0, len(rotulos_verdadeiros), tamanho_bloco):
+            acumulador.atualizar(rotulos_verdadeiros[inicio:inicio + tamanho_bloco],
+                                 rotulos_previstos[inicio:inicio + tamanho_bloco])
+    return acumulador.resultado()
+
+def metricas_da_matriz(matriz, nomes_das_classes):
+    """
+    Deriva as métricas de uma matriz de confusão (linhas = verdadeiros, colunas = previstos).
+
+    Parâmetros:
+    - matriz (numpy array): Matriz de confusão (n_classes, n_classes).
+    - nomes_das_classes (list): Nome de cada classe, na ordem da matriz.
+
+    Retorno:
+    - resultado (dict): 'acuracia', 'classes', 'matriz_confusao' (listas) e 'relatorio', no mesmo
+                        formato de classification_report(output_dict=True) do scikit-learn.
+    """
+    matriz = np.asarray(matriz, dtype=np.int64)
+    acertos = np.diag(matriz).astype(np.float64)
+    suporte = matriz.sum(axis=1)
+    total_previstos = matriz.sum(axis=0)
+    total = int(suporte.sum())
+    # Divisões por zero (classe sem previsões ou sem amostras) resultam em 0, como zero_division=0
+    precisao = np.divide(acertos, total_previstos, out=np.zeros_like(acertos), where=total_previstos > 0)
+    revocacao = np.divide(acertos, suporte, out=np.zeros_like(acertos), where=suporte > 0)
+    denominador = suporte + total_previstos
+    f1 = np.divide(2 * acertos, denominador, out=np.zeros_like(acertos), where=denominador > 0)
+    acuracia = float(acertos.sum() / total) if total else 0.0
+
+    relatorio = {}
+    for i, nome in enumerate(nomes_das_classes):
+        relatorio[str(nome)] = {'precision': float(precisao[i]), 'recall': float(revocacao[i]),
+                                'f1-score': float(f1[i]), 'support': int(suporte[i])}
+    relatorio['accuracy'] = acuracia
+    relatorio['macro avg'] = {'precision': float(np.mean(precisao)), 'recall': float(np.mean(revocacao)),
+                              'f1-score': float(np.mean(f1)), 'support': total}
+    pesos = suporte / total if total else np.zeros(len(suporte))
+    relatorio['weighted avg'] = {'precision': float(pesos @ precisao), 'recall': float(pesos @ revocacao),
+                                 'f1-score': float(pesos @ f1), 'support': total}
+    return {
+        'acuracia': acuracia,
+        'classes': [str(nome) for nome in nomes_das_classes],
+        'matriz_confusao': matriz.tolist(),
+        'relatorio': relatorio,
+    }
+
+def salvar_metricas(resultado, caminho_arquivo):
+    """
+    Salva o resultado de calcular_metricas em JSON, de forma atômica.
+    """
     verificar_e_criar_diretorios(caminho_arquivo)
-    # Salva a figura da tabela do relatório de classificação
-    plt.savefig(caminho_arquivo, dpi=300)
-    plt.show()
-     
+    temporario = caminho_arquivo + '.tmp'
+    with open(temporario, 'w', encoding='utf-8') as arquivo:
+        json.dump(resultado, arquivo, indent=2, ensure_ascii=False)
+    os.replace(temporario, caminho_arquivo)
+    print(f'Métricas salvas em: {caminho_arquivo}')
+
+def gerar_relatorio(nomes_das_classes, rotulos_verdadeiros, rotulos_previstos, caminho_json, caminho_mc=None, caminho_rc=None,
+                    figuras='segundo_plano', mostrar=False, dpi=150, classes=None):
+    """
+    Calcula as métricas uma única vez, salva o JSON e gera as figuras conforme o modo escolhido.
+
+    Parâmetros:
+    - nomes_das_classes (list): Nomes das classes, na ordem da matriz.
+    - rotulos_verdadeiros: Rótulos verdadeiros.
+    - rotulos_previstos: Rótulos previstos.
+    - caminho_json (str): Caminho do arquivo JSON com as métricas.
+    - caminho_mc (str): Caminho da figura da matriz de confusão, ou None para não gerá-la. Default é None.
+    - caminho_rc (str): Caminho da figura do relatório de classificação, ou None. Default é None.
+    - figuras (str): 'sincrono' (desenha antes de retornar), 'segundo_plano' (agenda na thread de
+                     figuras e retorna em seguida) ou 'nenhum' (execução sem display). Default é 'segundo_plano'.
+    - mostrar (bool): Exibe as figuras com plt.show (apenas no modo 'sincrono'). Default é False.
+    - dpi (int): Resolução das figuras salvas. Default é 150.
+    - classes (list): Valores dos rótulos na ordem de nomes_das_classes. Default é None: com rótulos
+                      inteiros (LabelEncoder), os códigos 0..n_classes-1; senão, os próprios nomes.
+
+    Retorno:
+    - resultado (dict): Métricas (ver metricas_da_matriz).
+    - futuro (Future): Conclui quando as figuras estiverem salvas (já concluído nos modos
+                       'sincrono' e 'nenhum').
+    """
+    if figuras not in MODOS_FIGURAS:
+        raise ValueError(f"Modo de figuras {figuras} inválido. Opções: {', '.join(MODOS_FIGURAS)}")
+    if classes is None:
+        inteiros = np.issubdtype(np.asarray(rotulos_verdadeiros).dtype, np.integer)
+        classes = np.arange(len(nomes_das_classes)) if inteiros else nomes_das_classes
+    resultado = calcular_metricas(rotulos_verdadeiros, rotulos_previstos, classes=classes, nomes_das_classes=nomes_das_classes)
+    salvar_metricas(resultado, caminho_json)
+    print(f"Acurácia do Modelo: {resultado['acuracia'] * 100:.2f}%")
+
+    if figuras == 'segundo_plano':
+        return resultado, _agendar_figuras(_desenhar_figuras, resultado, caminho_mc, caminho_rc, False, dpi)
+    futuro = Future()
+    if figuras == 'sincrono':
+        _desenhar_figuras(resultado, caminho_mc, caminho_rc, mostrar, dpi)
+    futuro.set_result(None)
+    return resultado, futuro
+
+def aguardar_figuras():
+    """
+    Aguarda todas as figuras agendadas em segundo plano e encerra a thread de figuras.
+    """
+    global _executor_figuras
+    if _executor_figuras is not None:
+        _executor_figuras.shutdown(wait=True)
+        _executor_figuras = None
 
+def matriz_confusao(nomes_das_classes, rotulos_verdadeiros, rotulos_previstos, caminho_arquivo, mostrar=True, dpi=300):
+    # Como no scikit-learn, as classes são os valores presentes nos rótulos, ordenados
+    resultado = calcular_metricas(rotulos_verdadeiros, rotulos_previstos, nomes_das_classes=nomes_das_classes)
+    desenhar_matriz_confusao(resultado['matriz_confusao'], nomes_das_classes, resultado['acuracia'], caminho_arquivo, mostrar, dpi)
 
+def relatorio_classificacao(nomes_das_classes, rotulos_verdadeiros, rotulos_previstos, caminho_arquivo, mostrar=True, dpi=300):
+    resultado = calcular_metricas(rotulos_verdadeiros, rotulos_previstos, nomes_das_classes=nomes_das_classes)
+    desenhar_relatorio(resultado['relatorio'], caminho_arquivo, mostrar, dpi)
 
+def desenhar_matriz_confusao(matriz, nomes_das_classes, acuracia, caminho_arquivo, mostrar=False, dpi=300):
+    """
+    Desenha e salva a figura da matriz de confusão a partir da matriz já calculada.
 
+    Parâmetros:
+    - matriz (list ou numpy array): Matriz de confusão (n_classes, n_classes).
+    - nomes_das_classes (list): Nomes das classes, na ordem da matriz.
+    - acuracia (float): Acurácia (entre 0 e 1) exibida no subtítulo.
+    - caminho_arquivo (str): Caminho da figura.
+    - mostrar (bool): Exibe a figura com plt.show. Default é False.
+    - dpi (int): Resolução da figura salva. Default é 300.
+    """
+    import seaborn as sns
+    with instrumentacao.intervalo('metricas.figura_matriz_confusao'):
+        # Define o tamanho da fonte para a matriz de confusão e rótulos
+        sns.set_theme(font_scale=1.2)
+        figura = _nova_figura((4, 3), mostrar)
+        eixo = figura.subplots()
+        sns.heatmap(np.asarray(matriz), annot=True, cmap='Blues', fmt='g', cbar=False,
+                    annot_kws={"size": 12}, linewidths=0.4, square=True, ax=eixo)
+        # Adiciona os nomes das classes, rótulos, título, subtítulo
+        eixo.set_xticks(np.arange(len(nomes_das_classes)) + 0.5, nomes_das_classes, rotation=0, ha='center', fontsize=14)
+        eixo.set_yticks(np.arange(len(nomes_das_classes)) + 0.5, nomes_das_classes, rotation=0, va='center', fontsize=14)
+        eixo.set_xlabel('Rótulos Previstos', fontsize=14)
+        eixo.set_ylabel('Rótulos Verdadeiros', fontsize=14)
+        eixo.set_title('Matriz de Confusão', fontsize=18, weight='bold', x=0.25, y=1.15)
+        figura.suptitle(f'Acurácia do Modelo: {acuracia * 100:.2f}%', fontsize=14, x=0.37, y=0.98)
+        _finalizar_figura(figura, caminho_arquivo, mostrar, dpi)
 
+def desenhar_relatorio(relatorio, caminho_arquivo, mostrar=False, dpi=300):
+    """
+    Desenha e salva a tabela do relatório de classificação (formato de classification_report).
 
+    Parâmetros:
+    - relatorio (dict): Relatório no formato de metricas_da_matriz(...)['relatorio'].
+    - caminho_arquivo (str): Caminho da figura.
+    - mostrar (bool): Exibe a figura com plt.show. Default é False.
+    - dpi (int): Resolução da figura salva. Default é 300.
+    """
+    import pandas as pd
+    import seaborn as sns
+    with instrumentacao.intervalo('metricas.figura_relatorio'):
+        # Converte o relatório para um DataFrame
+        report_df = pd.DataFrame(relatorio).transpose()
+        sns.set_theme(style="whitegrid")
+        figura = _nova_figura((6, len(report_df) / 2), mostrar)
+        eixo = figura.subplots()
+        sns.heatmap(report_df, annot=True, cmap='Blues', fmt='.2f', cbar=False, annot_kws={"size": 12}, ax=eixo)
+        # Adiciona uma linha em branco antes do título
+        figura.subplots_adjust(top=0.85)
+        eixo.set_title('Relatório de Classificação', fontsize=16, weight='bold', x=0.5, y=1.05)
+        eixo.tick_params(axis='x', labelsize=12)
+        eixo.tick_params(axis='y', labelsize=12, labelrotation=0)
+        _finalizar_figura(figura, caminho_arquivo, mostrar, dpi)
+
+def _desenhar_figuras(resultado, caminho_mc, caminho_rc, mostrar, dpi):
+    if caminho_mc:
+        desenhar_matriz_confusao(resultado['matriz_confusao'], resultado['classes'], resultado['acuracia'], caminho_mc, mostrar, dpi)
+    if caminho_rc:
+        desenhar_relatorio(resultado['relatorio'], caminho_rc, mostrar, dpi)
+
+def _agendar_figuras(funcao, *argumentos):
+    global _executor_figuras
+    if _executor_figuras is None:
+        _executor_figuras = ThreadPoolExecutor(max_workers=1, thread_name_prefix='figuras')
+    return _executor_figuras.submit(funcao, *argumentos)
+
+def _nova_figura(tamanho, mostrar):
+    # Para exibir é preciso uma figura do pyplot; para apenas salvar, uma Figure independente
+    # não toca no estado global do pyplot e pode ser desenhada fora da thread principal
+    if mostrar:
+        import matplotlib.pyplot as plt
+        return plt.figure(figsize=tamanho)
+    from matplotlib.figure import Figure
+    return Figure(figsize=tamanho)
+
+def _finalizar_figura(figura, caminho_arquivo, mostrar, dpi):
+    verificar_e_criar_diretorios(caminho_arquivo)
+    figura.savefig(caminho_arquivo, dpi=dpi)
+    if mostrar:
+        import matplotlib.pyplot as plt
+        plt.show()
@@ -45,10 +45,69 @@ def codificar_rotulos_onehot(rotulos):
     print('Rótulos codificados com OneHotEncoder')
     return rotulos_codificados, encoder
 
+def codificar_rotulos_incremental(rotulos, encoder=None):
+    """
+    Codifica os rótulos com um CodificadorIncremental, criando-o ou ampliando um já existente.
 
+    Parâmetros:
+    - rotulos (list of str): Lista de rótulos de categorias.
+    - encoder (CodificadorIncremental): Codificador a ser ampliado com as classes novas. Default é None.
 
+    Retorno:
+    - rotulos_codificados (numpy array): Array de rótulos codificados como inteiros.
+    - encoder (CodificadorIncremental): O codificador (ampliado) usado para a codificação.
+    """
+    encoder = encoder if encoder is not None else CodificadorIncremental()
+    rotulos_codificados = encoder.atualizar(rotulos).transform(rotulos)
+    print(f'Rótulos codificados com CodificadorIncremental ({len(encoder.classes_)} classes)')
+    return rotulos_codificados, encoder
 
 
+class CodificadorIncremental:
+    """
+    Codificador de rótulos compatível com o LabelEncoder que cresce com classes novas sem
+    renumerar as existentes: cada classe recebe o próximo código na ordem em que aparece pela
+    primeira vez (o LabelEncoder numera em ordem alfabética, de modo que uma classe nova pode
+    deslocar os códigos das demais e invalidar os modelos já treinados).
 
+    Parâmetros:
+    - classes (list): Classes já conhecidas, na ordem dos códigos. Default é None.
+    """
 
-    
+    def __init__(self, classes=None):
+        self.classes_ = np.array(classes if classes is not None else [], dtype=object)
+        self._codigos = {classe: codigo for codigo, classe in enumerate(self.classes_)}
+
+    def atualizar(self, rotulos):
+        """
+        Acrescenta ao fim as classes ainda desconhecidas e retorna o próprio codificador.
+        """
+        novas = [classe for classe in dict.fromkeys(rotulos) if classe not in self._codigos]
+        for classe in novas:
+            self._codigos[classe] = len(self._codigos)
+        if novas:
+            self.classes_ = np.array(list(self._codigos), dtype=object)
+        return self
+
+    def fit(self, rotulos):
+        self.classes_ = np.array([], dtype=object)
+        self._codigos = {}
+        return self.atualizar(rotulos)
+
+    def transform(self, rotulos):
+        try:
+            return np.array([self._codigos[classe] for classe in rotulos], dtype=np.intp)
+        except KeyError as erro:
+            raise ValueError(f'Rótulo desconhecido pelo codificador: {erro.args[0]}')
+
+    def fit_transform(self, rotulos):
+        return self.fit(rotulos).transform(rotulos)
+
+    def inverse_transform(self, rotulos_codificados):
+        return self.classes_[np.asarray(rotulos_codificados, dtype=np.intp)]
+
+    def onehot(self, rotulos_codificados):
+        """
+        Converte códigos inteiros em vetores one-hot com uma coluna por classe conhecida.
+        """
+        return np.eye(len(self.classes_), dtype=np.float64)[np.asarray(rotulos_codificados, dtype=np.intp)]